@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from metrics import admission_decisions, timed
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+class AdmissionRejected(Exception):
+    """Raised when an agent run is shed instead of queued or run"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Agent capacity exceeded ({reason})")
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Concurrency cap with a bounded priority queue in front of agent runs
+
+    At most max_concurrent runs hold a slot; further callers wait in a queue
+    of at most max_queue, best (lowest) priority value first. A caller is
+    shed rather than left to time out slowly when:
+      - the run budget (runs per minute) is used up,
+      - its estimated queue wait, from recent run durations, exceeds its timeout,
+      - the queue is full of callers with equal or better priority
+        (a better caller instead preempts the worst queued one),
+      - it is still queued when its timeout expires.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, queue_timeout: float = 20,
+                 runs_per_minute: float = 0):
+        """
+        Args:
+            max_concurrent: Agent runs allowed in flight
+            max_queue: Callers allowed to wait for a slot
+            queue_timeout: Seconds a caller may wait before it is shed
+            runs_per_minute: Sustained run budget; 0 for unlimited
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.runs_per_minute = runs_per_minute
+        self._active = 0
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # Exponentially weighted mean of how long a run holds its slot
+        self._hold_time: Optional[float] = None
+        self._tokens = runs_per_minute
+        self._refilled_at = time.monotonic()
+
+    @classmethod
+    def from_environment(cls) -> "AdmissionController":
+        return cls(
+            max_concurrent=int(os.environ.get("AGENT_MAX_CONCURRENT", 8)),
+            max_queue=int(os.environ.get("AGENT_QUEUE_SIZE", 32)),
+            queue_timeout=float(os.environ.get("AGENT_QUEUE_TIMEOUT", 20)),
+            runs_per_minute=float(os.environ.get("AGENT_RUNS_PER_MINUTE", 0)),
+        )
+
+    def _refund(self):
+        """Give back the budget of a run that never happened"""
+        if self.runs_per_minute > 0:
+            self._tokens = min(self.runs_per_minute, self._tokens + 1)
+
+    def _shed(self, reason: str):
+        if reason != "budget":
+            self._refund()
+        admission_decisions.inc(f"shed_{reason}")
+        raise AdmissionRejected(reason)
+
+    def _take_budget(self) -> bool:
+        """Spend one run from the token bucket (burst of one minute's budget)"""
+        if self.runs_per_minute <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.runs_per_minute,
+                           self._tokens + (now - self._refilled_at) * self.runs_per_minute / 60)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _estimated_wait(self, ahead: int) -> float:
+        if self._hold_time is None:
+            return 0.0
+        return (ahead // self.max_concurrent + 1) * self._hold_time
+
+    def _grant(self):
+        """Hand free slots to the best-priority callers still waiting"""
+        while self._waiters and self._active < self.max_concurrent:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._active += 1
+                future.set_result(None)
+
+    async def acquire(self, priority: float = 0.0, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a run slot
+
+        Args:
+            priority: Lower values are served first (e.g. seconds until takeoff)
+            timeout: Seconds the caller can wait; defaults to queue_timeout
+
+        Returns:
+            time.monotonic() at which the slot was granted, to pass to release()
+
+        Raises:
+            AdmissionRejected: The caller was shed
+        """
+        if not self._take_budget():
+            self._shed("budget")
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            admission_decisions.inc("admitted")
+            return time.monotonic()
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        ahead = sum(1 for waiter in self._waiters if waiter[0] <= priority and not waiter[2].done())
+        if self._estimated_wait(ahead) > timeout:
+            self._shed("deadline")
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters, default=None)
+            if worst is None or worst[0] <= priority:
+                self._shed("queue_full")
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            worst[2].set_exception(AdmissionRejected("preempted"))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            with timed("agent_queue_wait"):
+                await asyncio.wait_for(future, timeout)
+        except AdmissionRejected:
+            # A better-priority caller took this one's place in the full queue
+            self._shed("preempted")
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the caller gave up
+                self._free()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self._shed("deadline")
+            self._refund()
+            raise
+        admission_decisions.inc("admitted_queued")
+        return time.monotonic()
+
+    def release(self, granted_at: float):
+        """Return a slot obtained from acquire() and admit the next waiter"""
+        held = time.monotonic() - granted_at
+        self._hold_time = held if self._hold_time is None else 0.8 * self._hold_time + 0.2 * held
+        self._free()
+
+    def _free(self):
+        self._active -= 1
+        self._grant()
+
+    def stats(self) -> Dict:
+        """Slots in use, callers waiting and the recent mean run duration"""
+        return {
+            "active": self._active,
+            "queued": sum(1 for waiter in self._waiters if not waiter[2].done()),
+            "mean_hold_time": round(self._hold_time, 2) if self._hold_time is not None else None,
+        }
@@ -0,0 +1,398 @@
+"""
+Offline load benchmark for the /api/flight pipeline
+
+Drives fs_server in-process with concurrent requests while upstream weather
+calls are answered by a synthetic generator (or replayed from a cassette
+directory recorded with HTTP_REPLAY_MODE=record) and the Azure agent is
+replaced by FakeAIProjectClient. Reports latency percentiles, throughput and
+memory, and can compare against a saved baseline.
+
+    python benchmark.py --requests 200 --concurrency 16 --json baseline.json
+    python benchmark.py --requests 200 --concurrency 16 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+# Keep the run self-contained regardless of the developer's .env
+os.environ["BRIEFING_CACHE_DIR"] = ""
+os.environ["WEATHER_SNAPSHOT"] = "false"
+os.environ["PREFETCH"] = "false"
+os.environ["REFERENCE_DB"] = ""
+os.environ["AGENT_MAX_CONCURRENT"] = "8"
+os.environ["AGENT_QUEUE_SIZE"] = "32"
+os.environ["AGENT_QUEUE_TIMEOUT"] = "20"
+os.environ["AGENT_RUNS_PER_MINUTE"] = "0"
+os.environ.setdefault("PROJECT_ENDPOINT", "https://offline.invalid")
+os.environ.setdefault("AGENT_ID", "benchmark")
+
+import http_client  # noqa: E402
+import data_fetcher  # noqa: E402
+import fs_server  # noqa: E402
+from fake_project_client import FakeAIProjectClient  # noqa: E402
+from fs_agent import FlightServiceAgent  # noqa: E402
+from metrics import add_stage_listener  # noqa: E402
+
+# (ident, lat, lon, elevation ft, runway ids, runway alignment)
+AIRPORTS = [
+    ('KATL', 33.64, -84.43, 1026, '08L/26R', 95), ('KBOS', 42.36, -71.01, 20, '04R/22L', 35),
+    ('KBWI', 39.18, -76.67, 146, '10/28', 100), ('KCLT', 35.21, -80.94, 748, '18C/36C', 180),
+    ('KDEN', 39.86, -104.67, 5434, '16R/34L', 170), ('KDFW', 32.90, -97.04, 607, '17C/35C', 175),
+    ('KDTW', 42.21, -83.35, 645, '03R/21L', 30), ('KEWR', 40.69, -74.17, 18, '04L/22R', 40),
+    ('KIAH', 29.98, -95.34, 97, '15L/33R', 150), ('KJFK', 40.64, -73.78, 13, '04L/22R', 40),
+    ('KLAS', 36.08, -115.15, 2181, '08L/26R', 80), ('KLAX', 33.94, -118.41, 125, '06L/24R', 83),
+    ('KMCO', 28.43, -81.31, 96, '18L/36R', 180), ('KMSP', 44.88, -93.22, 841, '12R/30L', 120),
+    ('KORD', 41.98, -87.90, 672, '10L/28R', 100), ('KPDX', 45.59, -122.60, 31, '10R/28L', 100),
+    ('KPHL', 39.87, -75.24, 36, '09R/27L', 90), ('KPHX', 33.43, -112.01, 1135, '08/26', 80),
+    ('KSEA', 47.45, -122.31, 433, '16L/34R', 160), ('KSFO', 37.62, -122.38, 13, '10L/28R', 118),
+    ('KSLC', 40.79, -111.98, 4227, '16L/34R', 170), ('KSTL', 38.75, -90.37, 618, '12R/30L', 120),
+    ('KTPA', 27.98, -82.53, 26, '01L/19R', 10), ('KBDR', 41.16, -73.13, 9, '06/24', 60),
+    ('KPVD', 41.72, -71.43, 55, '05/23', 50), ('KOAK', 37.72, -122.22, 9, '12/30', 131),
+]
+AIRPORT_INDEX = {airport[0]: airport for airport in AIRPORTS}
+
+CLOUD_LAYERS = [
+    [{'cover': 'CLR'}], [{'cover': 'FEW', 'base': 4500}], [{'cover': 'BKN', 'base': 2500}],
+    [{'cover': 'OVC', 'base': 800}], [{'cover': 'OVC', 'base': 300}],
+]
+
+
+def _rng(*parts) -> random.Random:
+    """Deterministic generator per request so repeated queries return the same data"""
+    return random.Random(zlib.crc32('|'.join(str(part) for part in parts).encode('utf-8')))
+
+
+class SyntheticUpstream:
+    """Plausible aviationweather.gov responses generated locally, with simulated latency"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.5):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.hour = int(time.time() // 3600)
+
+    def __call__(self, url: str, params: Optional[Dict], timeout: float):
+        self.requests += 1
+        params = params or {}
+        endpoint = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+        if self.latency:
+            time.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+        body = getattr(self, f"_{endpoint}", lambda p: [])(params)
+        content = body if isinstance(body, str) else json.dumps(body)
+        return http_client.make_response(url, 200, content.encode('utf-8'))
+
+    def _ids(self, params: Dict) -> List[str]:
+        return [code for code in str(params.get('ids') or '').split(',') if code]
+
+    def _metar(self, params: Dict) -> List[Dict]:
+        records = []
+        for station in self._ids(params):
+            airport = AIRPORT_INDEX.get(station)
+            for age in range(int(params.get('hours', 2))):
+                rng = _rng('metar', station, self.hour - age)
+                clouds = rng.choice(CLOUD_LAYERS)
+                wdir, wspd = rng.randrange(10, 361, 10), rng.randrange(0, 25)
+                visib = rng.choice(['10+', 6, 3, 1.5, 0.5])
+                records.append({
+                    'icaoId': station, 'obsTime': (self.hour - age) * 3600 - 300,
+                    'temp': rng.randrange(-5, 30), 'dewp': rng.randrange(-10, 20), 'wdir': wdir, 'wspd': wspd,
+                    'visib': visib, 'altim': 1013.2, 'clouds': clouds,
+                    'rawOb': f"{station} {wdir:03d}{wspd:02d}KT {visib}SM "
+                             + ' '.join(f"{c['cover']}{c.get('base', 0) // 100:03d}" for c in clouds),
+                    'lat': airport[1] if airport else None, 'lon': airport[2] if airport else None,
+                })
+        return records
+
+    def _taf(self, params: Dict) -> List[Dict]:
+        records = []
+        start = self.hour * 3600
+        for station in self._ids(params):
+            rng = _rng('taf', station, self.hour // 6)
+            forecasts = []
+            for index, change in enumerate((None, 'TEMPO', 'FM', 'FM')):
+                time_from = start + (index if change != 'TEMPO' else 0) * 8 * 3600
+                forecasts.append({
+                    'timeFrom': time_from, 'timeTo': time_from + (4 if change == 'TEMPO' else 8) * 3600,
+                    'fcstChange': change, 'wdir': rng.randrange(10, 361, 10), 'wspd': rng.randrange(3, 25),
+                    'visib': rng.choice(['6+', 5, 3, 1]), 'clouds': rng.choice(CLOUD_LAYERS),
+                })
+            records.append({
+                'icaoId': station, 'issueTime': start - 1200, 'validTimeFrom': start, 'validTimeTo': start + 30 * 3600,
+                'rawTAF': f"TAF {station} {rng.randrange(10**6):06d}Z ...", 'fcsts': forecasts,
+            })
+        return records
+
+    def _airport(self, params: Dict) -> List[Dict]:
+        records = []
+        for station in self._ids(params):
+            if station in AIRPORT_INDEX:
+                ident, lat, lon, elev, runway, alignment = AIRPORT_INDEX[station]
+                records.append({'icaoId': ident, 'name': f"{ident} International", 'lat': lat, 'lon': lon,
+                                'elev': elev, 'runways': [{'id': runway, 'dimension': '9000x150',
+                                                           'alignment': alignment}]})
+        return records
+
+    @staticmethod
+    def _points(params: Dict, count: int, kind: str) -> List[Dict]:
+        lat0, lon0, lat1, lon1 = (float(part) for part in params['bbox'].split(','))
+        rng = _rng(kind, params['bbox'])
+        return [{'lat': rng.uniform(lat0, lat1), 'lon': rng.uniform(lon0, lon1), 'index': index}
+                for index in range(count)]
+
+    def _pirep(self, params: Dict) -> List[Dict]:
+        if 'bbox' not in params:
+            return []
+        return [{**point, 'rawOb': f"UA /OV {point['index']:03d} /FL{point['index'] % 30 * 10:03d} /TP C172 /TB LGT",
+                 'pirepType': 'PIREP'} for point in self._points(params, 40, 'pirep')]
+
+    def _navaid(self, params: Dict) -> List[Dict]:
+        if 'bbox' not in params:
+            return []
+        return [{**point, 'id': f"N{point['index']:02d}", 'type': 'VORTAC', 'freq': 112.0 + point['index'] / 10,
+                 'name': f"NAVAID {point['index']}"} for point in self._points(params, 30, 'navaid')]
+
+    def _windtemp(self, params: Dict) -> str:
+        """FD bulletin for every known airport (site = identifier without the K), levels above its elevation"""
+        rng = _rng('windtemp', params.get('fcst'), self.hour // 6)
+        levels = (3000, 6000, 9000, 12000, 18000, 24000, 30000, 34000, 39000)
+        based = time.gmtime(self.hour // 6 * 6 * 3600)
+        lines = ["FD1US1", f"DATA BASED ON {based.tm_mday:02d}{based.tm_hour:02d}00Z",
+                 f"VALID {based.tm_mday:02d}{(based.tm_hour + 6) % 24:02d}00Z   FOR USE 0000-0600Z. TEMPS NEG ABV 24000",
+                 "", "FT  " + "".join(f"{level:<8}" for level in levels)]
+        for ident, _, _, elevation, _, _ in AIRPORTS:
+            groups = []
+            for level in levels:
+                if level < elevation + 1500:
+                    groups.append(' ' * 7)
+                    continue
+                direction = rng.randrange(200, 330, 10) // 10
+                speed = min(199, level // 400 + rng.randrange(0, 20))
+                temperature = round(15 - level * 0.002 + rng.uniform(-3, 3))
+                if speed >= 100:
+                    direction, speed = direction + 50, speed - 100
+                group = f"{direction:02d}{speed:02d}"
+                if level > 24000:
+                    group += f"{abs(temperature):02d}"
+                elif level > 3000:
+                    group += f"{temperature:+03d}"
+                groups.append(f"{group:<7}")
+            lines.append(f"{ident[1:]:<5}" + ' '.join(groups))
+        return '\n'.join(lines) + '\n'
+
+    def _airsigmet(self, params: Dict) -> List[Dict]:
+        rng = _rng('airsigmet', self.hour)
+        advisories = []
+        for index in range(8):
+            lat, lon = rng.uniform(28, 46), rng.uniform(-120, -75)
+            advisories.append({'hazard': rng.choice(['CONVECTIVE', 'TURB', 'ICE']), 'severity': 'MOD',
+                               'rawAirSigmet': f"SIGMET {index} ...",
+                               'coords': [{'lat': lat, 'lon': lon}, {'lat': lat + 2, 'lon': lon},
+                                          {'lat': lat + 2, 'lon': lon + 3}, {'lat': lat, 'lon': lon + 3}]})
+        return advisories
+
+    def _gairmet(self, params: Dict) -> List[Dict]:
+        return [{**advisory, 'rawAirSigmet': None, 'product': 'SIERRA'} for advisory in self._airsigmet(params)]
+
+
+def make_plans(count: int, seed: int, distinct: int) -> List[Dict]:
+    """Flight plan payloads drawn from a pool of `distinct` plans"""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        departure, destination, alternate = rng.sample(AIRPORTS, 3)
+        pool.append({
+            'pilotName': 'Benchmark', 'pilotQualifications': rng.choice(['PPL', 'PPL IFR']),
+            'flightRules': rng.choice(['VFR', 'IFR']), 'aircraftType': 'C172', 'aircraftEquipment': 'GPS',
+            'trueAirspeed': '120', 'departureAirport': departure[0], 'destinationAirport': destination[0],
+            'alternateAirports': alternate[0],
+            'takeoffTime': time.strftime('%Y-%m-%dT%H:00', time.gmtime(time.time() + 3600)),
+            'estimatedEnroute': f"{rng.randrange(1, 5)}h {rng.randrange(0, 60, 15)}m",
+            'cruiseAltitude': ('', '5500', '9500')[len(pool) % 3],
+        })
+    return [pool[index % len(pool)] for index in range(count)]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 2) if samples else float('nan'),
+    }
+
+
+def clear_caches():
+    data_fetcher.response_cache.clear()
+    if fs_server.flight_agent is not None:
+        fs_server.flight_agent.clear_briefing_cache()
+
+
+async def run(args) -> Dict:
+    path = {'flight': '/api/flight', 'stream': '/api/flight/stream', 'batch': '/api/flight/batch'}[args.endpoint]
+    query = '?quick=true' if args.quick else ''
+    plans = make_plans(args.requests * (args.batch_size if args.endpoint == 'batch' else 1),
+                       args.seed, args.distinct_plans)
+    if args.endpoint == 'batch':
+        payloads = [{'flights': plans[index:index + args.batch_size]}
+                    for index in range(0, len(plans), args.batch_size)]
+    else:
+        payloads = plans
+
+    stages: Dict[str, List[float]] = defaultdict(list)
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    # Captured up front: the app shutdown closes the agent and drops its client
+    agent_client = fs_server.flight_agent._client if fs_server.flight_agent else None
+
+    async with fs_server.app.test_app() as test_app:
+        client = test_app.test_client()
+
+        async def send(payload) -> bool:
+            response = await client.post(path + query, json=payload)
+            await response.get_data()
+            return response.status_code == 200
+
+        for payload in payloads[:args.warmup]:
+            await send(payload)
+
+        add_stage_listener(lambda stage, duration: stages[stage].append(duration))
+        for payload in payloads:
+            queue.put_nowait(payload)
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                payload = queue.get_nowait()
+                if args.cold:
+                    clear_caches()
+                started = time.perf_counter()
+                try:
+                    ok = await send(payload)
+                except Exception as e:
+                    print(f"Request failed: {e}", file=sys.stderr)
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        if args.memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        memory = {'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+        if args.memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            here = os.path.dirname(os.path.abspath(__file__))
+            by_module: Dict[str, int] = defaultdict(int)
+            for stat in snapshot.statistics('filename'):
+                filename = stat.traceback[0].filename
+                if filename.endswith('.py') and os.path.dirname(os.path.abspath(filename)) == here:
+                    by_module[os.path.basename(filename)] += stat.size
+            memory['traced_peak_mb'] = round(peak / 2**20, 2)
+            memory['retained_kb_by_module'] = {module: round(size / 1024, 1) for module, size in
+                                               sorted(by_module.items(), key=lambda item: -item[1])}
+
+    return {
+        'config': {key: value for key, value in vars(args).items() if key not in ('json', 'baseline')},
+        'requests': len(payloads),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(payloads) / elapsed, 2) if elapsed else float('nan'),
+        'latency': summarize(latencies),
+        'stages': {stage: summarize(samples) for stage, samples in sorted(stages.items())},
+        'upstream_requests': getattr(http_client._transport, 'requests', None),
+        'agent_runs': getattr(agent_client, 'run_count', None),
+        'memory': memory,
+    }
+
+
+def _delta(current: float, baseline: float) -> str:
+    if not baseline or math.isnan(baseline) or math.isnan(current):
+        return ''
+    return f" ({(current - baseline) / baseline * 100:+.1f}%)"
+
+
+def report(result: Dict, baseline: Optional[Dict] = None):
+    base_latency = (baseline or {}).get('latency', {})
+    print(f"\n{result['requests']} requests, {result['errors']} errors in {result['elapsed_s']}s "
+          f"-> {result['throughput_rps']} req/s{_delta(result['throughput_rps'], (baseline or {}).get('throughput_rps'))}")
+    print(f"upstream requests: {result['upstream_requests']}, agent runs: {result['agent_runs']}")
+    print(f"\n{'stage':<28}{'count':>7}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}")
+    rows = [('request', result['latency'], base_latency)]
+    rows += [(stage, stats, (baseline or {}).get('stages', {}).get(stage, {}))
+             for stage, stats in result['stages'].items()]
+    for name, stats, base in rows:
+        print(f"{name:<28}{stats['count']:>7}" + ''.join(
+            f"{stats[key]:>9.1f}{_delta(stats[key], base.get(key)):>7}" for key in ('p50_ms', 'p95_ms', 'p99_ms')))
+    print(f"\nmemory: {json.dumps(result['memory'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoint', choices=('flight', 'stream', 'batch'), default='flight')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=10, help="Plans per request for --endpoint batch")
+    parser.add_argument('--distinct-plans', type=int, default=50, help="Size of the plan pool requests draw from")
+    parser.add_argument('--warmup', type=int, default=0, help="Requests sent before measuring")
+    parser.add_argument('--cold', action='store_true', help="Clear upstream and briefing caches before each request")
+    parser.add_argument('--quick', action='store_true', help="Use ?quick=true (no agent run)")
+    parser.add_argument('--upstream-latency', type=float, default=0.05, help="Seconds per synthetic upstream call")
+    parser.add_argument('--cassettes', help="Replay recorded responses from this directory instead")
+    parser.add_argument('--agent-run-latency', type=float, default=2.0)
+    parser.add_argument('--agent-first-token', type=float, default=0.5)
+    parser.add_argument('--agent-chunks', type=int, default=40)
+    parser.add_argument('--agent-chunk-delay', type=float, default=0.02)
+    parser.add_argument('--agent-failure-rate', type=float, default=0.0)
+    parser.add_argument('--memory', action='store_true', help="Trace allocations (slower)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Write results to this file (use as a later --baseline)")
+    parser.add_argument('--baseline', help="Compare against results saved with --json")
+    args = parser.parse_args()
+
+    if args.cassettes:
+        http_client.set_transport(http_client.Cassette(args.cassettes, mode='replay', latency=args.upstream_latency))
+    else:
+        http_client.set_transport(SyntheticUpstream(latency=args.upstream_latency))
+    fs_server.flight_agent = FlightServiceAgent(client=FakeAIProjectClient(
+        run_latency=args.agent_run_latency, first_token_latency=args.agent_first_token,
+        chunks=args.agent_chunks, chunk_delay=args.agent_chunk_delay,
+        failure_rate=args.agent_failure_rate, seed=args.seed))
+
+    result = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from cache import TTLCache
+from conditions import parse_takeoff_time
+
+# Raw-text fields that identify an observation/forecast exactly
+RAW_TEXT_FIELDS = ('raw', 'rawOb', 'rawAirSigmet', 'rawSigmet', 'rawText')
+
+
+def _normalize(value) -> str:
+    return ' '.join(str(value or '').split()).upper()
+
+
+def normalize_plan(pilot_data: Dict) -> Dict:
+    """
+    Canonical form of the plan fields that influence a briefing
+
+    Pilot name is deliberately excluded. The takeoff time is converted to
+    UTC so equivalent spellings of the same instant share a briefing; ETAs,
+    and with them the forecast periods in the briefing, depend on it exactly.
+    """
+    alternates = sorted({_normalize(code) for code in str(pilot_data.get('alternate_airports') or '').split(',')} - {''})
+    takeoff = parse_takeoff_time(pilot_data.get('takeoff_time'))
+    return {
+        'pilot_qualifications': _normalize(pilot_data.get('pilot_qualifications')),
+        'flight_rules': _normalize(pilot_data.get('flight_rules')),
+        'aircraft_type': _normalize(pilot_data.get('aircraft_type')),
+        'aircraft_equipment': _normalize(pilot_data.get('aircraft_equipment')),
+        'true_airspeed': _normalize(pilot_data.get('true_airspeed')),
+        'departure_airport': _normalize(pilot_data.get('departure_airport')),
+        'destination_airport': _normalize(pilot_data.get('destination_airport')),
+        'alternate_airports': alternates,
+        'takeoff_time': takeoff.isoformat() if takeoff else _normalize(pilot_data.get('takeoff_time')),
+        'estimated_enroute': _normalize(pilot_data.get('estimated_enroute')),
+        'cruise_altitude': _normalize(pilot_data.get('cruise_altitude')),
+        'fuel_burn': _normalize(pilot_data.get('fuel_burn')),
+    }
+
+
+def _record_texts(records: Iterable) -> List[str]:
+    """Raw text of each record, or its canonical JSON when no raw text is available"""
+    texts = []
+    for record in records:
+        if isinstance(record, dict):
+            raw = next((record[field] for field in RAW_TEXT_FIELDS if record.get(field)), None)
+            texts.append(raw if raw is not None else json.dumps(record, sort_keys=True, default=str))
+        else:
+            texts.append(str(record))
+    return texts
+
+
+def weather_fingerprint(online_resources: Dict) -> str:
+    """
+    Digest of every observation/forecast that goes into the prompt
+
+    Any new METAR, TAF amendment, PIREP, advisory or winds aloft forecast
+    changes the fingerprint, which invalidates briefings built from the
+    previous data.
+    """
+    weather = online_resources.get('weather') or {}
+    airspace = online_resources.get('airspace_info') or {}
+    texts = []
+    for product in ('metar', 'taf', 'pireps'):
+        texts.extend(f"{product}:{text}" for text in _record_texts(weather.get(product) or []))
+    for product, records in sorted(airspace.items()):
+        texts.extend(f"{product}:{text}" for text in _record_texts(records or []))
+    winds_aloft = online_resources.get('winds_aloft') or {}
+    if winds_aloft:
+        texts.append(f"windtemp:{winds_aloft.get('based_on')}:{winds_aloft.get('valid')}")
+    return hashlib.sha256('\n'.join(sorted(texts)).encode('utf-8')).hexdigest()
+
+
+# Sections whose items only matter when they appear (an aged-out PIREP needs no amendment)
+ADDITIONS_ONLY = ('pirep',)
+
+
+def material_changes(previous: Dict[str, Tuple[Hashable, str]],
+                     current: Dict[str, Tuple[Hashable, str]]) -> List[str]:
+    """
+    Describe the material differences between two briefing_items() snapshots
+
+    Returns:
+        One line per changed, new or removed item, assessment first; empty
+        when the earlier briefing still describes the current data
+    """
+    changes = []
+    for key, (signature, text) in current.items():
+        if key not in previous:
+            changes.append((key, f"NEW {key.split(':', 1)[0].upper()}: {text}"))
+        elif previous[key][0] != signature:
+            changes.append((key, f"CHANGED: {text} (was: {previous[key][1]})"))
+    for key, (_, text) in previous.items():
+        section = key.split(':', 1)[0]
+        if key not in current and section not in ADDITIONS_ONLY:
+            changes.append((key, f"NO LONGER REPORTED {section.upper()}: {text}"))
+    return [line for key, line in sorted(changes, key=lambda change: not change[0].startswith('assessment:'))]
+
+
+class BriefingCache:
+    """Memory cache of generated briefings with an optional disk-backed second tier"""
+
+    # Disk writes between scans for entries beyond max_disk_entries
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, max_entries: int = 500, ttl: float = 3600,
+                 directory: Optional[str] = None, max_disk_entries: int = 5000):
+        """
+        Args:
+            max_entries: Briefings kept in memory (LRU beyond that)
+            ttl: Seconds a briefing stays valid even if its inputs are unchanged
+            directory: Folder for the disk tier; disabled when None
+            max_disk_entries: Files kept in the disk tier; the oldest beyond that are
+                pruned every PRUNE_INTERVAL writes
+        """
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._memory = TTLCache(max_entries=max_entries)
+        self._disk_writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls) -> "BriefingCache":
+        return cls(
+            max_entries=int(os.environ.get("BRIEFING_CACHE_MAX_ENTRIES", 500)),
+            ttl=float(os.environ.get("BRIEFING_CACHE_TTL", 3600)),
+            directory=os.environ.get("BRIEFING_CACHE_DIR") or None,
+        )
+
+    @staticmethod
+    def key(flight_info_dict: Dict) -> str:
+        """Cache key: hash of the normalized plan plus the weather fingerprint"""
+        plan = normalize_plan(flight_info_dict.get('pilot_data') or {})
+        fingerprint = weather_fingerprint(flight_info_dict.get('online_resources') or {})
+        payload = json.dumps({'plan': plan, 'weather': fingerprint}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def plan_key(flight_info_dict: Dict) -> str:
+        """Key of the plan alone, under which its latest briefing and inputs are remembered"""
+        plan = normalize_plan(flight_info_dict.get('pilot_data') or {})
+        return hashlib.sha256(json.dumps(plan, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def previous(self, plan_key: str) -> Optional[Dict]:
+        """The plan's latest briefing as {'briefing', 'items', 'amendments'}, if still fresh"""
+        return self._memory.get(('plan', plan_key))
+
+    def remember(self, plan_key: str, briefing: str, items: Dict[str, Tuple[Hashable, str]], amendments: int = 0):
+        """
+        Record the briefing a plan was last given and the inputs it was based on
+
+        Args:
+            plan_key: plan_key() of the flight
+            briefing: Full briefing text, including any amendments
+            items: briefing_items() the briefing reflects
+            amendments: Amendments appended since the last full briefing
+        """
+        self._memory.set(('plan', plan_key), {'briefing': briefing, 'items': items, 'amendments': amendments},
+                         self.ttl)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached briefing from memory, falling back to (and promoting from) disk"""
+        briefing = self._memory.get(('briefing', key))
+        if briefing is not None or not self.directory:
+            return briefing
+        entry = await asyncio.to_thread(self._read_disk, key)
+        if entry is None:
+            return None
+        remaining = entry.get('expires_at', 0) - time.time()
+        if remaining <= 0:
+            return None
+        self._memory.set(('briefing', key), entry['briefing'], remaining)
+        return entry['briefing']
+
+    async def set(self, key: str, briefing: str):
+        """Store a briefing in memory and, when enabled, on disk (off the event loop)"""
+        self._memory.set(('briefing', key), briefing, self.ttl)
+        if not self.directory:
+            return
+        self._disk_writes += 1
+        prune = self._disk_writes % self.PRUNE_INTERVAL == 0
+        await asyncio.to_thread(self._write_disk, key, briefing, prune)
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, briefing: str, prune: bool):
+        try:
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'briefing': briefing, 'expires_at': time.time() + self.ttl}, f)
+            os.replace(tmp_path, self._path(key))
+            if prune:
+                self._prune_disk()
+        except OSError as e:
+            print(f"Error writing briefing cache entry: {e}")
+
+    def _prune_disk(self):
+        """Delete the oldest disk entries beyond max_disk_entries"""
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Forget every briefing and remembered plan held in memory (the disk tier is kept)"""
+        self._memory.clear()
+
+    def stats(self) -> Dict:
+        return self._memory.stats()
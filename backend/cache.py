@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+_MISSING = object()
+
+
+def seconds_until_next_cycle(period: int, offset: int = 0, minimum: int = 60) -> int:
+    """
+    Seconds until the next product issuance in a fixed UTC cycle
+
+    Args:
+        period: Cycle length in seconds (e.g. 3600 for hourly METARs)
+        offset: Seconds into each cycle at which new products are expected
+        minimum: Lower bound so entries fetched just before issuance still live briefly
+
+    Returns:
+        Number of seconds an entry fetched now should be considered fresh
+    """
+    now = int(time.time())
+    remaining = (offset - now) % period
+    return max(remaining, minimum)
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache with per-entry expiry and hit/miss counters"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits: Counter = Counter()
+        self._misses: Counter = Counter()
+        self._evictions = 0
+
+    @staticmethod
+    def _namespace(key: Hashable) -> str:
+        """Counter bucket for a key: the product name for tuple keys, else 'default'"""
+        return str(key[0]) if isinstance(key, tuple) and key else "default"
+
+    def get(self, key: Hashable, default: Any = None, min_ttl: float = 0.0) -> Any:
+        """
+        Look up a fresh entry and mark it as most recently used
+
+        Args:
+            key: Cache key, conventionally (product, station, *params)
+            default: Value returned when the key is absent or expired
+            min_ttl: Treat entries expiring within this many seconds as misses
+                (they stay cached for other readers)
+
+        Returns:
+            Cached value or default
+        """
+        namespace = self._namespace(key)
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                now = time.monotonic()
+                if expires_at > now + min_ttl:
+                    self._entries.move_to_end(key)
+                    self._hits[namespace] += 1
+                    return value
+                if expires_at <= now:
+                    del self._entries[key]
+            self._misses[namespace] += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """
+        Store a value for ttl seconds, evicting least recently used entries if full
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live in seconds
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._hits.clear()
+            self._misses.clear()
+            self._evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache size, evictions and per-product hit/miss counts"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self._evictions,
+                "hits": dict(self._hits),
+                "misses": dict(self._misses),
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry: Optional[tuple] = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+
+class SingleFlight:
+    """
+    Thread-safe deduplication of concurrent identical calls
+
+    The first caller for a key becomes its leader and performs the work; callers
+    arriving while it is in flight wait for and share the leader's result.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Future], Dict[Hashable, Future]]:
+        """
+        Become leader for every key not already in flight
+
+        The caller must resolve each led key with resolve(), even on failure,
+        and do so before waiting on any followed key, so that two callers
+        leading each other's keys cannot deadlock.
+
+        Args:
+            keys: Keys the caller is about to fetch
+
+        Returns:
+            (led, followed): futures for keys the caller now leads, and
+            futures of other callers' in-flight work for the remaining keys
+        """
+        led: Dict[Hashable, Future] = {}
+        followed: Dict[Hashable, Future] = {}
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    led[key] = self._calls[key] = Future()
+                else:
+                    followed[key] = future
+        return led, followed
+
+    def resolve(self, key: Hashable, result: Any):
+        """Publish a led key's result to its followers and end the flight"""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
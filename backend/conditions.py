@@ -0,0 +1,302 @@
+import math
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from weather_models import CATEGORY_RANK, Metar, Taf, TafPeriod, latest_metars, worse_category
+
+# Minutes either side of each airport's ETA that the forecast is evaluated over
+ETA_WINDOW_MINUTES = int(os.environ.get("ETA_WINDOW_MINUTES", 60))
+
+# Crosswind (kt) above which a runway is flagged; defaults to a typical light single demonstrated value
+CROSSWIND_LIMIT_KT = float(os.environ.get("CROSSWIND_LIMIT_KT", 15))
+
+GO = 'GO'
+CAUTION = 'CAUTION'
+NO_GO = 'NO-GO'
+
+# Hours and/or minutes, e.g. '2h 30m', '1h30m', '1hr30min', '1h30', '1.5h', '45 min'
+_DURATION_PATTERN = re.compile(
+    r'(?:(?P<hours>\d+(?:\.\d+)?)\s*(?:hours|hour|hrs|hr|h)(?![a-z])\s*(?:,|and)?\s*)?'
+    r'(?:(?P<minutes>\d+(?:\.\d+)?)\s*(?:minutes|minute|mins|min|m)?(?![a-z]))?')
+
+
+def parse_takeoff_time(value: str) -> Optional[datetime]:
+    """
+    Planned takeoff as an aware UTC datetime
+
+    Times without an offset (the form's datetime-local value) are taken as Zulu.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_enroute(value: str) -> Optional[timedelta]:
+    """
+    Estimated time enroute from '2h 30m', '1h30', '1:15', '1.5h', whole minutes ('90')
+    or decimal hours ('1.5')
+
+    Returns None for anything else rather than guessing at part of the text.
+    """
+    text = str(value or '').strip().lower()
+    if not text:
+        return None
+    if re.fullmatch(r'\d{1,2}:\d{2}', text):
+        hours, minutes = text.split(':')
+        return timedelta(hours=int(hours), minutes=int(minutes))
+    if re.fullmatch(r'\d+', text):
+        return timedelta(minutes=int(text))
+    if re.fullmatch(r'\d*\.\d+', text):
+        return timedelta(hours=float(text))
+    match = _DURATION_PATTERN.fullmatch(text)
+    if match is None or not (match.group('hours') or match.group('minutes')):
+        return None
+    return timedelta(hours=float(match.group('hours') or 0), minutes=float(match.group('minutes') or 0))
+
+
+def runway_headings(airport: Dict) -> List[Tuple[str, float]]:
+    """(runway end, heading in degrees) for every usable runway end of an airport record"""
+    headings = []
+    for runway in airport.get('runways') or []:
+        if not isinstance(runway, dict):
+            continue
+        ends = str(runway.get('id') or '').upper().split('/')
+        try:
+            alignment = float(runway.get('alignment'))
+        except (TypeError, ValueError):
+            alignment = None
+        for index, end in enumerate(ends):
+            number = re.match(r'(\d{1,2})[LRC]?$', end.strip())
+            if alignment is not None:
+                heading = (alignment + 180 * index) % 360
+            elif number:
+                heading = int(number.group(1)) * 10 % 360
+            else:
+                continue
+            headings.append((end.strip(), heading))
+    return headings
+
+
+def wind_components(wind_dir: float, wind_speed: float, runway_heading: float) -> Tuple[float, float]:
+    """(crosswind, headwind) in knots; a negative headwind is a tailwind"""
+    angle = math.radians(wind_dir - runway_heading)
+    return abs(wind_speed * math.sin(angle)), wind_speed * math.cos(angle)
+
+
+def best_runway(airport: Optional[Dict], wind_dir, wind_speed: Optional[float]) -> Optional[Dict]:
+    """Runway end with the least crosswind (ties broken by most headwind) for the given wind"""
+    if not airport or wind_speed is None:
+        return None
+    best = None
+    for end, heading in runway_headings(airport):
+        if wind_dir == 'VRB' or wind_dir is None:
+            # Variable wind may come from any direction: assume full crosswind
+            crosswind, headwind = float(wind_speed), 0.0
+        else:
+            crosswind, headwind = wind_components(float(wind_dir), float(wind_speed), heading)
+        if best is None or (crosswind, -headwind) < (best['crosswind_kt'], -best['headwind_kt']):
+            best = {'runway': end, 'crosswind_kt': round(crosswind, 1), 'headwind_kt': round(headwind, 1)}
+    return best
+
+
+def _strongest_wind(periods: Sequence[TafPeriod]) -> Tuple[Optional[object], Optional[int]]:
+    """Direction and speed of the strongest forecast wind (gusts included) among the periods"""
+    strongest = (None, None)
+    for period in periods:
+        speed = max(period.wind_speed_kt or 0, period.wind_gust_kt or 0) if period.wind_speed_kt is not None else None
+        if speed is not None and (strongest[1] is None or speed > strongest[1]):
+            strongest = (period.wind_dir, speed)
+    return strongest
+
+
+class AirportConditions:
+    """Deterministic conditions at one airport for the window around its planned time"""
+
+    __slots__ = ('station', 'role', 'time', 'window_start', 'window_end', 'flight_category',
+                 'source', 'wind_dir', 'wind_speed_kt', 'runway', 'crosswind_kt', 'headwind_kt')
+
+    def __init__(self, station: str, role: str, time: datetime, window_start: datetime, window_end: datetime):
+        self.station = station
+        self.role = role
+        self.time = time
+        self.window_start = window_start
+        self.window_end = window_end
+        self.flight_category: Optional[str] = None
+        self.source: Optional[str] = None
+        self.wind_dir = None
+        self.wind_speed_kt: Optional[int] = None
+        self.runway: Optional[str] = None
+        self.crosswind_kt: Optional[float] = None
+        self.headwind_kt: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "station": self.station,
+            "role": self.role,
+            "time": self.time.strftime('%Y-%m-%dT%H:%MZ'),
+            "window": [self.window_start.strftime('%Y-%m-%dT%H:%MZ'), self.window_end.strftime('%Y-%m-%dT%H:%MZ')],
+            "flight_category": self.flight_category,
+            "source": self.source,
+            "wind_dir": self.wind_dir,
+            "wind_speed_kt": self.wind_speed_kt,
+            "runway": self.runway,
+            "crosswind_kt": self.crosswind_kt,
+            "headwind_kt": self.headwind_kt,
+        }
+
+
+def _codes(value: str) -> List[str]:
+    return list(dict.fromkeys(code.strip().upper() for code in (value or '').split(',') if code.strip()))
+
+
+def _airport_index(airports: Optional[List[Dict]]) -> Dict[str, Dict]:
+    index = {}
+    for airport in airports or []:
+        for field in ('icaoId', 'faaId', 'iataId'):
+            if airport.get(field):
+                index[str(airport[field]).upper()] = airport
+    return index
+
+
+def compute_conditions(pilot_data, metars: Sequence[Metar], tafs: Sequence[Taf],
+                       airports: Optional[List[Dict]] = None, now: Optional[datetime] = None,
+                       window_minutes: int = ETA_WINDOW_MINUTES,
+                       enroute: Optional[timedelta] = None) -> List[AirportConditions]:
+    """
+    Flight category and runway wind for every airport of the plan at its planned time
+
+    The departure is evaluated around takeoff, the destination and each
+    alternate around the ETA (takeoff + estimated enroute). The TAF is used
+    where it covers the window; the latest METAR is used instead when there
+    is no usable forecast or the window has already started.
+
+    Args:
+        pilot_data: PilotProvidedData of the plan
+        metars: Decoded METARs for the plan's airports
+        tafs: Decoded TAFs for the plan's airports
+        airports: Airport records (for runway headings)
+        now: Current time, defaults to the wall clock
+        window_minutes: Minutes either side of the planned time to evaluate
+        enroute: Time enroute used when the plan gives none (e.g. computed from winds aloft)
+
+    Returns:
+        One entry per airport in plan order (departure, destination, alternates)
+    """
+    now = now or datetime.now(timezone.utc)
+    takeoff = parse_takeoff_time(pilot_data.takeoff_time) or now
+    eta = takeoff + (parse_enroute(pilot_data.estimated_enroute) or enroute or timedelta())
+    window = timedelta(minutes=window_minutes)
+
+    planned: Dict[str, Tuple[str, datetime]] = {}
+    for code in _codes(pilot_data.departure_airport):
+        planned.setdefault(code, ('departure', takeoff))
+    for code in _codes(pilot_data.destination_airport):
+        planned.setdefault(code, ('destination', eta))
+    for code in _codes(pilot_data.alternate_airports):
+        planned.setdefault(code, ('alternate', eta))
+
+    tafs_by_station: Dict[str, List[Taf]] = {}
+    for taf in tafs or []:
+        tafs_by_station.setdefault(taf.station, []).append(taf)
+    latest = latest_metars(metars or [])
+    airport_index = _airport_index(airports)
+
+    results = []
+    for station, (role, time) in planned.items():
+        conditions = AirportConditions(station, role, time, time - window, time + window)
+        start, end = int(conditions.window_start.timestamp()), int(conditions.window_end.timestamp())
+
+        periods: List[TafPeriod] = []
+        for taf in tafs_by_station.get(station, []):
+            periods.extend(taf.periods_between(start, end))
+        for period in periods:
+            conditions.flight_category = worse_category(conditions.flight_category, period.flight_category)
+        if periods:
+            conditions.source = 'TAF'
+        wind_dir, wind_speed = _strongest_wind(periods)
+
+        metar = latest.get(station)
+        if metar is not None and (not periods or conditions.window_start <= now):
+            conditions.flight_category = worse_category(conditions.flight_category, metar.flight_category)
+            conditions.source = 'TAF+METAR' if periods else 'METAR'
+            metar_speed = max(metar.wind_speed_kt or 0, metar.wind_gust_kt or 0) \
+                if metar.wind_speed_kt is not None else None
+            if metar_speed is not None and (wind_speed is None or metar_speed > wind_speed):
+                wind_dir, wind_speed = metar.wind_dir, metar_speed
+
+        conditions.wind_dir, conditions.wind_speed_kt = wind_dir, wind_speed
+        runway = best_runway(airport_index.get(station), wind_dir, wind_speed)
+        if runway:
+            conditions.runway = runway['runway']
+            conditions.crosswind_kt = runway['crosswind_kt']
+            conditions.headwind_kt = runway['headwind_kt']
+        results.append(conditions)
+    return results
+
+
+def _instrument_rated(qualifications: str) -> bool:
+    text = str(qualifications or '').upper()
+    return 'IFR' in text or 'INSTRUMENT' in text or 'CFII' in text or 'ATP' in text
+
+
+def go_no_go(pilot_data, conditions: Sequence[AirportConditions],
+             crosswind_limit: float = CROSSWIND_LIMIT_KT) -> Dict:
+    """
+    Rule-based go/no-go from computed conditions
+
+    VFR flight (or a pilot without an instrument rating) into IFR/LIFR at the
+    departure or destination, or a crosswind above the limit there, is a
+    no-go. MVFR conditions, marginal alternates and missing data are cautions.
+
+    Returns:
+        {'decision': GO | CAUTION | NO_GO, 'reasons': [str, ...]}
+    """
+    vfr_only = str(pilot_data.flight_rules or '').upper() != 'IFR' or not _instrument_rated(pilot_data.pilot_qualifications)
+    no_go, caution = [], []
+    for airport in conditions:
+        primary = airport.role in ('departure', 'destination')
+        label = f"{airport.station} ({airport.role})"
+        rank = CATEGORY_RANK.get(airport.flight_category)
+        if rank is None:
+            caution.append(f"{label}: no forecast or observation for the planned time")
+        elif rank >= CATEGORY_RANK['IFR'] and vfr_only:
+            (no_go if primary else caution).append(f"{label}: {airport.flight_category} conditions for a VFR flight")
+        elif rank >= CATEGORY_RANK['LIFR'] and primary:
+            caution.append(f"{label}: LIFR conditions expected")
+        elif rank >= CATEGORY_RANK['MVFR'] and (vfr_only or not primary):
+            caution.append(f"{label}: {airport.flight_category} conditions expected")
+        if airport.crosswind_kt is not None and airport.crosswind_kt > crosswind_limit:
+            (no_go if primary else caution).append(
+                f"{label}: crosswind {airport.crosswind_kt:g}kt on runway {airport.runway} exceeds {crosswind_limit:g}kt")
+    if pilot_data.estimated_enroute and parse_enroute(pilot_data.estimated_enroute) is None:
+        caution.append(f"Estimated enroute '{pilot_data.estimated_enroute}' not understood and was "
+                       f"ignored for arrival times")
+    decision = NO_GO if no_go else CAUTION if caution else GO
+    return {'decision': decision, 'reasons': no_go + caution}
+
+
+def render_summary(conditions: Sequence[AirportConditions], verdict: Dict) -> str:
+    """Markdown go/no-go summary used as the briefing in quick mode"""
+    lines = [f"# Quick go/no-go: {verdict['decision']}", ""]
+    if verdict['reasons']:
+        lines.extend(f"- {reason}" for reason in verdict['reasons'])
+        lines.append("")
+    lines.append("| Airport | Role | Time (Z) | Category | Wind | Runway | Crosswind |")
+    lines.append("|---------|------|----------|----------|------|--------|-----------|")
+    for airport in conditions:
+        wind = f"{airport.wind_dir if airport.wind_dir is not None else ''}/{airport.wind_speed_kt}kt" \
+            if airport.wind_speed_kt is not None else "-"
+        crosswind = f"{airport.crosswind_kt:g}kt" if airport.crosswind_kt is not None else "-"
+        lines.append(f"| {airport.station} | {airport.role} | {airport.time.strftime('%d %H:%M')} | "
+                     f"{airport.flight_category or 'unknown'} | {wind} | {airport.runway or '-'} | {crosswind} |")
+    lines.append("")
+    lines.append("_Computed from TAF/METAR only; not a substitute for a full briefing._")
+    return '\n'.join(lines)
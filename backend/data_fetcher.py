@@ -1,6 +1,224 @@
+import os
+import time
+import asyncio
+import contextvars
 import requests
 import json
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from cache import SingleFlight, TTLCache, seconds_until_next_cycle
+from http_client import http_get
+from route import LatLon, RouteCorridor, airport_positions, record_position
+from route_performance import WindsAloft, fd_forecast
+from metrics import coalesced_calls, registry, timed
+from reference_db import reference_db
+from weather_models import Metar, Taf, latest_metars
+from weather_snapshot import weather_store
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Shared by every aggregator so popular stations are fetched once per issuance cycle
+response_cache = TTLCache(max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 5000)))
+registry.register_cache('upstream', response_cache.stats)
+
+# Concurrent misses for the same cache key share one upstream call
+inflight = SingleFlight()
+
+# Freshness per product, in seconds. Routine METARs are issued shortly before the
+# top of each hour and TAFs about 20 minutes ahead of the 00/06/12/18Z cycles;
+# airport and navaid metadata changes on the scale of days.
+PRODUCT_TTLS: Dict[str, Callable[[], int]] = {
+    'metar': lambda: seconds_until_next_cycle(3600, offset=55 * 60),
+    'taf': lambda: seconds_until_next_cycle(6 * 3600, offset=5 * 3600 + 40 * 60),
+    'pirep': lambda: 300,
+    'airsigmet': lambda: 300,
+    'gairmet': lambda: 600,
+    'airport': lambda: 3 * 24 * 3600,
+    'navaid': lambda: 3 * 24 * 3600,
+    # FD winds aloft are issued about two hours after the 00/06/12/18Z data time
+    'windtemp': lambda: seconds_until_next_cycle(6 * 3600, offset=2 * 3600),
+}
+
+
+# Seconds of remaining freshness below which a cached entry is refetched; raised
+# by the background prefetcher so warm entries are renewed before they expire
+_refresh_ahead: contextvars.ContextVar[float] = contextvars.ContextVar("refresh_ahead", default=0.0)
+
+
+@contextmanager
+def refresh_ahead(seconds: float) -> Iterator[None]:
+    """Refetch cached upstream data that would expire within `seconds` (fetches started inside the block)"""
+    token = _refresh_ahead.set(seconds)
+    try:
+        yield
+    finally:
+        _refresh_ahead.reset(token)
+
+
+def _split_codes(codes: str) -> List[str]:
+    """Normalize a comma-separated identifier list, preserving order and dropping duplicates"""
+    return list(dict.fromkeys(code.strip().upper() for code in codes.split(',') if code.strip()))
+
+
+def _cached_station_query(product: str, codes: str, fetch: Callable[[str], Optional[List[Dict]]],
+                          id_fields: Tuple[str, ...] = ('icaoId',), params: Tuple = (),
+                          snapshot: bool = False, parse: Optional[Callable[[Dict], object]] = None) -> Optional[List]:
+    """
+    Serve a multi-station query from per-station cache entries, fetching only the misses
+    
+    Records are cached under (product, station, *params), so overlapping station
+    lists such as 'KSEA,KPDX' and 'KPDX,KBOE' share the KPDX entry. When snapshot
+    is set, stations covered by a fresh bulk snapshot are answered from it first.
+    Stations another request is already fetching are not requested again; the
+    caller waits for that request's result instead.
+    
+    Args:
+        product: Product name, used as cache namespace and TTL lookup
+        codes: Comma-separated station identifiers
+        fetch: Upstream call taking a comma-separated list of the missing stations
+        id_fields: Record fields that may carry the requested identifier
+        params: Extra query parameters that distinguish cache entries
+        snapshot: Whether to consult the bulk weather snapshot store
+        parse: Converts each upstream record once, before it is cached
+        
+    Returns:
+        Records for all requested stations, in request order, or None if
+        nothing was cached and the upstream call failed
+    """
+    stations = _split_codes(codes)
+    found: Dict[str, List] = {}
+    missing = []
+    for station in stations:
+        records = weather_store.get(product, station, params) if snapshot else None
+        if records is None:
+            records = response_cache.get((product, station) + params, min_ttl=_refresh_ahead.get())
+        if records is None:
+            missing.append(station)
+        else:
+            found[station] = records
+    
+    unmatched: List = []
+    failed = False
+    if missing:
+        keys = {station: (product, station) + params for station in missing}
+        led, followed = inflight.claim(keys.values())
+        leading = [station for station in missing if keys[station] in led]
+        published: Dict[str, List] = {}
+        try:
+            if leading:
+                data = fetch(','.join(leading))
+                if not isinstance(data, list):
+                    # None or an unexpected payload: treat both as a failed fetch
+                    failed = True
+                else:
+                    grouped: Dict[str, List] = {station: [] for station in leading}
+                    for record in data:
+                        station = next((str(record.get(field)).upper() for field in id_fields
+                                        if str(record.get(field) or '').upper() in grouped), None)
+                        if parse is not None:
+                            record = parse(record)
+                        if station is None:
+                            unmatched.append(record)
+                        else:
+                            grouped[station].append(record)
+                    
+                    ttl = PRODUCT_TTLS[product]()
+                    for station, records in grouped.items():
+                        # Upstream may answer under a different identifier than requested;
+                        # avoid caching an empty result for a station it might have aliased
+                        if records or not unmatched:
+                            response_cache.set(keys[station], records, ttl)
+                        found[station] = published[station] = records
+        finally:
+            # Stations that failed resolve to None, which followers treat as a failed fetch
+            for station in leading:
+                inflight.resolve(keys[station], published.get(station))
+        
+        # Stations another request was already fetching: wait for its result
+        for station in missing:
+            if keys[station] in followed:
+                coalesced_calls.inc(product)
+                records = followed[keys[station]].result()
+                if records is None:
+                    failed = True
+                else:
+                    found[station] = records
+    
+    if failed and not found and not unmatched:
+        return None
+    return [record for station in stations for record in found.get(station, [])] + unmatched
+
+
+def _cached_query(cache_key: Tuple, fetch: Callable[[], Optional[List[Dict]]]) -> Optional[List[Dict]]:
+    """
+    Serve a single upstream query from cache, fetching and storing it on a miss
+    
+    Args:
+        cache_key: Key whose first element names the product (used for the TTL)
+        fetch: Upstream call returning the records or None on error
+        
+    Returns:
+        Cached or freshly fetched records, or None if the upstream call failed
+        
+    Concurrent misses for the same key wait for a single upstream call.
+    """
+    cached = response_cache.get(cache_key, min_ttl=_refresh_ahead.get())
+    if cached is not None:
+        return cached
+    
+    _, followed = inflight.claim((cache_key,))
+    if followed:
+        coalesced_calls.inc(str(cache_key[0]))
+        return followed[cache_key].result()
+    data = None
+    try:
+        data = fetch()
+        if data is not None:
+            response_cache.set(cache_key, data, PRODUCT_TTLS[cache_key[0]]())
+    finally:
+        inflight.resolve(cache_key, data)
+    return data
+
+
+def _local_first(codes: str, lookup: Optional[Callable[[str], Optional[Dict]]],
+                 remote: Callable[[str], Optional[List[Dict]]]) -> Optional[List[Dict]]:
+    """
+    Answer identifiers from the local reference database, sending only unknown ones upstream
+    
+    Args:
+        codes: Comma-separated identifiers
+        lookup: Reference database lookup, or None when no database is loaded
+        remote: Upstream query for the identifiers not found locally
+    """
+    if lookup is None:
+        return remote(codes)
+    found, missing = [], []
+    for code in _split_codes(codes):
+        record = lookup(code)
+        if record is None:
+            missing.append(code)
+        else:
+            found.append(record)
+    if not missing:
+        return found
+    fetched = remote(','.join(missing))
+    if fetched is None and not found:
+        return None
+    return found + (fetched or [])
+
+
+def _combine(results: Iterable[Optional[List[Dict]]]) -> Optional[List[Dict]]:
+    """Concatenate the records of several queries; None only if every query failed"""
+    combined, failed = [], True
+    for records in results:
+        if records is not None:
+            combined.extend(records)
+            failed = False
+    return None if failed else combined
 
 
 class WeatherService:
@@ -8,8 +226,11 @@ class WeatherService:
     
     BASE_URL = "https://aviationweather.gov/api/data"
     
+    # Share of FD sites that must be located before a winds aloft grid is used and cached
+    WINDS_MIN_LOCATED = 0.5
+    
     @staticmethod
-    def get_metar(airport_codes: str, hours: int = 2) -> Optional[List[Dict]]:
+    def get_metar(airport_codes: str, hours: int = 2) -> Optional[List[Metar]]:
         """
         Fetch METAR data for given airport codes
         
@@ -18,24 +239,28 @@ class WeatherService:
             hours: Hours back to search (default: 2)
             
         Returns:
-            List of METAR data dictionaries or None if error
+            List of decoded METARs or None if error
         """
-        try:
-            url = f"{WeatherService.BASE_URL}/metar"
-            params = {
-                'ids': airport_codes,
-                'format': 'json',
-                'hours': hours
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching METAR data: {e}")
-            return None
+        def fetch(codes: str) -> Optional[List[Dict]]:
+            try:
+                url = f"{WeatherService.BASE_URL}/metar"
+                params = {
+                    'ids': codes,
+                    'format': 'json',
+                    'hours': hours
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching METAR data: {e}")
+                return None
+        
+        return _cached_station_query('metar', airport_codes, fetch, params=(hours,), snapshot=True,
+                                     parse=Metar.from_record)
     
     @staticmethod
-    def get_taf(airport_codes: str) -> Optional[List[Dict]]:
+    def get_taf(airport_codes: str) -> Optional[List[Taf]]:
         """
         Fetch TAF data for given airport codes
         
@@ -43,20 +268,23 @@ class WeatherService:
             airport_codes: Comma-separated airport codes (e.g., 'KRNT,KORD')
             
         Returns:
-            List of TAF data dictionaries or None if error
+            List of decoded TAFs or None if error
         """
-        try:
-            url = f"{WeatherService.BASE_URL}/taf"
-            params = {
-                'ids': airport_codes,
-                'format': 'json'
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching TAF data: {e}")
-            return None
+        def fetch(codes: str) -> Optional[List[Dict]]:
+            try:
+                url = f"{WeatherService.BASE_URL}/taf"
+                params = {
+                    'ids': codes,
+                    'format': 'json'
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching TAF data: {e}")
+                return None
+        
+        return _cached_station_query('taf', airport_codes, fetch, snapshot=True, parse=Taf.from_record)
     
     @staticmethod
     def get_pireps(airport_code: str, distance: int = 50) -> Optional[List[Dict]]:
@@ -70,20 +298,143 @@ class WeatherService:
         Returns:
             List of PIREP data dictionaries or None if error
         """
-        try:
-            url = f"{WeatherService.BASE_URL}/pirep"
-            params = {
-                'id': airport_code,
-                'distance': distance,
-                'format': 'json',
-                'age': 6  # 6 hours back
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching PIREP data: {e}")
-            return None
+        def fetch() -> Optional[List[Dict]]:
+            try:
+                url = f"{WeatherService.BASE_URL}/pirep"
+                params = {
+                    'id': airport_code,
+                    'distance': distance,
+                    'format': 'json',
+                    'age': 6  # 6 hours back
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching PIREP data: {e}")
+                return None
+        
+        return _cached_query(('pirep', airport_code.strip().upper(), distance), fetch)
+    
+    @staticmethod
+    def get_pireps_bbox(bbox: str) -> Optional[List[Dict]]:
+        """
+        Fetch PIREP data inside a bounding box
+        
+        Args:
+            bbox: Bounding box as 'lat0,lon0,lat1,lon1'
+            
+        Returns:
+            List of PIREP data dictionaries or None if error
+        """
+        def fetch() -> Optional[List[Dict]]:
+            try:
+                url = f"{WeatherService.BASE_URL}/pirep"
+                params = {
+                    'bbox': bbox,
+                    'format': 'json',
+                    'age': 6  # 6 hours back
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching PIREP data: {e}")
+                return None
+        
+        return _cached_query(('pirep', bbox), fetch)
+    
+    @staticmethod
+    def get_airsigmets() -> Optional[List[Dict]]:
+        """
+        Fetch current domestic SIGMETs for the contiguous US
+        
+        The endpoint has no spatial filter, so one cached copy serves every route.
+        
+        Returns:
+            List of SIGMET dictionaries or None if error
+        """
+        def fetch() -> Optional[List[Dict]]:
+            try:
+                url = f"{WeatherService.BASE_URL}/airsigmet"
+                params = {
+                    'format': 'json'
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching SIGMET data: {e}")
+                return None
+        
+        return _cached_query(('airsigmet',), fetch)
+    
+    @staticmethod
+    def get_gairmets() -> Optional[List[Dict]]:
+        """
+        Fetch current G-AIRMETs for the contiguous US
+        
+        Returns:
+            List of G-AIRMET dictionaries or None if error
+        """
+        def fetch() -> Optional[List[Dict]]:
+            try:
+                url = f"{WeatherService.BASE_URL}/gairmet"
+                params = {
+                    'format': 'json'
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching G-AIRMET data: {e}")
+                return None
+        
+        return _cached_query(('gairmet',), fetch)
+    
+    @staticmethod
+    def get_windtemp(forecast: str = '06', region: str = 'us', level: str = 'low') -> Optional[WindsAloft]:
+        """
+        Fetch the FD winds and temperatures aloft forecast
+        
+        The bulletin is decoded and its stations located once per forecast
+        cycle; the cached grid then serves every route in the region.
+        
+        Args:
+            forecast: Forecast period ('06', '12' or '24' hours)
+            region: FD region (e.g. 'us' for the contiguous states)
+            level: 'low' (3000-39000ft) or 'high'
+            
+        Returns:
+            Decoded forecast with station positions, or None if error or
+            too few of its sites could be located
+        """
+        def fetch() -> Optional[WindsAloft]:
+            try:
+                url = f"{WeatherService.BASE_URL}/windtemp"
+                params = {
+                    'region': region,
+                    'level': level,
+                    'fcst': forecast
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"Error fetching winds aloft data: {e}")
+                return None
+            winds = WindsAloft.parse(response.text)
+            if winds is None:
+                print("Error decoding winds aloft data: no level header")
+                return None
+            winds.locate(AirportService.locate_stations(list(winds.stations), region))
+            located = len(winds.positions)
+            if not located or located < WeatherService.WINDS_MIN_LOCATED * len(winds.stations):
+                # Likely a failed position lookup; don't cache a grid that would skew every route
+                print(f"Error locating winds aloft sites: {located} of {len(winds.stations)} found")
+                return None
+            return winds
+        
+        return _cached_query(('windtemp', region, level, forecast), fetch)
 
 
 class AirportService:
@@ -91,6 +442,17 @@ class AirportService:
     
     BASE_URL = "https://aviationweather.gov/api/data"
     
+    # aviationweather.gov serves FAA navaids; where an identifier is reused abroad,
+    # local lookups prefer the US and its territories to match it
+    NAVAID_COUNTRIES = ('US', 'PR', 'VI', 'GU', 'MP', 'AS')
+    
+    # ICAO prefixes of airports that FD bulletins name by their three-letter identifier
+    FD_REGION_PREFIXES = {
+        'alaska': ('PA', 'PF', 'PO', 'PP'),
+        'hawaii': ('PH',),
+        'other_pac': ('PG', 'PK', 'PT', 'PW', 'NS'),
+    }
+    
     @staticmethod
     def get_airport_info(airport_codes: str) -> Optional[List[Dict]]:
         """
@@ -102,18 +464,25 @@ class AirportService:
         Returns:
             List of airport info dictionaries or None if error
         """
-        try:
-            url = f"{AirportService.BASE_URL}/airport"
-            params = {
-                'ids': airport_codes,
-                'format': 'json'
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching airport info: {e}")
-            return None
+        def fetch(codes: str) -> Optional[List[Dict]]:
+            try:
+                url = f"{AirportService.BASE_URL}/airport"
+                params = {
+                    'ids': codes,
+                    'format': 'json'
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching airport info: {e}")
+                return None
+        
+        return _local_first(
+            airport_codes,
+            reference_db.get_airport if reference_db is not None else None,
+            lambda codes: _cached_station_query('airport', codes, fetch, id_fields=('icaoId', 'faaId', 'iataId'))
+        )
     
     @staticmethod
     def get_navaid_info(navaid_ids: str) -> Optional[List[Dict]]:
@@ -126,69 +495,323 @@ class AirportService:
         Returns:
             List of navaid info dictionaries or None if error
         """
-        try:
-            url = f"{AirportService.BASE_URL}/navaid"
-            params = {
-                'ids': navaid_ids,
-                'format': 'json'
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching navaid info: {e}")
-            return None
+        def fetch(ids: str) -> Optional[List[Dict]]:
+            try:
+                url = f"{AirportService.BASE_URL}/navaid"
+                params = {
+                    'ids': ids,
+                    'format': 'json'
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching navaid info: {e}")
+                return None
+        
+        return _local_first(
+            navaid_ids,
+            (lambda ident: reference_db.get_navaid(ident, AirportService.NAVAID_COUNTRIES))
+            if reference_db is not None else None,
+            lambda ids: _cached_station_query('navaid', ids, fetch, id_fields=('id',))
+        )
+    
+    @staticmethod
+    def get_navaids_bbox(bbox: str) -> Optional[List[Dict]]:
+        """
+        Fetch navigational aids inside a bounding box
+        
+        Args:
+            bbox: Bounding box as 'lat0,lon0,lat1,lon1'
+            
+        Returns:
+            List of navaid info dictionaries or None if error
+        """
+        if reference_db is not None:
+            return reference_db.navaids_in_bbox(bbox)
+        
+        def fetch() -> Optional[List[Dict]]:
+            try:
+                url = f"{AirportService.BASE_URL}/navaid"
+                params = {
+                    'bbox': bbox,
+                    'format': 'json'
+                }
+                response = http_get(url, params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                print(f"Error fetching navaid info: {e}")
+                return None
+        
+        return _cached_query(('navaid', bbox), fetch)
+    
+    @staticmethod
+    def locate_stations(station_ids: List[str], region: str = 'us') -> Dict[str, LatLon]:
+        """
+        Positions of FD forecast sites, which are named by navaid or airport identifier
+        
+        Args:
+            station_ids: Three-letter site identifiers
+            region: FD region, which determines the ICAO prefix of airport sites
+            
+        Returns:
+            Mapping of identifier to (lat, lon) for the sites that were found
+        """
+        positions: Dict[str, LatLon] = {}
+        if not station_ids:
+            return positions
+        for navaid in AirportService.get_navaid_info(','.join(station_ids)) or []:
+            position = record_position(navaid)
+            if position is not None and navaid.get('id'):
+                positions[str(navaid['id']).upper()] = position
+        missing = [station for station in station_ids if station not in positions]
+        if missing:
+            prefixes = AirportService.FD_REGION_PREFIXES.get(region, ('K',))
+            airports = airport_positions(AirportService.get_airport_info(
+                ','.join(prefix + station for station in missing for prefix in prefixes)))
+            for station in missing:
+                position = airports.get(station) or next(
+                    (airports[prefix + station] for prefix in prefixes if prefix + station in airports), None)
+                if position is not None:
+                    positions[station] = position
+        return positions
 
 
 class FlightDataAggregator:
     """Main service for aggregating all flight-related data"""
     
-    def __init__(self):
+    # Overall time budget (seconds) for all upstream calls of one briefing
+    FETCH_DEADLINE = float(os.environ.get("FETCH_DEADLINE", 12))
+    
+    # Shared across aggregator instances so concurrent requests reuse worker threads
+    _executor = ThreadPoolExecutor(
+        max_workers=int(os.environ.get("FETCH_WORKERS", 32)),
+        thread_name_prefix="flight-data-fetch"
+    )
+    
+    # Half-width (nm) of the corridor around the route used to select PIREPs, advisories and navaids
+    CORRIDOR_WIDTH = float(os.environ.get("ROUTE_CORRIDOR_NM", 50))
+    
+    # Nearest suitable airports to the destination offered as alternates (needs REFERENCE_DB)
+    ALTERNATE_SUGGESTIONS = int(os.environ.get("ALTERNATE_SUGGESTIONS", 3))
+    ALTERNATE_MIN_RUNWAY_FT = int(os.environ.get("ALTERNATE_MIN_RUNWAY_FT", 3000))
+    ALTERNATE_MAX_DISTANCE_NM = float(os.environ.get("ALTERNATE_MAX_DISTANCE_NM", 100))
+    
+    # FD winds aloft region used for route performance
+    WINDS_ALOFT_REGION = os.environ.get("WINDS_ALOFT_REGION", "us")
+    
+    def __init__(self, deadline: Optional[float] = None, corridor_width: Optional[float] = None):
         self.weather_service = WeatherService()
         self.airport_service = AirportService()
+        self.deadline = deadline if deadline is not None else self.FETCH_DEADLINE
+        self.corridor_width = corridor_width if corridor_width is not None else self.CORRIDOR_WIDTH
+    
+    async def _fetch_concurrently(self, calls: Dict[str, Callable[[], Optional[List[Dict]]]],
+                                  deadline_at: Optional[float] = None) -> Dict[str, Optional[List[Dict]]]:
+        """
+        Run independent upstream calls in parallel under a shared deadline
+        
+        The blocking service calls run on the shared worker pool; the caller's
+        event loop only awaits them, so it stays free for other requests.
+        
+        Args:
+            calls: Mapping of source name to a zero-argument fetch callable
+            deadline_at: time.monotonic() value by which all calls must finish;
+                defaults to the aggregator deadline from now
+            
+        Returns:
+            Mapping of source name to its result, or None if the source failed
+            or did not finish before the deadline
+        """
+        if deadline_at is None:
+            deadline_at = time.monotonic() + self.deadline
+        
+        def traced(name: str, call: Callable[[], Optional[List[Dict]]]) -> Callable[[], Optional[List[Dict]]]:
+            def run():
+                with timed(f"fetch_{name}"):
+                    return call()
+            return run
+        
+        # Each call runs in a copy of the caller's context so its timing lands on this request
+        futures = {
+            name: asyncio.wrap_future(self._executor.submit(contextvars.copy_context().run, traced(name, call)))
+            for name, call in calls.items()
+        }
+        done, _ = await asyncio.wait(futures.values(), timeout=max(0.0, deadline_at - time.monotonic()))
+        
+        results = {}
+        for name, future in futures.items():
+            if future not in done:
+                # Cannot interrupt a running request; its result is simply discarded
+                future.cancel()
+                print(f"Data source '{name}' exceeded {self.deadline}s deadline, continuing without it")
+                results[name] = None
+            elif future.exception() is not None:
+                print(f"Data source '{name}' failed: {future.exception()}")
+                results[name] = None
+            else:
+                results[name] = future.result()
+        return results
     
-    def fetch_flight_data(self, departure_airport: str, destination_airport: str, 
-                         alternate_airports: str = "") -> Dict:
+    @staticmethod
+    def _airport_positions(airports: Optional[List[Dict]]) -> Dict[str, Tuple[float, float]]:
+        """Map every identifier of each airport record (ICAO/FAA/IATA) to its (lat, lon)"""
+        return airport_positions(airports)
+    
+    def _build_corridor(self, departure_airport: str, destination_airport: str,
+                        alternates: List[str], airports: Optional[List[Dict]]) -> Optional[RouteCorridor]:
+        """Route corridor from looked-up airport positions, or None if either endpoint is unknown"""
+        positions = self._airport_positions(airports)
+        departure = positions.get(departure_airport.strip().upper())
+        destination = positions.get(destination_airport.strip().upper())
+        if departure is None or destination is None:
+            return None
+        alternate_positions = [positions[code] for code in alternates if code in positions]
+        return RouteCorridor.from_airports(departure, destination, alternate_positions,
+                                           half_width_nm=self.corridor_width)
+    
+    def _suggest_alternates(self, destination_airport: str, exclude: List[str],
+                            airports: Optional[List[Dict]]) -> List[Dict]:
+        """Nearest suitable airports to the destination from the reference database"""
+        if reference_db is None or self.ALTERNATE_SUGGESTIONS <= 0:
+            return []
+        position = self._airport_positions(airports).get(destination_airport.strip().upper())
+        if position is None:
+            return []
+        return reference_db.nearest_airports(
+            *position,
+            count=self.ALTERNATE_SUGGESTIONS,
+            min_runway_ft=self.ALTERNATE_MIN_RUNWAY_FT,
+            max_distance_nm=self.ALTERNATE_MAX_DISTANCE_NM,
+            exclude=exclude
+        )
+    
+    async def fetch_flight_data(self, departure_airport: str, destination_airport: str, 
+                               alternate_airports: str = "", takeoff_time: Optional[datetime] = None) -> Dict:
         """
         Fetch all relevant data for a flight
         
+        All upstream sources are queried concurrently. A source that fails or
+        misses the deadline is returned empty instead of delaying the others.
+        Once airport positions are known, PIREPs and navaids are fetched with a
+        single bounding-box query each and, like SIGMETs/G-AIRMETs, clipped to
+        the route corridor. With a reference database loaded, the nearest
+        suitable airports to the destination are suggested as alternates,
+        with their current flight category. The winds aloft forecast covering
+        the takeoff time is included for route performance.
+        
         Args:
             departure_airport: Departure airport code
             destination_airport: Destination airport code
             alternate_airports: Comma-separated alternate airport codes
+            takeoff_time: Planned takeoff (UTC), defaults to now
             
         Returns:
             Dictionary containing all fetched data
         """
+        deadline_at = time.monotonic() + self.deadline
+        
         # Combine all airports for weather data
         all_airports = [departure_airport, destination_airport]
         if alternate_airports:
             all_airports.extend(alternate_airports.split(','))
         
         airport_codes = ','.join(filter(None, all_airports))
+        forecast = fd_forecast(takeoff_time or datetime.now(timezone.utc))
         
-        # Fetch weather data
-        metar_data = self.weather_service.get_metar(airport_codes)
-        taf_data = self.weather_service.get_taf(airport_codes)
+        results = await self._fetch_concurrently({
+            'metar': lambda: self.weather_service.get_metar(airport_codes),
+            'taf': lambda: self.weather_service.get_taf(airport_codes),
+            'airports': lambda: self.airport_service.get_airport_info(airport_codes),
+            'sigmets': self.weather_service.get_airsigmets,
+            'gairmets': self.weather_service.get_gairmets,
+            'winds_aloft': lambda: self.weather_service.get_windtemp(forecast, self.WINDS_ALOFT_REGION),
+        }, deadline_at)
         
-        # Fetch PIREPs for departure and destination
-        departure_pireps = self.weather_service.get_pireps(departure_airport)
-        destination_pireps = self.weather_service.get_pireps(destination_airport)
+        corridor = self._build_corridor(departure_airport, destination_airport,
+                                        _split_codes(alternate_airports), results['airports'])
+        suggestions = self._suggest_alternates(destination_airport, _split_codes(airport_codes), results['airports'])
+        suggested_codes = ','.join(airport['icaoId'] for airport in suggestions)
+        airspace_info = {}
+        navaid_info = {}
+        if corridor is not None:
+            bboxes = corridor.bboxes()
+            route_results = await self._fetch_concurrently({
+                'pireps': lambda: _combine(self.weather_service.get_pireps_bbox(bbox) for bbox in bboxes),
+                'navaids': lambda: _combine(self.airport_service.get_navaids_bbox(bbox) for bbox in bboxes),
+                'suggested_metar': lambda: self.weather_service.get_metar(suggested_codes) if suggested_codes else [],
+            }, deadline_at)
+            with timed("route_clip"):
+                pireps = corridor.clip_points(route_results['pireps'])
+                airspace_info = {
+                    'sigmets': corridor.clip_areas(results['sigmets']),
+                    'gairmets': corridor.clip_areas(results['gairmets']),
+                }
+                navaid_info = {navaid['id']: navaid for navaid in corridor.clip_points(route_results['navaids'])
+                               if navaid.get('id')}
+        else:
+            # Without airport positions fall back to radial searches around the endpoints
+            radial = await self._fetch_concurrently({
+                'departure_pireps': lambda: self.weather_service.get_pireps(departure_airport),
+                'destination_pireps': lambda: self.weather_service.get_pireps(destination_airport),
+            }, deadline_at)
+            pireps = (radial['departure_pireps'] or []) + (radial['destination_pireps'] or [])
+            route_results = {'suggested_metar': None}
         
-        # Fetch airport information
-        airport_info = self.airport_service.get_airport_info(airport_codes)
+        latest = latest_metars(route_results['suggested_metar'] or [])
+        suggested_alternates = [{
+            'station': airport['icaoId'],
+            'name': airport['name'],
+            'distance_nm': airport['distanceNm'],
+            'longest_runway_ft': airport['longestRunwayFt'],
+            'flight_category': latest[airport['icaoId']].flight_category if airport['icaoId'] in latest else None,
+        } for airport in suggestions]
         
         return {
             'weather': {
-                'metar': metar_data or [],
-                'taf': taf_data or [],
-                'pireps': {
-                    'departure': departure_pireps or [],
-                    'destination': destination_pireps or []
-                }
+                'metar': results['metar'] or [],
+                'taf': results['taf'] or [],
+                'pireps': pireps
             },
-            'airports': airport_info or [],
+            'airports': results['airports'] or [],
             'notams': [],  # TODO: Implement NOTAM fetching
-            'navaid_info': {},  # TODO: Implement based on route
-            'airspace_info': {}  # TODO: Implement airspace data
-        }
\ No newline at end of file
+            'navaid_info': navaid_info,
+            'airspace_info': airspace_info,
+            'suggested_alternates': suggested_alternates,
+            'winds_aloft': results['winds_aloft']
+        }
+    
+    async def fetch_batch(self, flights: Iterable[Tuple[str, str, str, Optional[datetime]]]) -> List[Dict]:
+        """
+        Fetch data for many flights, sharing upstream queries across the batch
+        
+        The union of every plan's airports is fetched first with one ids= query
+        per product, which fills the per-station cache; each plan is then
+        assembled concurrently from cache hits plus its own corridor queries
+        (plans with overlapping corridors share those too).
+        
+        Args:
+            flights: (departure, destination, alternates, takeoff time or None) per flight
+            
+        Returns:
+            One fetch_flight_data() result per flight, in input order
+        """
+        flights = list(flights)
+        deadline_at = time.monotonic() + self.deadline
+        airport_codes = ','.join(_split_codes(','.join(
+            ','.join(filter(None, flight[:3])) for flight in flights)))
+        if airport_codes:
+            await self._fetch_concurrently({
+                'metar': lambda: self.weather_service.get_metar(airport_codes),
+                'taf': lambda: self.weather_service.get_taf(airport_codes),
+                'airports': lambda: self.airport_service.get_airport_info(airport_codes),
+                'sigmets': self.weather_service.get_airsigmets,
+                'gairmets': self.weather_service.get_gairmets,
+            }, deadline_at)
+        
+        # Whatever the shared fetch left uncovered is retried per flight under a fresh deadline
+        return await asyncio.gather(*(
+            self.fetch_flight_data(departure, destination, alternates, takeoff_time)
+            for departure, destination, alternates, takeoff_time in flights
+        ))
\ No newline at end of file
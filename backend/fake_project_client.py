@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import random
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+
+from azure.ai.agents.models import (
+    AgentStreamEvent,
+    MessageDelta,
+    MessageDeltaChunk,
+    MessageDeltaTextContent,
+    MessageDeltaTextContentObject,
+    ThreadRun,
+)
+
+DEFAULT_BRIEFING = """# Flight Briefing
+
+## Weather
+Conditions at departure and destination are within limits for the planned flight.
+
+## Route
+No significant hazards reported along the route corridor.
+
+## Risk Assessment
+Low overall risk. Monitor destination trends before departure.
+
+## Alternates
+Listed alternates remain suitable.
+"""
+
+
+class _FakeStream:
+    """Async context manager yielding (event_type, event_data, None) like runs.stream()"""
+
+    def __init__(self, client: "FakeAIProjectClient", thread_id: str):
+        self._client = client
+        self._thread_id = thread_id
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self) -> AsyncIterator:
+        return self._events()
+
+    async def _events(self):
+        client = self._client
+        await asyncio.sleep(client.first_token_latency)
+        if client._should_fail():
+            yield AgentStreamEvent.THREAD_RUN_FAILED, ThreadRun(
+                id="run_failed", thread_id=self._thread_id, agent_id="fake", status="failed",
+                last_error={"code": "server_error", "message": "Simulated failure"}), None
+            return
+        chunks = client._chunks()
+        for index, text in enumerate(chunks):
+            if index:
+                await asyncio.sleep(client.chunk_delay)
+            yield AgentStreamEvent.THREAD_MESSAGE_DELTA, MessageDeltaChunk(
+                id="msg_fake",
+                delta=MessageDelta(role="assistant", content=[
+                    MessageDeltaTextContent(index=0, text=MessageDeltaTextContentObject(value=text))])
+            ), None
+        client.agents.threads._messages[self._thread_id] = "".join(chunks)
+        yield AgentStreamEvent.DONE, "[DONE]", None
+
+
+class _FakeThreads:
+    def __init__(self, client: "FakeAIProjectClient"):
+        self._client = client
+        self._messages: Dict[str, str] = {}
+        self.deleted: List[str] = []
+
+    async def create(self, messages=None, **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(self._client.control_latency)
+        return SimpleNamespace(id=f"thread_{next(self._client._ids)}")
+
+    async def delete(self, thread_id: str):
+        await asyncio.sleep(self._client.control_latency)
+        self._messages.pop(thread_id, None)
+        self.deleted.append(thread_id)
+
+
+class _FakeMessages:
+    def __init__(self, client: "FakeAIProjectClient"):
+        self._client = client
+
+    def list(self, thread_id: str, run_id: Optional[str] = None, limit: Optional[int] = None, **kwargs):
+        client = self._client
+
+        async def messages():
+            await asyncio.sleep(client.control_latency)
+            text = client.agents.threads._messages.get(thread_id)
+            if text is not None:
+                yield SimpleNamespace(run_id=run_id, role="assistant",
+                                      text_messages=[SimpleNamespace(text=SimpleNamespace(value=text))])
+        return messages()
+
+
+class _FakeRuns:
+    def __init__(self, client: "FakeAIProjectClient"):
+        self._client = client
+
+    async def stream(self, thread_id: str, agent_id: str, **kwargs) -> _FakeStream:
+        self._client.run_count += 1
+        await asyncio.sleep(self._client.control_latency)
+        return _FakeStream(self._client, thread_id)
+
+
+class _FakeAgents:
+    def __init__(self, client: "FakeAIProjectClient"):
+        self._client = client
+        self.threads = _FakeThreads(client)
+        self.messages = _FakeMessages(client)
+        self.runs = _FakeRuns(client)
+
+    async def create_thread_and_process_run(self, agent_id: str, thread=None, **kwargs) -> SimpleNamespace:
+        client = self._client
+        client.run_count += 1
+        thread_id = f"thread_{next(client._ids)}"
+        await asyncio.sleep(client.control_latency + client.run_latency)
+        if client._should_fail():
+            return SimpleNamespace(id=f"run_{thread_id}", thread_id=thread_id, status="failed",
+                                   last_error={"code": "server_error", "message": "Simulated failure"})
+        client.agents.threads._messages[thread_id] = client.briefing
+        return SimpleNamespace(id=f"run_{thread_id}", thread_id=thread_id, status="completed", last_error=None)
+
+
+class FakeAIProjectClient:
+    """
+    Offline stand-in for azure.ai.projects.aio.AIProjectClient
+
+    Implements the subset of client.agents used by FlightServiceAgent with
+    configurable latency, chunking and failure rate, so the whole pipeline can
+    be exercised and benchmarked without Azure.
+    """
+
+    def __init__(self, run_latency: float = 2.0, first_token_latency: float = 0.5,
+                 chunk_delay: float = 0.02, chunks: int = 40, control_latency: float = 0.05,
+                 failure_rate: float = 0.0, briefing: str = DEFAULT_BRIEFING, seed: Optional[int] = None):
+        """
+        Args:
+            run_latency: Seconds create_thread_and_process_run takes (model time)
+            first_token_latency: Seconds before the first streamed delta
+            chunk_delay: Seconds between streamed deltas
+            chunks: Number of deltas the briefing is split into when streaming
+            control_latency: Seconds per control-plane call (thread/message operations)
+            failure_rate: Probability that a run fails
+            briefing: Text every run answers with
+            seed: Random seed for reproducible failures
+        """
+        self.run_latency = run_latency
+        self.first_token_latency = first_token_latency
+        self.chunk_delay = chunk_delay
+        self.chunks = max(1, chunks)
+        self.control_latency = control_latency
+        self.failure_rate = failure_rate
+        self.briefing = briefing
+        self.run_count = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.agents = _FakeAgents(self)
+
+    def _should_fail(self) -> bool:
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+    def _chunks(self) -> List[str]:
+        size = max(1, -(-len(self.briefing) // self.chunks))
+        return [self.briefing[start:start + size] for start in range(0, len(self.briefing), size)]
+
+    async def close(self):
+        pass
@@ -1,29 +1,78 @@
 import os
+import time
 import asyncio
-from typing import Dict, Optional
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
 from azure.ai.projects.aio import AIProjectClient
-from azure.ai.agents.models import ListSortOrder
+from azure.ai.agents.models import (
+    AgentStreamEvent,
+    AgentThreadCreationOptions,
+    ListSortOrder,
+    MessageDeltaChunk,
+    ThreadMessageOptions,
+    ThreadRun,
+)
 from azure.identity.aio import DefaultAzureCredential
 from dotenv import load_dotenv
+from admission import AdmissionController
+from briefing_cache import BriefingCache, material_changes
+from conditions import parse_takeoff_time
+from prompt_builder import PromptBuilder, briefing_items
+from metrics import coalesced_calls, record_stage, registry, timed
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Admission priority of plans without a takeoff time (seconds until takeoff otherwise)
+UNSCHEDULED_PRIORITY = 24 * 3600.0
+
+
+class AgentRunFailed(Exception):
+    """An agent run ended without a briefing; the message is what the caller is shown"""
+
 
 class FlightServiceAgent:
     """Azure AI Agent for flight data analysis and briefing generation"""
     
-    def __init__(self):
-        """Initialize the FlightServiceAgent with Azure AI configuration"""
-        self._validate_environment()
+    def __init__(self, client: Optional[AIProjectClient] = None):
+        """
+        Initialize the FlightServiceAgent with Azure AI configuration
         
-        self._agent_id = os.environ["AGENT_ID"]
+        Args:
+            client: Preconfigured project client (e.g. FakeAIProjectClient for
+                offline benchmarks); created from the environment when None
+        """
+        if client is None:
+            self._validate_environment()
+        
+        self._agent_id = os.environ.get("AGENT_ID", "")
         self._timeout = int(os.environ.get("API_TIMEOUT", 30))
         
-        self._endpoint = os.environ["PROJECT_ENDPOINT"]
+        self._endpoint = os.environ.get("PROJECT_ENDPOINT", "")
         self._credential: Optional[DefaultAzureCredential] = None
-        self._client: Optional[AIProjectClient] = None
+        self._client: Optional[AIProjectClient] = client
         self._client_lock = asyncio.Lock()
+        
+        # Finished threads are deleted by a background task instead of on the response path
+        self._cleanup_queue: Optional[asyncio.Queue] = None
+        self._cleanup_task: Optional[asyncio.Task] = None
+        
+        # Repeated plans with unchanged weather reuse the previous briefing
+        self._briefing_cache = BriefingCache.from_environment()
+        registry.register_cache('briefing', self._briefing_cache.stats)
+        
+        # Identical analyses requested concurrently share one run: cache key -> future of its text
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Compact, token-budgeted rendering of the flight data (PROMPT_TOKEN_BUDGET)
+        self._prompt_builder = PromptBuilder()
+        
+        # Refreshes with material weather changes get an amendment instead of a full
+        # re-brief, up to this many times before the briefing is regenerated
+        self._max_amendments = int(os.environ.get("BRIEFING_MAX_AMENDMENTS", 3))
+        
+        # Caps agent runs in flight; excess callers queue by takeoff time or are shed
+        self._admission = AdmissionController.from_environment()
     
     def _validate_environment(self):
         """Validate that all required environment variables are present"""
@@ -37,55 +86,276 @@ class FlightServiceAgent:
             )
     
     async def analyze_flight_data(self, flight_info_dict: Dict) -> str:
-        """Analyze flight data using Azure AI Agent with explicit workflow (thread -> message -> run -> messages -> cleanup)."""
+        """Analyze flight data using Azure AI Agent (thread + message + run in one call -> latest message -> background cleanup)."""
+        with timed("agent_cache_lookup"):
+            cache_key = self._briefing_cache.key(flight_info_dict)
+            cached = await self._briefing_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        shared = await self._join_inflight(cache_key)
+        if shared is not None:
+            return shared
+        
+        with timed("prompt_build"):
+            base, flight_data_text, finish = self._plan_briefing(flight_info_dict)
+        if flight_data_text is None:
+            await self._briefing_cache.set(cache_key, base)
+            return base
+        
+        shared_future, granted_at = await self._admit(cache_key, flight_info_dict)
+        
+        # Run as its own task so that a caller going away does not abort a run others wait on
+        task = asyncio.ensure_future(self._run_analysis(cache_key, flight_data_text, finish))
+        
+        def done(task: asyncio.Future):
+            self._admission.release(granted_at)
+            if not shared_future.done():
+                shared_future.set_result(None if task.cancelled() or task.exception() else task.result())
+        task.add_done_callback(done)
+        try:
+            return await asyncio.shield(task)
+        except AgentRunFailed as e:
+            return str(e)
+    
+    async def _run_analysis(self, cache_key: str, flight_data_text: str, finish: Callable[[str], str]) -> str:
+        """
+        One agent run for analyze_flight_data(), storing the briefing in the cache
+        
+        Raises:
+            AgentRunFailed: The run produced no briefing, so followers must not share its result
+        """
         await self._ensure_client()
-        flight_data_text = self._build_prompt(flight_info_dict)
+        run = None
+        try:
+            # 1. Create thread with the user message and process the run
+            with timed("agent_run"):
+                run = await self._client.agents.create_thread_and_process_run(
+                    agent_id=self._agent_id,
+                    thread=AgentThreadCreationOptions(
+                        messages=[ThreadMessageOptions(role="user", content=flight_data_text)]
+                    )
+                )
 
+            if run.status == "failed":
+                raise AgentRunFailed(f"Run failed: {run.last_error}")
+
+            # 2. Fetch the run's reply
+            with timed("agent_messages_list"):
+                result_text = await self._gather_run_response(run.thread_id, run.id)
+            if not result_text:
+                raise AgentRunFailed("No response generated.")
+            briefing = finish(result_text)
+            await self._briefing_cache.set(cache_key, briefing)
+            return briefing
+        except AgentRunFailed:
+            raise
+        except Exception as e:
+            raise AgentRunFailed(f"Error during analysis workflow: {e}") from e
+        finally:
+            # 3. Cleanup thread off the response path
+            if run is not None:
+                self._schedule_thread_delete(run.thread_id)
+    
+    async def stream_flight_data(self, flight_info_dict: Dict) -> AsyncIterator[str]:
+        """Stream the briefing as text deltas while the run is in progress (thread with message -> streamed run -> background cleanup)."""
+        with timed("agent_cache_lookup"):
+            cache_key = self._briefing_cache.key(flight_info_dict)
+            cached = await self._briefing_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        # Followers of an identical analysis get its full text in one chunk when it completes
+        shared = await self._join_inflight(cache_key)
+        if shared is not None:
+            yield shared
+            return
+        
+        with timed("prompt_build"):
+            base, flight_data_text, finish = self._plan_briefing(flight_info_dict)
+        if flight_data_text is None:
+            await self._briefing_cache.set(cache_key, base)
+            yield base
+            return
+        
+        shared_future, granted_at = await self._admit(cache_key, flight_info_dict)
+        emitted: list[str] = []
+        finished = False
+        error = None
+        try:
+            if base:
+                emitted.append(base)
+                yield base
+            async for text in self._stream_run(cache_key, flight_data_text, finish):
+                emitted.append(text)
+                yield text
+            finished = True
+        except AgentRunFailed as e:
+            error = str(e)
+        finally:
+            self._admission.release(granted_at)
+            # A failed or abandoned stream resolves to None so that its followers run their own
+            if not shared_future.done():
+                shared_future.set_result("".join(emitted) if finished else None)
+        if error is not None:
+            yield error
+    
+    async def _stream_run(self, cache_key: str, flight_data_text: str,
+                          finish: Callable[[str], str]) -> AsyncIterator[str]:
+        """
+        One streamed agent run for stream_flight_data(), storing the briefing in the cache
+        
+        Raises:
+            AgentRunFailed: The run failed after yielding any partial text
+        """
+        await self._ensure_client()
         thread = None
+        collected: list[str] = []
         try:
-            # 1. Create thread
-            thread = await self._client.agents.threads.create()
-
-            # 2. Send user message
-            await self._client.agents.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=flight_data_text
-            )
+            with timed("agent_thread_create"):
+                thread = await self._client.agents.threads.create(
+                    messages=[ThreadMessageOptions(role="user", content=flight_data_text)]
+                )
 
-            # 3. Create and process run
-            run = await self._client.agents.runs.create_and_process(
+            run_started = time.perf_counter()
+            async with await self._client.agents.runs.stream(
                 thread_id=thread.id,
                 agent_id=self._agent_id
-            )
-
-            if run.status == "failed":
-                return f"Run failed: {run.last_error}"
-
-            # 4. Collect messages (stream style iteration)
-            result_text = await self._gather_run_response(thread.id, run.id)
-            return result_text or "No response generated."
+            ) as stream:
+                async for event_type, event_data, _ in stream:
+                    if isinstance(event_data, MessageDeltaChunk):
+                        if event_data.text:
+                            if not collected:
+                                record_stage("agent_first_token", time.perf_counter() - run_started)
+                            collected.append(event_data.text)
+                            yield event_data.text
+                    elif isinstance(event_data, ThreadRun) and event_data.status == "failed":
+                        raise AgentRunFailed(f"Run failed: {event_data.last_error}")
+                    elif event_type == AgentStreamEvent.ERROR:
+                        raise AgentRunFailed(f"Error during analysis workflow: {event_data}")
+            record_stage("agent_run", time.perf_counter() - run_started)
+            if collected:
+                await self._briefing_cache.set(cache_key, finish("".join(collected)))
+        except AgentRunFailed:
+            raise
         except Exception as e:
-            return f"Error during analysis workflow: {e}"
+            raise AgentRunFailed(f"Error during analysis workflow: {e}") from e
         finally:
-            # 5. Cleanup thread
+            if thread is not None:
+                self._schedule_thread_delete(thread.id)
+    
+    @staticmethod
+    def _priority(flight_info_dict: Dict) -> float:
+        """Admission priority: seconds until takeoff, so imminent departures are served first"""
+        takeoff = parse_takeoff_time((flight_info_dict.get('pilot_data') or {}).get('takeoff_time'))
+        if takeoff is None:
+            return UNSCHEDULED_PRIORITY
+        return max(0.0, (takeoff - datetime.now(timezone.utc)).total_seconds())
+    
+    async def _admit(self, cache_key: str, flight_info_dict: Dict) -> Tuple[asyncio.Future, float]:
+        """
+        Publish the analysis as in flight, then wait for an agent run slot
+        
+        Identical requests arriving while this one is queued join it rather
+        than queueing themselves.
+        
+        Returns:
+            (shared_future, granted_at): the future followers wait on, which the
+            caller must resolve, and the slot grant time to release it with
+        
+        Raises:
+            AdmissionRejected: The agent is overloaded; followers then retry on their own
+        """
+        shared_future = asyncio.get_running_loop().create_future()
+        self._track_inflight(cache_key, shared_future)
+        try:
+            granted_at = await self._admission.acquire(self._priority(flight_info_dict))
+        except BaseException:
+            if not shared_future.done():
+                shared_future.set_result(None)
+            raise
+        return shared_future, granted_at
+    
+    def _plan_briefing(self, flight_info_dict: Dict) -> Tuple[str, Optional[str], Callable[[str], str]]:
+        """
+        Decide whether the plan's previous briefing can be reused, amended or must be redone
+        
+        Returns:
+            (base, prompt, finish): text the briefing starts with (the previous
+            briefing when reusing or amending), the agent prompt or None when
+            nothing material changed, and a callback that turns the agent's
+            reply into the full briefing and remembers it with its inputs
+        """
+        items = briefing_items(flight_info_dict)
+        plan_key = self._briefing_cache.plan_key(flight_info_dict)
+        previous = self._briefing_cache.previous(plan_key)
+        if previous is not None:
+            changes = material_changes(previous['items'], items)
+            if not changes:
+                return previous['briefing'], None, lambda reply: previous['briefing']
+            if previous['amendments'] < self._max_amendments:
+                base = f"{previous['briefing']}\n\n## Amendment {time.strftime('%H%MZ', time.gmtime())}\n\n"
+                
+                def amend(reply: str) -> str:
+                    self._briefing_cache.remember(plan_key, base + reply, items, previous['amendments'] + 1)
+                    return base + reply
+                return base, self._format_amendment(flight_info_dict, changes), amend
+        
+        def full(reply: str) -> str:
+            self._briefing_cache.remember(plan_key, reply, items)
+            return reply
+        return "", self._build_prompt(flight_info_dict), full
+    
+    async def _join_inflight(self, cache_key: str) -> Optional[str]:
+        """Wait for an identical analysis already in progress; None if there is none or it was abandoned"""
+        inflight = self._inflight.get(cache_key)
+        if inflight is None:
+            return None
+        coalesced_calls.inc("agent")
+        with timed("agent_coalesced_wait"):
+            return await asyncio.shield(inflight)
+    
+    def _track_inflight(self, cache_key: str, future: asyncio.Future):
+        """Publish an analysis in progress until it completes"""
+        self._inflight[cache_key] = future
+        
+        def forget(done: asyncio.Future):
+            if self._inflight.get(cache_key) is done:
+                del self._inflight[cache_key]
+        future.add_done_callback(forget)
+    
+    def _schedule_thread_delete(self, thread_id: str):
+        """Queue a finished thread for deletion by the background cleanup task"""
+        if self._cleanup_queue is not None:
+            self._cleanup_queue.put_nowait(thread_id)
+    
+    async def _cleanup_threads(self):
+        """Delete finished threads one by one, outside any request"""
+        while True:
+            thread_id = await self._cleanup_queue.get()
             try:
-                if thread is not None:
-                    await self._client.agents.threads.delete(thread.id)
-            except Exception:
-                pass
+                with timed("agent_thread_delete"):
+                    await self._client.agents.threads.delete(thread_id)
+            except Exception as e:
+                print(f"Error deleting agent thread {thread_id}: {e}")
+            finally:
+                self._cleanup_queue.task_done()
     
     async def _ensure_client(self):
         """Lazily create credential and client (support reuse across requests)."""
-        if self._client is not None:
+        if self._cleanup_task is not None:
             return
         async with self._client_lock:
-            if self._client is None:  # double-checked locking
+            if self._client is None:
                 self._credential = DefaultAzureCredential()
                 self._client = AIProjectClient(
                     endpoint=self._endpoint,
                     credential=self._credential,
                 )
+            if self._cleanup_task is None:  # double-checked locking
+                self._cleanup_queue = asyncio.Queue()
+                self._cleanup_task = asyncio.create_task(self._cleanup_threads())
 
     def _build_prompt(self, flight_info_dict: Dict) -> str:
         """Compose the analysis prompt from structured flight info."""
@@ -96,11 +366,7 @@ class FlightServiceAgent:
         return f"""
 Please analyze the following flight information and provide a comprehensive flight briefing:
 
-PILOT PROVIDED DATA:
-{self._format_dict(flight_info_dict.get('pilot_data', {}))}
-
-ONLINE RESOURCES (Weather, Airport Info, PIREPs):
-{self._format_dict(flight_info_dict.get('online_resources', {}))}
+{self._prompt_builder.build(flight_info_dict)}
 
 Please provide:
 1. Weather analysis and recommendations
@@ -110,67 +376,60 @@ Please provide:
 5. Overall flight briefing summary
 
 Focus on safety considerations and provide actionable recommendations for the pilot.
+Groundspeeds, times enroute and the best altitude were computed from the winds aloft forecast; use them rather than estimating your own.
 """
     
-    def _format_dict(self, data_dict: Dict, indent: int = 0) -> str:
-        """Format dictionary data for readable display"""
-        if not data_dict:
-            return "No data available"
-        
-        formatted = ""
-        indent_str = "  " * indent
-        
-        for key, value in data_dict.items():
-            if isinstance(value, dict):
-                formatted += f"{indent_str}{key}:\n{self._format_dict(value, indent + 1)}\n"
-            elif isinstance(value, list):
-                formatted += f"{indent_str}{key}: {len(value)} items\n"
-                for i, item in enumerate(value[:3]):  # Show first 3 items
-                    formatted += f"{indent_str}  [{i}]: {str(item)[:100]}...\n"
-            else:
-                formatted += f"{indent_str}{key}: {value}\n"
-        
-        return formatted
+    def _format_amendment(self, flight_info_dict: Dict, changes: list[str]) -> str:
+        """Format the changes since a flight's previous briefing for an amendment"""
+        return f"""
+This flight was briefed earlier. Since then the following data changed:
+
+{self._prompt_builder.build_amendment(flight_info_dict, changes)}
+
+Please provide a short amendment to the earlier briefing covering only these changes:
+what changed, its operational impact, and whether the overall recommendation changes.
+Do not repeat information that is unchanged.
+"""
     
     async def _gather_run_response(self, thread_id: str, run_id: str) -> Optional[str]:
-        """Iterate messages for the given run in ascending order and collect assistant text."""
+        """Fetch only the latest message produced by the given run and return its text."""
         messages = self._client.agents.messages.list(
             thread_id=thread_id,
-            order=ListSortOrder.ASCENDING
+            run_id=run_id,
+            order=ListSortOrder.DESCENDING,
+            limit=1
         )
-        collected: list[str] = []
         async for message in messages:
-            if message.run_id == run_id and getattr(message, "text_messages", None):
+            if getattr(message, "text_messages", None):
                 # The last text message chunk holds the complete value for this message
-                collected.append(message.text_messages[-1].text.value)
-        return "\n".join(collected).strip() if collected else None
+                return message.text_messages[-1].text.value.strip() or None
+            break
+        return None
     
     # Legacy methods (_extract_response, _wait_for_completion) removed in favor of direct run processing + message iteration.
     
-    def sync_analyze_flight_data(self, flight_info_dict: Dict) -> str:
-        """
-        Synchronous wrapper for the async analyze_flight_data function
-        
-        Args:
-            flight_info_dict: Dictionary containing complete flight information
-            
-        Returns:
-            str: AI analysis and briefing
-        """
-        try:
-            loop = asyncio.get_event_loop()
-            return loop.run_until_complete(self.analyze_flight_data(flight_info_dict))
-        except RuntimeError:
-            # If no event loop is running, create a new one
-            return asyncio.run(self.analyze_flight_data(flight_info_dict))
+    def clear_briefing_cache(self):
+        """Drop briefings cached in memory, e.g. between cold-cache benchmark requests"""
+        self._briefing_cache.clear()
     
     async def close(self):
         """Close the async client and credential."""
         try:
+            for future in list(self._inflight.values()):
+                future.cancel()
+            if self._cleanup_task is not None:
+                # Give queued deletions a chance to finish before the client goes away
+                try:
+                    await asyncio.wait_for(self._cleanup_queue.join(), timeout=self._timeout)
+                except asyncio.TimeoutError:
+                    print("Timed out deleting agent threads on shutdown")
+                self._cleanup_task.cancel()
             if self._client is not None:
                 await self._client.close()
             if self._credential is not None:
                 await self._credential.close()
         finally:
             self._client = None
-            self._credential = None
\ No newline at end of file
+            self._credential = None
+            self._cleanup_queue = None
+            self._cleanup_task = None
\ No newline at end of file
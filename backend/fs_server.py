@@ -1,12 +1,24 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import os
+import asyncio
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
 from models import FlightInfo
 from data_fetcher import FlightDataAggregator
 from fs_agent import FlightServiceAgent
+from admission import AdmissionRejected
+from weather_snapshot import WeatherSnapshotIngester
+from prefetch import DeparturePrefetcher
+from conditions import compute_conditions, go_no_go, parse_takeoff_time, render_summary
+from route_performance import compute_route_performance, route_enroute
+from http_client import close_session
+from metrics import registry, server_timing_header, start_request_timings, timed
+from serialization import dumps, json_response, project, requested_fields
 
 
-app = Flask(__name__)
-CORS(app)
+# ASGI app: every request shares the worker's event loop and the agent's long-lived client
+app = cors(Quart(__name__), allow_origin="*", expose_headers=["Server-Timing", "ETag"])
+# Briefings can take longer than Quart's 60s default to stream
+app.config["RESPONSE_TIMEOUT"] = int(os.environ.get("API_RESPONSE_TIMEOUT", 300))
 
 # Initialize the Flight Service Agent
 try:
@@ -16,43 +28,279 @@ except Exception as e:
     print(f"Warning: Failed to initialize Flight Service Agent: {e}")
     flight_agent = None
 
-@app.route('/api/flight', methods=['POST'])
-def flight_info():
-    data = request.json
-    flight_info_obj = FlightInfo(data)
-    
-    # Fetch online resources
-    data_aggregator = FlightDataAggregator()
-    online_data = data_aggregator.fetch_flight_data(
-        departure_airport=flight_info_obj.pilot_data.departure_airport,
-        destination_airport=flight_info_obj.pilot_data.destination_airport,
-        alternate_airports=flight_info_obj.pilot_data.alternate_airports
-    )
-    
-    # Populate online resources in flight info
+async def draft_briefing(data):
+    """Pre-generate a scheduled flight's briefing so the briefing cache can answer it"""
+    await generate_briefing(await build_flight_info(data))
+
+# Optionally keep data for flights filed ahead of takeoff warm in the background
+prefetcher = None
+if os.environ.get("PREFETCH", "").lower() in ("1", "true", "yes"):
+    draft = os.environ.get("PREFETCH_BRIEFINGS", "").lower() in ("1", "true", "yes") and flight_agent
+    prefetcher = DeparturePrefetcher(draft=draft_briefing if draft else None)
+
+# Optionally serve METAR/TAF from periodically downloaded bulk snapshots
+ingester = None
+if os.environ.get("WEATHER_SNAPSHOT", "").lower() in ("1", "true", "yes"):
+    ingester = WeatherSnapshotIngester()
+
+@app.before_serving
+async def startup():
+    if ingester:
+        ingester.start()
+    if prefetcher:
+        prefetcher.start()
+
+@app.after_serving
+async def shutdown():
+    # Stop the background jobs before closing the pooled HTTP session they download through
+    if ingester:
+        await asyncio.to_thread(ingester.stop)
+    if prefetcher:
+        await prefetcher.stop()
+    if flight_agent:
+        await flight_agent.close()
+    close_session()
+
+# Optionally report per-stage timings of each request in a Server-Timing header
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "").lower() in ("1", "true", "yes")
+
+@app.before_request
+async def begin_timing():
+    start_request_timings()
+
+@app.after_request
+async def add_timing_header(response):
+    if SERVER_TIMING_HEADER:
+        timing = server_timing_header()
+        if timing:
+            response.headers["Server-Timing"] = timing
+    return response
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Batch endpoint limits: plans per request and agent runs in flight per request
+BATCH_MAX_FLIGHTS = int(os.environ.get("BATCH_MAX_FLIGHTS", 50))
+BATCH_AGENT_CONCURRENCY = int(os.environ.get("BATCH_AGENT_CONCURRENCY", 4))
+
+def quick_mode() -> bool:
+    """?quick=true answers with the computed go/no-go only, without an agent run"""
+    return request.args.get('quick', '').lower() in ("1", "true", "yes")
+
+def schedule_if_requested(payloads):
+    """?schedule=true also files the plans for background prefetching until takeoff"""
+    if prefetcher and request.args.get('schedule', '').lower() in ("1", "true", "yes"):
+        for payload in payloads:
+            if isinstance(payload, dict):
+                prefetcher.schedule(payload)
+
+def apply_online_data(flight_info_obj: FlightInfo, online_data) -> FlightInfo:
+    """Populate online resources in flight info and compute route performance and conditions at the planned times"""
     flight_info_obj.online_resources.weather = online_data['weather']
     flight_info_obj.online_resources.airport_info = online_data['airports']
     flight_info_obj.online_resources.notams = online_data['notams']
     flight_info_obj.online_resources.navaid_info = online_data['navaid_info']
     flight_info_obj.online_resources.airspace_info = online_data['airspace_info']
+    winds_aloft = online_data.get('winds_aloft')
+    flight_info_obj.online_resources.winds_aloft = winds_aloft.to_dict() if winds_aloft else {}
     
-    # Generate AI analysis using FlightServiceAgent
-    if flight_agent:
+    with timed("route_performance"):
+        performance = compute_route_performance(flight_info_obj.pilot_data, online_data['airports'], winds_aloft)
+        flight_info_obj.ai_analysis.route_performance = performance
+    
+    with timed("conditions"):
+        conditions = compute_conditions(
+            flight_info_obj.pilot_data,
+            online_data['weather']['metar'],
+            online_data['weather']['taf'],
+            online_data['airports'],
+            enroute=route_enroute(performance)
+        )
+        flight_info_obj.ai_analysis.airport_conditions = conditions
+        flight_info_obj.ai_analysis.go_no_go = go_no_go(flight_info_obj.pilot_data, conditions)
+    flight_info_obj.ai_analysis.alternate_recommendations = online_data['suggested_alternates']
+    return flight_info_obj
+
+async def build_flight_info(data) -> FlightInfo:
+    """Create a FlightInfo from the request payload and populate its online resources"""
+    flight_info_obj = FlightInfo(data)
+    
+    # Fetch online resources
+    data_aggregator = FlightDataAggregator()
+    with timed("fetch_flight_data"):
+        online_data = await data_aggregator.fetch_flight_data(
+            departure_airport=flight_info_obj.pilot_data.departure_airport,
+            destination_airport=flight_info_obj.pilot_data.destination_airport,
+            alternate_airports=flight_info_obj.pilot_data.alternate_airports,
+            takeoff_time=parse_takeoff_time(flight_info_obj.pilot_data.takeoff_time)
+        )
+    return apply_online_data(flight_info_obj, online_data)
+
+def data_only_briefing(flight_info_obj: FlightInfo, reason: str) -> str:
+    """Computed go/no-go summary served in place of the AI briefing when the agent is overloaded"""
+    flight_info_obj.ai_analysis.degraded = reason
+    return (render_summary(flight_info_obj.ai_analysis.airport_conditions, flight_info_obj.ai_analysis.go_no_go)
+            + "\n\n_The AI briefing is unavailable under current load; showing computed conditions only. "
+              "Please retry shortly._")
+
+async def generate_briefing(flight_info_obj: FlightInfo, quick: bool = False) -> FlightInfo:
+    """Generate AI analysis using FlightServiceAgent and store it in the flight info"""
+    if quick:
+        flight_info_obj.ai_analysis.briefing = render_summary(
+            flight_info_obj.ai_analysis.airport_conditions, flight_info_obj.ai_analysis.go_no_go)
+    elif flight_agent:
         try:
             print("Generating AI analysis...")
-            ai_analysis = flight_agent.sync_analyze_flight_data(flight_info_obj.to_dict())
+            with timed("agent_analysis"):
+                ai_analysis = await flight_agent.analyze_flight_data(flight_info_obj.to_dict())
             
             # Parse the AI analysis and populate the ai_analysis object
             flight_info_obj.ai_analysis.briefing = ai_analysis
             
             print("AI analysis completed successfully")
+        except AdmissionRejected as e:
+            print(f"AI analysis shed: {e}")
+            flight_info_obj.ai_analysis.briefing = data_only_briefing(flight_info_obj, e.reason)
         except Exception as e:
             print(f"Error generating AI analysis: {e}")
             flight_info_obj.ai_analysis.briefing = f"AI analysis failed: {str(e)}"
     else:
         flight_info_obj.ai_analysis.briefing = "AI analysis unavailable - agent not initialized"
+    return flight_info_obj
+
+@app.route('/api/flight', methods=['POST'])
+async def flight_info():
+    data = await request.get_json()
+    schedule_if_requested([data])
+    flight_info_obj = await build_flight_info(data)
+    await generate_briefing(flight_info_obj, quick=quick_mode())
+    
+    with timed("serialize"):
+        return json_response({"status": "success",
+                              "flight_info": project(flight_info_obj.to_dict(), requested_fields())})
+
+def sse_event(event: str, payload) -> str:
+    """Encode one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {dumps(payload).decode('utf-8')}\n\n"
+
+@app.route('/api/flight/stream', methods=['POST'])
+async def flight_info_stream():
+    """
+    Streaming variant of /api/flight (Server-Sent Events)
     
-    return jsonify({"status": "success", "flight_info": flight_info_obj.to_dict()})
+    Emits 'flight_info' with the fetched data as soon as it is available,
+    then one 'delta' per briefing text chunk, and finally 'done'.
+    """
+    data = await request.get_json()
+    quick = quick_mode()
+    fields = requested_fields()
+    schedule_if_requested([data])
+    
+    async def generate():
+        flight_info_obj = await build_flight_info(data)
+        yield sse_event("flight_info", project(flight_info_obj.to_dict(), fields))
+        
+        if quick:
+            yield sse_event("delta", {"text": render_summary(
+                flight_info_obj.ai_analysis.airport_conditions, flight_info_obj.ai_analysis.go_no_go)})
+        elif not flight_agent:
+            yield sse_event("delta", {"text": "AI analysis unavailable - agent not initialized"})
+        else:
+            try:
+                print("Streaming AI analysis...")
+                async for text in flight_agent.stream_flight_data(flight_info_obj.to_dict()):
+                    yield sse_event("delta", {"text": text})
+                print("AI analysis stream completed")
+            except AdmissionRejected as e:
+                print(f"AI analysis shed: {e}")
+                yield sse_event("delta", {"text": data_only_briefing(flight_info_obj, e.reason)})
+            except Exception as e:
+                print(f"Error streaming AI analysis: {e}")
+                yield sse_event("error", {"message": f"AI analysis failed: {str(e)}"})
+        yield sse_event("done", {})
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/flight/batch', methods=['POST'])
+async def flight_info_batch():
+    """
+    Brief many flight plans in one call (newline-delimited JSON)
+    
+    Weather and airport data are fetched once for the union of all airports,
+    then agent runs proceed at most BATCH_AGENT_CONCURRENCY at a time. Each
+    line carries one plan's result, in completion order, tagged with its
+    index in the request.
+    """
+    data = await request.get_json()
+    payloads = data.get('flights') if isinstance(data, dict) else data
+    if not isinstance(payloads, list) or not payloads:
+        return jsonify({"status": "error", "message": "Expected a non-empty 'flights' list"}), 400
+    if len(payloads) > BATCH_MAX_FLIGHTS:
+        return jsonify({"status": "error", "message": f"At most {BATCH_MAX_FLIGHTS} flights per batch"}), 400
+    quick = quick_mode()
+    fields = requested_fields()
+    schedule_if_requested(payloads)
+    
+    async def generate():
+        flight_info_objs = [FlightInfo(payload) for payload in payloads]
+        with timed("fetch_flight_data"):
+            online_data = await FlightDataAggregator().fetch_batch(
+                (obj.pilot_data.departure_airport, obj.pilot_data.destination_airport,
+                 obj.pilot_data.alternate_airports, parse_takeoff_time(obj.pilot_data.takeoff_time))
+                for obj in flight_info_objs
+            )
+        
+        semaphore = asyncio.Semaphore(BATCH_AGENT_CONCURRENCY)
+        
+        async def brief(index: int, flight_info_obj: FlightInfo):
+            async with semaphore:
+                await generate_briefing(flight_info_obj, quick=quick)
+            return index, flight_info_obj
+        
+        tasks = [asyncio.ensure_future(brief(index, apply_online_data(obj, flight_data)))
+                 for index, (obj, flight_data) in enumerate(zip(flight_info_objs, online_data))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, flight_info_obj = await finished
+                yield dumps({"index": index, "status": "success",
+                             "flight_info": project(flight_info_obj.to_dict(), fields)}) + b"\n"
+        finally:
+            # Client went away: don't keep spending agent runs on it
+            for task in tasks:
+                task.cancel()
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/flight/schedule', methods=['POST'])
+async def schedule_flights():
+    """
+    File flight plans ahead of takeoff without briefing them yet
+    
+    Accepts one plan, a list, or {"flights": [...]}. Their weather and route
+    data are kept warm from PREFETCH_HORIZON_HOURS before takeoff, so the
+    eventual /api/flight request is served from cache.
+    """
+    if not prefetcher:
+        return jsonify({"status": "error", "message": "Prefetching is disabled (set PREFETCH=true)"}), 503
+    data = await request.get_json()
+    payloads = data.get('flights', [data]) if isinstance(data, dict) else data
+    if not isinstance(payloads, list):
+        return jsonify({"status": "error", "message": "Expected a flight plan or a 'flights' list"}), 400
+    scheduled = sum(prefetcher.schedule(payload) for payload in payloads if isinstance(payload, dict))
+    return jsonify({"status": "success", "scheduled": scheduled, "rejected": len(payloads) - scheduled})
+
+@app.route('/api/flight/schedule', methods=['GET'])
+async def list_scheduled_flights():
+    """Departures currently kept warm, soonest first"""
+    if not prefetcher:
+        return jsonify({"status": "error", "message": "Prefetching is disabled (set PREFETCH=true)"}), 503
+    return jsonify({"status": "success", "flights": prefetcher.scheduled(), **prefetcher.stats()})
 
 if __name__ == '__main__':
     app.run(port=5000, debug=True)
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from metrics import upstream_duration, upstream_requests, upstream_response_bytes
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Replaces the pooled session when set (replay cassettes, synthetic upstreams for benchmarks)
+Transport = Callable[[str, Optional[Dict], float], requests.Response]
+_transport: Optional[Transport] = None
+
+
+def _build_retry() -> Retry:
+    """Retry policy with exponential, jittered backoff that honours Retry-After"""
+    options = dict(
+        total=int(os.environ.get("HTTP_RETRIES", 3)),
+        backoff_factor=float(os.environ.get("HTTP_BACKOFF", 0.5)),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        # Jitter spreads retries from concurrent workers so they don't hit upstream in lockstep
+        return Retry(backoff_jitter=float(os.environ.get("HTTP_BACKOFF_JITTER", 0.5)), **options)
+    except TypeError:
+        # urllib3 < 2 has no jitter support
+        return Retry(**options)
+
+
+def _build_session() -> requests.Session:
+    """Create a keep-alive session with a bounded connection pool per host"""
+    pool_size = int(os.environ.get("HTTP_POOL_SIZE", 32))
+    adapter = HTTPAdapter(
+        pool_connections=int(os.environ.get("HTTP_POOL_HOSTS", 4)),
+        pool_maxsize=pool_size,
+        max_retries=_build_retry(),
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        # Decoded transparently by requests
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+        "User-Agent": "flightservice-ai",
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide HTTP session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:  # double-checked locking
+                _session = _build_session()
+    return _session
+
+
+def http_get(url: str, params: Optional[Dict] = None, timeout: float = 10) -> requests.Response:
+    """
+    Issue a GET through the shared pooled session
+
+    Args:
+        url: Request URL
+        params: Query parameters
+        timeout: Per-attempt timeout in seconds
+
+    Returns:
+        Response object; status errors are left to the caller's raise_for_status()
+    """
+    endpoint = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1] or "/"
+    start = time.perf_counter()
+    try:
+        if _transport is not None:
+            response = _transport(url, params, timeout)
+        else:
+            response = get_session().get(url, params=params, timeout=timeout)
+    except requests.RequestException:
+        upstream_requests.inc(endpoint, "error")
+        raise
+    finally:
+        upstream_duration.observe(time.perf_counter() - start, endpoint)
+    upstream_requests.inc(endpoint, str(response.status_code))
+    upstream_response_bytes.observe(len(response.content), endpoint)
+    return response
+
+
+def set_transport(transport: Optional[Transport]):
+    """Route every http_get through the given callable instead of the network (None restores it)"""
+    global _transport
+    _transport = transport
+
+
+def make_response(url: str, status_code: int, content: bytes, headers: Optional[Dict] = None) -> requests.Response:
+    """Build a requests.Response without a network round trip"""
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers or {"Content-Type": "application/json"})
+    response.encoding = "utf-8"
+    return response
+
+
+class Cassette:
+    """
+    Records upstream responses to a directory and replays them offline
+
+    Each distinct (url, params) pair is stored as one JSON file named by its
+    hash, so recordings from several sessions can be merged by copying files.
+    Multi-station queries (ids=A,B,C) are stored per station instead: which
+    stations a request asks for depends on what was already cached, so a
+    replay may combine them differently than the recording did.
+    """
+
+    # Record fields naming the station a record belongs to
+    ID_FIELDS = ("icaoId", "faaId", "iataId", "id", "stationId")
+
+    def __init__(self, directory: str, mode: str = "replay", latency: float = 0.0):
+        """
+        Args:
+            directory: Folder holding the recorded responses
+            mode: 'record' fetches from the network and saves; 'replay' only reads
+            latency: Seconds to sleep per replayed request, to simulate upstream time
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.latency = latency
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict]) -> str:
+        canonical = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())])
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, url: str, params: Optional[Dict]) -> str:
+        return os.path.join(self.directory, f"{self.key(url, params)}.json")
+
+    @staticmethod
+    def _stations(params: Optional[Dict]) -> List[str]:
+        return [code.strip().upper() for code in str((params or {}).get("ids") or "").split(",") if code.strip()]
+
+    def _save(self, path: str, entry: Dict):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+
+    def _record(self, url: str, params: Optional[Dict], response: requests.Response):
+        stations = self._stations(params)
+        try:
+            records = response.json() if stations and response.status_code == 200 else None
+        except ValueError:
+            records = None
+        if not isinstance(records, list):
+            self._save(self._path(url, params), {"url": url, "params": params, "status": response.status_code,
+                                                 "body": response.text})
+            return
+        by_station: Dict[str, List] = {station: [] for station in stations}
+        for record in records:
+            codes = [str(record.get(field) or "").upper() for field in self.ID_FIELDS] \
+                if isinstance(record, dict) else []
+            # Records answered under an unrequested alias stay with the first station
+            station = next((code for code in codes if code in by_station), stations[0])
+            by_station[station].append(record)
+        for station, station_records in by_station.items():
+            station_params = {**params, "ids": station}
+            self._save(self._path(url, station_params), {"url": url, "params": station_params, "status": 200,
+                                                         "body": json.dumps(station_records)})
+
+    def _load(self, url: str, params: Optional[Dict]) -> Dict:
+        try:
+            with open(self._path(url, params), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise requests.ConnectionError(f"No recorded response for {url} {params}")
+
+    def _replay_stations(self, url: str, params: Optional[Dict]) -> Optional[str]:
+        """Body for a multi-station query assembled from per-station recordings, if all exist"""
+        stations = self._stations(params)
+        if not stations:
+            return None
+        records = []
+        for station in stations:
+            path = self._path(url, {**params, "ids": station})
+            if not os.path.exists(path):
+                return None
+            records.extend(json.loads(self._load(url, {**params, "ids": station})["body"]))
+        return json.dumps(records)
+
+    def __call__(self, url: str, params: Optional[Dict], timeout: float) -> requests.Response:
+        if self.mode == "record":
+            response = get_session().get(url, params=params, timeout=timeout)
+            self._record(url, params, response)
+            return response
+        body = self._replay_stations(url, params)
+        if body is not None:
+            status = 200
+        else:
+            # Whole-request recording: single queries, failed responses and older recordings
+            entry = self._load(url, params)
+            status, body = entry["status"], entry["body"]
+        if self.latency:
+            time.sleep(self.latency)
+        return make_response(url, status, body.encode("utf-8"))
+
+
+def close_session():
+    """Close pooled connections (e.g. on shutdown)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# HTTP_REPLAY_DIR records to / replays from a cassette directory (HTTP_REPLAY_MODE=record|replay)
+if os.environ.get("HTTP_REPLAY_DIR"):
+    set_transport(Cassette(
+        os.environ["HTTP_REPLAY_DIR"],
+        mode=os.environ.get("HTTP_REPLAY_MODE", "replay"),
+        latency=float(os.environ.get("HTTP_REPLAY_LATENCY", 0))
+    ))
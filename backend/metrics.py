@@ -0,0 +1,195 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in Prometheus text format"""
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format"""
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._series: Dict[LabelValues, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(label_values, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[label_values] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus caches whose own counters are reported at scrape time"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._caches: Dict[str, Callable[[], Dict]] = {}
+
+    def counter(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_cache(self, name: str, stats: Callable[[], Dict]):
+        """
+        Expose a cache's hit/miss/eviction counters and size
+
+        Args:
+            name: Value of the 'cache' label
+            stats: Callable returning a TTLCache.stats()-shaped dict
+        """
+        self._caches[name] = stats
+
+    def _render_caches(self) -> List[str]:
+        snapshots = {name: stats() for name, stats in self._caches.items()}
+        lines = ["# HELP cache_entries Entries currently held", "# TYPE cache_entries gauge"]
+        lines.extend(f'cache_entries{{cache="{name}"}} {snapshot["size"]}' for name, snapshot in snapshots.items())
+        lines += ["# HELP cache_evictions_total Entries evicted to stay within size bounds",
+                  "# TYPE cache_evictions_total counter"]
+        lines.extend(f'cache_evictions_total{{cache="{name}"}} {snapshot["evictions"]}'
+                     for name, snapshot in snapshots.items())
+        for result in ("hits", "misses"):
+            lines += [f"# HELP cache_{result}_total Cache lookups by product", f"# TYPE cache_{result}_total counter"]
+            for name, snapshot in snapshots.items():
+                lines.extend(f'cache_{result}_total{{cache="{name}",product="{_escape(product)}"}} {count}'
+                             for product, count in sorted(snapshot[result].items()))
+        return lines
+
+    def render(self) -> str:
+        """Prometheus text exposition of every registered metric"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        if self._caches:
+            lines.extend(self._render_caches())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.histogram(
+    "flight_stage_duration_seconds", "Duration of briefing pipeline stages", ("stage",))
+upstream_requests = registry.counter(
+    "upstream_requests_total", "Upstream HTTP requests by endpoint and status", ("endpoint", "status"))
+upstream_duration = registry.histogram(
+    "upstream_request_duration_seconds", "Upstream HTTP request latency", ("endpoint",))
+upstream_response_bytes = registry.histogram(
+    "upstream_response_bytes", "Upstream HTTP response payload size", ("endpoint",), buckets=SIZE_BUCKETS)
+admission_decisions = registry.counter(
+    "agent_admission_total", "Agent run admission outcomes (admitted, admitted_queued, shed_<reason>)", ("outcome",))
+coalesced_calls = registry.counter(
+    "coalesced_calls_total", "Calls answered by joining an identical call already in flight", ("kind",))
+
+# Stage timings of the current request, for the optional Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar("request_timings", default=None)
+
+# Callbacks receiving every raw (stage, duration) sample, e.g. for benchmark percentiles
+_stage_listeners: List[Callable[[str, float], None]] = []
+
+
+def add_stage_listener(listener: Callable[[str, float], None]):
+    _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener: Callable[[str, float], None]):
+    _stage_listeners.remove(listener)
+
+
+def start_request_timings():
+    """Begin collecting stage timings for the current request context"""
+    _request_timings.set([])
+
+
+def record_stage(stage: str, duration: float):
+    """Record a stage duration in the histogram and the current request's timings"""
+    stage_duration.observe(duration, stage)
+    for listener in _stage_listeners:
+        listener(stage, duration)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, duration))
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing_header() -> Optional[str]:
+    """Render the current request's stage timings as a Server-Timing header value"""
+    timings = _request_timings.get()
+    if not timings:
+        return None
+    return ", ".join(f'{stage.replace(" ", "_")};dur={duration * 1000:.1f}' for stage, duration in timings)
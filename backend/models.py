@@ -1,3 +1,6 @@
+from weather_models import records_to_dicts
+
+
 class PilotProvidedData:
     def __init__(self, data):
         self.pilot_name = data.get('pilotName', '')
@@ -11,6 +14,8 @@ class PilotProvidedData:
         self.takeoff_time = data.get('takeoffTime', '')
         self.estimated_enroute = data.get('estimatedEnroute', '')
         self.alternate_airports = data.get('alternateAirports', '')
+        self.cruise_altitude = data.get('cruiseAltitude', '')
+        self.fuel_burn = data.get('fuelBurn', '')
 
     def to_dict(self):
         return {
@@ -25,6 +30,8 @@ class PilotProvidedData:
             "takeoff_time": self.takeoff_time,
             "estimated_enroute": self.estimated_enroute,
             "alternate_airports": self.alternate_airports,
+            "cruise_altitude": self.cruise_altitude,
+            "fuel_burn": self.fuel_burn,
         }
 
 
@@ -36,15 +43,19 @@ class OnlineResources:
         self.airport_info = {}
         self.navaid_info = {}
         self.airspace_info = {}
+        # Identification of the FD winds aloft forecast used for route performance
+        self.winds_aloft = {}
 
     def to_dict(self):
         return {
-            "weather": self.weather,
+            # Decoded METAR/TAF records serialize to their compact form
+            "weather": {product: records_to_dicts(records) for product, records in self.weather.items()},
             "notams": self.notams,
             "pireps": self.pireps,
             "airport_info": self.airport_info,
             "navaid_info": self.navaid_info,
             "airspace_info": self.airspace_info,
+            "winds_aloft": self.winds_aloft,
         }
 
 
@@ -56,6 +67,13 @@ class AIAnalysis:
         self.route_analysis = ""
         self.risk_assessment = ""
         self.alternate_recommendations = []
+        # Deterministic per-airport conditions at the planned times (conditions.py)
+        self.airport_conditions = []
+        self.go_no_go = {}
+        # Groundspeed/ETE/ETA per leg and time enroute per altitude from winds aloft (route_performance.py)
+        self.route_performance = {}
+        # Why the briefing is data-only (e.g. agent overloaded), None for a full briefing
+        self.degraded = None
 
     def to_dict(self):
         return {
@@ -65,6 +83,10 @@ class AIAnalysis:
             "route_analysis": self.route_analysis,
             "risk_assessment": self.risk_assessment,
             "alternate_recommendations": self.alternate_recommendations,
+            "airport_conditions": records_to_dicts(self.airport_conditions),
+            "go_no_go": self.go_no_go,
+            "route_performance": self.route_performance,
+            "degraded": self.degraded,
         }
 
 
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from conditions import parse_takeoff_time
+from data_fetcher import FlightDataAggregator, _split_codes, refresh_ahead
+from metrics import timed
+
+# Load environment variables from .env file
+load_dotenv()
+
+FlightKey = Tuple[str, str, str, str]
+
+
+class DeparturePrefetcher:
+    """
+    Keeps upstream data for scheduled departures warm in the shared response cache
+
+    Flight plans filed ahead of time are recorded with their takeoff time.
+    While a departure is within the horizon, a background task periodically
+    runs the batch fetch for all of them with refresh-ahead enabled, so
+    METAR/TAF/PIREP and advisory entries are renewed shortly before they
+    expire and request-time fetches are served from cache. Optionally a
+    draft briefing is generated after each refresh, which the briefing cache
+    then serves as long as the weather has not changed.
+    """
+
+    def __init__(self, aggregator: Optional[FlightDataAggregator] = None, interval: Optional[float] = None,
+                 horizon_hours: Optional[float] = None, max_flights: Optional[int] = None,
+                 draft: Optional[Callable[[Dict], Awaitable]] = None):
+        """
+        Args:
+            aggregator: Aggregator used for the background fetches
+            interval: Seconds between refresh passes
+            horizon_hours: Departures further ahead than this are recorded but not yet refreshed
+            max_flights: Most flights kept on the schedule (soonest departures win)
+            draft: Coroutine function called with each upcoming plan's payload
+                after a refresh, used to pre-generate briefings
+        """
+        self.aggregator = aggregator or FlightDataAggregator()
+        self.interval = interval or float(os.environ.get("PREFETCH_INTERVAL", 120))
+        self.horizon = timedelta(hours=horizon_hours if horizon_hours is not None
+                                 else float(os.environ.get("PREFETCH_HORIZON_HOURS", 6)))
+        self.max_flights = max_flights or int(os.environ.get("PREFETCH_MAX_FLIGHTS", 1000))
+        self.draft = draft
+        # Departures stay scheduled this long after takeoff, for late briefings
+        self.grace = timedelta(minutes=30)
+        self._flights: Dict[FlightKey, Tuple[datetime, Dict]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._refreshes = 0
+        self._last_refresh: Optional[float] = None
+
+    @staticmethod
+    def _key(payload: Dict) -> Optional[FlightKey]:
+        departure = str(payload.get('departureAirport') or '').strip().upper()
+        destination = str(payload.get('destinationAirport') or '').strip().upper()
+        if not departure or not destination:
+            return None
+        alternates = ','.join(_split_codes(str(payload.get('alternateAirports') or '')))
+        return departure, destination, alternates, str(payload.get('takeoffTime') or '')
+
+    def schedule(self, payload: Dict, now: Optional[datetime] = None) -> bool:
+        """
+        Record a filed flight plan for background prefetching
+
+        Call from the event loop the prefetcher was started on.
+
+        Args:
+            payload: Flight plan in the /api/flight request format
+            now: Current time (UTC), for testing
+
+        Returns:
+            True if the plan was recorded, False if it has no airports or
+            no takeoff time in the future
+        """
+        now = now or datetime.now(timezone.utc)
+        key = self._key(payload)
+        takeoff = parse_takeoff_time(payload.get('takeoffTime'))
+        if key is None or takeoff is None or takeoff + self.grace < now:
+            return False
+        with self._lock:
+            added = key not in self._flights
+            self._flights[key] = (takeoff, dict(payload))
+            if len(self._flights) > self.max_flights:
+                latest = max(self._flights, key=lambda flight: self._flights[flight][0])
+                del self._flights[latest]
+                if latest == key:
+                    return False
+        if added and self._wake is not None and takeoff - now <= self.horizon:
+            # Warm a departure inside the horizon now rather than at the next pass
+            self._wake.set()
+        return True
+
+    def upcoming(self, now: Optional[datetime] = None) -> List[Tuple[datetime, Dict]]:
+        """Drop departed flights and return (takeoff, payload) for those inside the horizon, soonest first"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            for key in [key for key, (takeoff, _) in self._flights.items() if takeoff + self.grace < now]:
+                del self._flights[key]
+            flights = [flight for flight in self._flights.values() if flight[0] - now <= self.horizon]
+        return sorted(flights, key=lambda flight: flight[0])
+
+    def scheduled(self) -> List[Dict]:
+        """Every recorded departure, soonest first"""
+        with self._lock:
+            flights = sorted(self._flights.items(), key=lambda item: item[1][0])
+        return [{'departure': key[0], 'destination': key[1], 'alternates': key[2],
+                 'takeoff_time': takeoff.isoformat()} for key, (takeoff, _) in flights]
+
+    async def refresh(self):
+        """Renew cached data for every departure inside the horizon, then draft briefings"""
+        flights = self.upcoming()
+        if not flights:
+            return
+        with timed("prefetch_refresh"), refresh_ahead(self.interval * 1.5):
+            await self.aggregator.fetch_batch(
+                (payload.get('departureAirport', ''), payload.get('destinationAirport', ''),
+                 payload.get('alternateAirports', ''), takeoff)
+                for takeoff, payload in flights
+            )
+        self._refreshes += 1
+        self._last_refresh = time.time()
+        if self.draft is not None:
+            for _, payload in flights:
+                try:
+                    await self.draft(payload)
+                except Exception as e:
+                    print(f"Draft briefing failed for {payload.get('departureAirport')}: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Prefetch refresh failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        """Start refreshing in a task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    def stats(self) -> Dict:
+        """Scheduled flight count and refresh progress"""
+        with self._lock:
+            scheduled = len(self._flights)
+        return {
+            "scheduled": scheduled,
+            "refreshes": self._refreshes,
+            "last_refresh_age": round(time.time() - self._last_refresh, 1) if self._last_refresh else None,
+        }
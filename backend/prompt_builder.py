@@ -0,0 +1,398 @@
+import math
+import os
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Sections in the order they appear in the prompt
+SECTIONS = (
+    ('pilot', "PILOT PROVIDED DATA"),
+    ('conditions', "COMPUTED CONDITIONS AT PLANNED TIMES"),
+    ('performance', "COMPUTED ROUTE PERFORMANCE (FD winds aloft forecast)"),
+    ('weather', "AIRPORT WEATHER (METAR / TAF)"),
+    ('sigmets', "SIGMETS AFFECTING ROUTE"),
+    ('pireps', "PIREPS ALONG ROUTE (nearest first)"),
+    ('gairmets', "G-AIRMETS AFFECTING ROUTE"),
+    ('airports', "AIRPORT INFORMATION"),
+    ('alternates', "SUGGESTED ALTERNATES (nearest suitable to destination)"),
+    ('navaids', "NAVAIDS NEAR ROUTE"),
+)
+
+# Lower value = included first when the budget is tight
+PRIORITY_PILOT = 0
+PRIORITY_CONDITIONS = 0
+PRIORITY_PERFORMANCE = 1
+PRIORITY_PRIMARY_WEATHER = 1
+PRIORITY_ALTERNATE_WEATHER = 2
+PRIORITY_SIGMET = 3
+PRIORITY_URGENT_PIREP = 3
+PRIORITY_PIREP = 4
+PRIORITY_AIRPORT = 5
+PRIORITY_GAIRMET = 6
+PRIORITY_OLDER_METAR = 7
+PRIORITY_NAVAID = 8
+
+PILOT_FIELDS = (
+    ('pilot_qualifications', "Pilot qualifications"),
+    ('flight_rules', "Flight rules"),
+    ('aircraft_type', "Aircraft"),
+    ('aircraft_equipment', "Equipment"),
+    ('true_airspeed', "True airspeed (kt)"),
+    ('cruise_altitude', "Planned cruise altitude"),
+    ('fuel_burn', "Fuel burn (gal/hr)"),
+    ('departure_airport', "Departure"),
+    ('destination_airport', "Destination"),
+    ('alternate_airports', "Alternates"),
+    ('takeoff_time', "Planned takeoff"),
+    ('estimated_enroute', "Estimated time enroute"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English/METAR text)"""
+    return math.ceil(len(text) / 4)
+
+
+def _codes(value: str) -> List[str]:
+    return [code.strip().upper() for code in (value or '').split(',') if code.strip()]
+
+
+def _station(record: Dict) -> str:
+    return str(record.get('station') or record.get('icaoId') or record.get('faaId') or '').upper()
+
+
+def _wind(record: Dict) -> Optional[str]:
+    if record.get('wind_speed_kt') is None:
+        return None
+    wind_dir = record.get('wind_dir')
+    wind = f"{wind_dir if wind_dir is not None else ''}/{record['wind_speed_kt']}kt"
+    if record.get('wind_gust_kt'):
+        wind += f" G{record['wind_gust_kt']}"
+    return wind
+
+
+def _metar_summary(metar: Dict) -> str:
+    """Raw METAR followed by the decoded fields the briefing hinges on"""
+    decoded = []
+    if metar.get('flight_category'):
+        decoded.append(metar['flight_category'])
+    wind = _wind(metar)
+    if wind:
+        decoded.append(f"wind {wind}")
+    if metar.get('visibility_sm') is not None:
+        decoded.append(f"vis {metar['visibility_sm']:g}sm")
+    ceiling = metar.get('ceiling_ft')
+    decoded.append(f"ceiling {ceiling}ft" if ceiling is not None else "no ceiling")
+    raw = metar.get('raw') or ''
+    if not raw.startswith(('METAR', 'SPECI')):
+        raw = f"METAR {raw}"
+    return f"{raw} [{', '.join(decoded)}]"
+
+
+def _taf_summary(taf: Dict) -> str:
+    """Raw TAF; the category at the planned times is in the computed conditions"""
+    raw = taf.get('raw') or ''
+    return raw if raw.startswith('TAF') else f"TAF {raw}"
+
+
+def _airport_summary(airport: Dict) -> str:
+    parts = [_station(airport), str(airport.get('name') or '').strip()]
+    if airport.get('elev') not in (None, ''):
+        parts.append(f"elev {airport['elev']}ft")
+    runways = [f"{runway.get('id')} {runway.get('dimension', '')}".strip()
+               for runway in airport.get('runways') or [] if isinstance(runway, dict) and runway.get('id')]
+    if runways:
+        parts.append(f"runways {', '.join(runways)}")
+    return ' | '.join(part for part in parts if part)
+
+
+def _conditions_summary(airport: Dict) -> str:
+    """One computed airport line: category, wind and runway crosswind in the ETA window"""
+    window = airport.get('window') or ['', '']
+    category = airport.get('flight_category') or 'unknown'
+    if airport.get('source'):
+        category += f" ({airport['source']})"
+    parts = [category]
+    if airport.get('wind_speed_kt') is not None:
+        wind_dir = airport.get('wind_dir')
+        parts.append(f"max wind {wind_dir if wind_dir is not None else ''}/{airport['wind_speed_kt']}kt")
+    if airport.get('runway'):
+        parts.append(f"rwy {airport['runway']} crosswind {airport.get('crosswind_kt')}kt")
+    return f"{airport.get('station')} {airport.get('role')} {window[0]} to {window[1]}: {', '.join(parts)}"
+
+
+def _duration(minutes: int) -> str:
+    return f"{minutes // 60}h{minutes % 60:02d}m"
+
+
+def _leg_summary(leg: Dict) -> str:
+    """One computed leg line: distance, course and the forecast wind's effect at the leg altitude"""
+    text = f"{leg['from']}-{leg['to']} ({leg['role']}) {leg['distance_nm']}nm course {leg['course_deg']:03d}T " \
+           f"at {leg['altitude_ft']}ft"
+    if leg.get('ete_min') is None:
+        return f"{text}: forecast wind exceeds the airspeed"
+    text += f": GS {leg['groundspeed_kt']}kt ({leg['wind_component_kt']:+d}kt wind), " \
+            f"ETE {_duration(leg['ete_min'])}, ETA {leg['eta']}"
+    if leg.get('temperature_c') is not None:
+        text += f", OAT {leg['temperature_c']}C"
+    if leg.get('fuel_gal') is not None:
+        text += f", fuel {leg['fuel_gal']:g}gal"
+    return text
+
+
+def _altitudes_summary(performance: Dict, count: int = 4) -> Optional[str]:
+    """Best altitude and the fastest alternatives for the departure -> destination leg"""
+    if performance.get('best_altitude_ft') is None:
+        return None
+    ranked = sorted((row for row in performance.get('altitudes') or [] if row.get('ete_min') is not None),
+                    key=lambda row: (row['ete_min'], row['altitude_ft']))
+    options = ', '.join(f"{row['altitude_ft']}ft {_duration(row['ete_min'])}" for row in ranked[:count])
+    return f"Best altitude by forecast winds: {performance['best_altitude_ft']}ft (ETE by altitude: {options})"
+
+
+def _pirep_is_urgent(pirep: Dict) -> bool:
+    raw = str(pirep.get('rawOb') or '')
+    return pirep.get('pirepType') == 'Urgent PIREP' or ' UUA ' in f" {raw} "
+
+
+def _advisory_summary(advisory: Dict) -> str:
+    raw = advisory.get('rawAirSigmet') or advisory.get('rawSigmet') or advisory.get('rawText')
+    if raw:
+        return ' '.join(str(raw).split())
+    parts = [str(advisory.get(field)) for field in ('hazard', 'severity', 'product', 'validTime', 'due_to')
+             if advisory.get(field)]
+    base, top = advisory.get('base'), advisory.get('top')
+    if base is not None or top is not None:
+        parts.append(f"{base or 'SFC'}-{top or '?'}ft")
+    return ' '.join(parts)
+
+
+# Wind changes below this many knots are not worth amending a briefing for
+MATERIAL_WIND_STEP_KT = 5
+# Nor are computed time enroute changes below this many minutes
+MATERIAL_ETE_STEP_MIN = 5
+
+
+def _step(value, step: int = MATERIAL_WIND_STEP_KT):
+    return None if value is None else int(value) // step
+
+
+def briefing_items(flight_info_dict: Dict) -> Dict[str, Tuple[Hashable, str]]:
+    """
+    The inputs a briefing rests on, for diffing against a later refresh
+
+    Returns:
+        Mapping of 'section:key' to (signature, display text). Items whose
+        signature is unchanged are not materially different: METARs compare
+        by flight category, wind/gust in MATERIAL_WIND_STEP_KT steps and
+        present weather; computed conditions by category and crosswind;
+        route performance by altitude and ETE in MATERIAL_ETE_STEP_MIN
+        steps; TAFs, PIREPs, advisories and airport data by their text.
+    """
+    resources = flight_info_dict.get('online_resources') or {}
+    weather = resources.get('weather') or {}
+    analysis = flight_info_dict.get('ai_analysis') or {}
+    items: Dict[str, Tuple[Hashable, str]] = {}
+
+    verdict = analysis.get('go_no_go') or {}
+    if verdict.get('decision'):
+        reasons = '; '.join(verdict.get('reasons') or []) or "no limiting factors found"
+        items['assessment:go_no_go'] = (verdict['decision'], f"Rule-based assessment: {verdict['decision']} ({reasons})")
+    for airport in analysis.get('airport_conditions') or []:
+        signature = (airport.get('flight_category'), _step(airport.get('wind_speed_kt')),
+                     airport.get('runway'), _step(airport.get('crosswind_kt')))
+        items[f"conditions:{airport.get('station')}:{airport.get('role')}"] = (signature, _conditions_summary(airport))
+    performance = analysis.get('route_performance') or {}
+    for leg in performance.get('legs') or []:
+        signature = (leg.get('altitude_ft'), _step(leg.get('ete_min'), MATERIAL_ETE_STEP_MIN))
+        items[f"performance:{leg['from']}-{leg['to']}"] = (signature, _leg_summary(leg))
+    altitudes = _altitudes_summary(performance)
+    if altitudes:
+        items['performance:best_altitude'] = (performance['best_altitude_ft'], altitudes)
+
+    for metar in sorted(weather.get('metar') or [], key=lambda m: m.get('obs_time') or ''):
+        # Later observations overwrite earlier ones: only the latest per station counts
+        signature = (metar.get('flight_category'), _step(metar.get('wind_speed_kt')),
+                     _step(metar.get('wind_gust_kt')), metar.get('weather'))
+        items[f"metar:{_station(metar)}"] = (signature, _metar_summary(metar))
+    for taf in weather.get('taf') or []:
+        if taf.get('raw'):
+            items[f"taf:{_station(taf)}"] = (taf['raw'], _taf_summary(taf))
+
+    pireps = weather.get('pireps') or []
+    if isinstance(pireps, dict):
+        pireps = [pirep for group in pireps.values() for pirep in group or []]
+    for pirep in pireps:
+        raw = ' '.join(str(pirep.get('rawOb') or '').split())
+        if raw:
+            items[f"pirep:{raw}"] = (raw, raw)
+    airspace = resources.get('airspace_info') or {}
+    for section, kind in (('sigmets', 'sigmet'), ('gairmets', 'gairmet')):
+        for advisory in airspace.get(section) or []:
+            text = _advisory_summary(advisory)
+            if text:
+                items[f"{kind}:{text}"] = (text, text)
+    for airport in resources.get('airport_info') or []:
+        text = _airport_summary(airport)
+        items[f"airport:{_station(airport)}"] = (text, text)
+    return items
+
+
+class PromptBuilder:
+    """Compiles flight info into a compact, relevance-ranked prompt within a token budget"""
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = token_budget or int(os.environ.get("PROMPT_TOKEN_BUDGET", 3000))
+
+    def build(self, flight_info_dict: Dict) -> str:
+        """
+        Render the data portion of the prompt
+
+        Items are admitted in priority order (plan, departure/destination
+        weather, alternates, hazards, PIREPs by distance, reference data)
+        until the budget is reached, then rendered grouped by section.
+        """
+        items = self._collect(flight_info_dict)
+        items.sort(key=lambda item: (item[0], item[2]))
+
+        accepted: List[Tuple[int, str, int, str]] = []
+        used = 0
+        seen = set()
+        omitted = 0
+        for item in items:
+            _, section, _, text = item
+            if (section, text) in seen:
+                continue
+            seen.add((section, text))
+            cost = estimate_tokens(text) + 1
+            if used + cost > self.token_budget and item[0] > PRIORITY_PILOT:
+                omitted += 1
+                continue
+            used += cost
+            accepted.append(item)
+
+        lines = []
+        for section, title in SECTIONS:
+            section_items = sorted((item for item in accepted if item[1] == section), key=lambda item: item[2])
+            if not section_items:
+                continue
+            lines.append(f"{title}:")
+            lines.extend(f"- {item[3]}" for item in section_items)
+            lines.append("")
+        if omitted:
+            lines.append(f"({omitted} lower-priority items omitted to fit the prompt budget)")
+        return '\n'.join(lines).strip() or "No data available"
+
+    def build_amendment(self, flight_info_dict: Dict, changes: List[str]) -> str:
+        """Render the data portion of an amendment prompt: the plan and what changed since the last briefing"""
+        pilot = flight_info_dict.get('pilot_data') or {}
+        lines = [f"{label}: {pilot[field]}" for field, label in PILOT_FIELDS
+                 if field in ('flight_rules', 'aircraft_type', 'departure_airport', 'destination_airport',
+                              'alternate_airports', 'takeoff_time') and pilot.get(field)]
+        lines += ["", "CHANGES SINCE THE PREVIOUS BRIEFING:"]
+        used = sum(estimate_tokens(line) + 1 for line in lines)
+        for index, change in enumerate(changes):
+            cost = estimate_tokens(change) + 1
+            if used + cost > self.token_budget:
+                lines.append(f"({len(changes) - index} further changes omitted to fit the prompt budget)")
+                break
+            used += cost
+            lines.append(f"- {change}")
+        return '\n'.join(lines)
+
+    def _collect(self, flight_info_dict: Dict) -> List[Tuple[int, str, int, str]]:
+        """Extract (priority, section, display order, text) items from every product"""
+        pilot = flight_info_dict.get('pilot_data') or {}
+        resources = flight_info_dict.get('online_resources') or {}
+        weather = resources.get('weather') or {}
+
+        primary = _codes(pilot.get('departure_airport')) + _codes(pilot.get('destination_airport'))
+        alternates = [code for code in _codes(pilot.get('alternate_airports')) if code not in primary]
+        route_order = {code: index for index, code in enumerate(primary + alternates)}
+        roles = {code: "departure" for code in _codes(pilot.get('departure_airport'))}
+        roles.update({code: "destination" for code in _codes(pilot.get('destination_airport'))})
+        roles.update({code: "alternate" for code in alternates})
+
+        def airport_rank(station: str) -> Tuple[int, int]:
+            order = route_order.get(station, len(route_order))
+            priority = PRIORITY_PRIMARY_WEATHER if station in primary else PRIORITY_ALTERNATE_WEATHER
+            return priority, order
+
+        items: List[Tuple[int, str, int, str]] = []
+        for index, (field, label) in enumerate(PILOT_FIELDS):
+            if pilot.get(field):
+                items.append((PRIORITY_PILOT, 'pilot', index, f"{label}: {pilot[field]}"))
+
+        # Deterministic conditions at the planned times frame the whole briefing
+        analysis = flight_info_dict.get('ai_analysis') or {}
+        for index, airport in enumerate(analysis.get('airport_conditions') or []):
+            items.append((PRIORITY_CONDITIONS, 'conditions', index, _conditions_summary(airport)))
+        verdict = analysis.get('go_no_go') or {}
+        if verdict.get('decision'):
+            reasons = '; '.join(verdict.get('reasons') or []) or "no limiting factors found"
+            items.append((PRIORITY_CONDITIONS, 'conditions', 999,
+                          f"Rule-based assessment: {verdict['decision']} ({reasons})"))
+
+        # Groundspeed and times from the winds aloft forecast replace guesses from TAS alone
+        performance = analysis.get('route_performance') or {}
+        for index, leg in enumerate(performance.get('legs') or []):
+            items.append((PRIORITY_PERFORMANCE, 'performance', index, _leg_summary(leg)))
+        altitudes = _altitudes_summary(performance)
+        if altitudes:
+            items.append((PRIORITY_PERFORMANCE, 'performance', 999, altitudes))
+
+        # Latest METAR per station is essential; older ones only show the trend
+        latest_seen = set()
+        metars = sorted(weather.get('metar') or [], key=lambda m: m.get('obs_time') or '', reverse=True)
+        for metar in metars:
+            station = _station(metar)
+            priority, order = airport_rank(station)
+            if station in latest_seen:
+                priority = PRIORITY_OLDER_METAR
+            latest_seen.add(station)
+            role = roles.get(station, "other")
+            items.append((priority, 'weather', order * 1000 + len(items),
+                          f"{station} ({role}) {_metar_summary(metar)}"))
+        for taf in weather.get('taf') or []:
+            station = _station(taf)
+            priority, order = airport_rank(station)
+            if taf.get('raw'):
+                items.append((priority, 'weather', order * 1000 + 999, f"{station} {_taf_summary(taf)}"))
+
+        pireps = weather.get('pireps') or []
+        if isinstance(pireps, dict):
+            pireps = [pirep for group in pireps.values() for pirep in group or []]
+        pireps = sorted(pireps, key=lambda p: p.get('routeDistanceNm', math.inf))
+        for order, pirep in enumerate(pireps):
+            raw = ' '.join(str(pirep.get('rawOb') or '').split())
+            if not raw:
+                continue
+            priority = PRIORITY_URGENT_PIREP if _pirep_is_urgent(pirep) else PRIORITY_PIREP
+            distance = pirep.get('routeDistanceNm')
+            suffix = f" ({distance}nm from route)" if distance is not None else ""
+            items.append((priority, 'pireps', order, raw + suffix))
+
+        airspace = resources.get('airspace_info') or {}
+        for order, sigmet in enumerate(airspace.get('sigmets') or []):
+            items.append((PRIORITY_SIGMET, 'sigmets', order, _advisory_summary(sigmet)))
+        for order, gairmet in enumerate(airspace.get('gairmets') or []):
+            items.append((PRIORITY_GAIRMET, 'gairmets', order, _advisory_summary(gairmet)))
+
+        for airport in resources.get('airport_info') or []:
+            station = _station(airport)
+            _, order = airport_rank(station)
+            items.append((PRIORITY_AIRPORT, 'airports', order, _airport_summary(airport)))
+
+        for order, airport in enumerate(analysis.get('alternate_recommendations') or []):
+            if isinstance(airport, dict) and airport.get('station'):
+                items.append((PRIORITY_AIRPORT, 'alternates', order,
+                              f"{airport['station']} {airport.get('name') or ''} | {airport.get('distance_nm')}nm | "
+                              f"longest runway {airport.get('longest_runway_ft')}ft | "
+                              f"{airport.get('flight_category') or 'no current METAR'}"))
+
+        navaids = resources.get('navaid_info') or {}
+        navaids = list(navaids.values()) if isinstance(navaids, dict) else navaids
+        navaids = sorted(navaids, key=lambda n: n.get('routeDistanceNm', math.inf))
+        for order, navaid in enumerate(navaids):
+            text = ' '.join(str(navaid.get(field)) for field in ('id', 'type', 'freq', 'name') if navaid.get(field))
+            items.append((PRIORITY_NAVAID, 'navaids', order, text))
+
+        return [item for item in items if item[3]]
@@ -0,0 +1,420 @@
+import argparse
+import bisect
+import csv
+import json
+import math
+import mmap
+import os
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from route import haversine_nm
+
+# Load environment variables from .env file
+load_dotenv()
+
+MAGIC = b'FSRF'
+VERSION = 2
+
+# Section table: (offset, count) for airports, navaids, airport cells, navaid cells,
+# airport idents, navaid idents, strings
+HEADER = struct.Struct('<4sH' + 'II' * 7)
+# icao, iata, local, lat, lon, elev, longest open runway, type, flags, name, runways JSON
+AIRPORT = struct.Struct('<8s4s8sffiHBBIHIH')
+# ident, type, frequency (kHz), lat, lon, ISO country, name
+NAVAID = struct.Struct('<8sBIff2sIH')
+# grid cell key, first record, record count
+CELL = struct.Struct('<iII')
+# identifier, record index (navaid identifiers repeat across countries, one entry each)
+IDENT = struct.Struct('<8sI')
+
+AIRPORT_TYPES = ('large_airport', 'medium_airport', 'small_airport', 'heliport', 'seaplane_base', 'balloonport')
+NAVAID_TYPES = ('VOR', 'VOR-DME', 'VORTAC', 'DME', 'TACAN', 'NDB', 'NDB-DME')
+# Navaids whose frequency is published in MHz rather than kHz
+MHZ_NAVAIDS = ('VOR', 'VOR-DME', 'VORTAC', 'DME', 'TACAN')
+
+FLAG_LIGHTED = 1
+FLAG_HARD_SURFACE = 2
+
+HARD_SURFACES = ('ASP', 'CON', 'PEM', 'BIT', 'TAR')
+
+
+def cell_key(lat: float, lon: float) -> int:
+    """1-degree grid cell containing a point"""
+    return _cell(int(math.floor(lat)) + 90, int(math.floor(lon)) + 180)
+
+
+def _cell(lat_index: int, lon_index: int) -> int:
+    return min(max(lat_index, 0), 180) * 361 + lon_index % 360
+
+
+def _encode(value: str, size: int) -> bytes:
+    return str(value or '').strip().upper().encode('ascii', 'ignore')[:size]
+
+
+def _decode(value: bytes) -> str:
+    return value.rstrip(b'\0').decode('ascii')
+
+
+def _number(value, default=0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _KeyView(Sequence):
+    """Sorted identifier keys of an ident section, bisectable straight from the mapping"""
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        return IDENT.unpack_from(self._buffer, self._offset + index * IDENT.size)[0]
+
+    def record(self, index: int) -> int:
+        return IDENT.unpack_from(self._buffer, self._offset + index * IDENT.size)[1]
+
+
+class ReferenceDatabase:
+    """
+    Memory-mapped airport/navaid reference data with a spatial grid index
+
+    Records are fixed-size structs sorted by 1-degree grid cell, so a cell's
+    records are contiguous and only the pages actually touched are read.
+    Identifier lookups bisect a sorted key table in O(log n).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._buffer, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} reference database")
+        sections = list(zip(header[2::2], header[3::2]))
+        (self._airports, self._airport_count), (self._navaids, self._navaid_count) = sections[0], sections[1]
+        self._airport_cells = self._load_cells(*sections[2])
+        self._navaid_cells = self._load_cells(*sections[3])
+        self._airport_idents = _KeyView(self._buffer, *sections[4])
+        self._navaid_idents = _KeyView(self._buffer, *sections[5])
+        self._strings = sections[6][0]
+
+    @classmethod
+    def from_environment(cls) -> Optional["ReferenceDatabase"]:
+        """Open the database named by REFERENCE_DB, or None when not configured"""
+        path = os.environ.get("REFERENCE_DB")
+        if not path:
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: reference database unavailable, using network lookups: {e}")
+            return None
+
+    def _load_cells(self, offset: int, count: int) -> Dict[int, Tuple[int, int]]:
+        """Cell table is small (at most one entry per occupied square degree), so keep it as a dict"""
+        return {key: (start, length) for key, start, length in
+                (CELL.unpack_from(self._buffer, offset + index * CELL.size) for index in range(count))}
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings + offset
+        return self._buffer[start:start + length].decode('utf-8')
+
+    def _airport(self, index: int) -> Dict:
+        icao, iata, local, lat, lon, elev, longest, kind, flags, name_offset, name_length, \
+            runways_offset, runways_length = AIRPORT.unpack_from(self._buffer, self._airports + index * AIRPORT.size)
+        return {
+            'icaoId': _decode(icao),
+            'iataId': _decode(iata) or None,
+            'faaId': _decode(local) or None,
+            'name': self._string(name_offset, name_length),
+            'lat': round(lat, 5),
+            'lon': round(lon, 5),
+            'elev': elev,
+            'type': AIRPORT_TYPES[kind] if kind < len(AIRPORT_TYPES) else None,
+            'longestRunwayFt': longest,
+            'lighted': bool(flags & FLAG_LIGHTED),
+            'hardSurface': bool(flags & FLAG_HARD_SURFACE),
+            'runways': json.loads(self._string(runways_offset, runways_length) or '[]'),
+        }
+
+    def _airport_summary(self, index: int) -> Tuple[Tuple[bytes, ...], float, float, int, int, int]:
+        """(identifiers, lat, lon, longest runway, type, flags) without decoding strings"""
+        icao, iata, local, lat, lon, _, longest, kind, flags, *_ = \
+            AIRPORT.unpack_from(self._buffer, self._airports + index * AIRPORT.size)
+        return (icao, iata, local), lat, lon, longest, kind, flags
+
+    def _navaid(self, index: int) -> Dict:
+        ident, kind, frequency, lat, lon, country, name_offset, name_length = \
+            NAVAID.unpack_from(self._buffer, self._navaids + index * NAVAID.size)
+        kind_name = NAVAID_TYPES[kind] if kind < len(NAVAID_TYPES) else None
+        return {
+            'id': _decode(ident),
+            'type': kind_name,
+            'name': self._string(name_offset, name_length),
+            'freq': frequency / 1000 if kind_name in MHZ_NAVAIDS else frequency,
+            'lat': round(lat, 5),
+            'lon': round(lon, 5),
+            'country': _decode(country) or None,
+        }
+
+    @staticmethod
+    def _find_all(idents: _KeyView, ident: str) -> List[int]:
+        """Record indexes of every entry with the identifier (bisect to the first, then scan)"""
+        key = _encode(ident, 8).ljust(8, b'\0')
+        position = bisect.bisect_left(idents, key)
+        indexes = []
+        while position < len(idents) and idents[position] == key:
+            indexes.append(idents.record(position))
+            position += 1
+        return indexes
+
+    @classmethod
+    def _find(cls, idents: _KeyView, ident: str) -> Optional[int]:
+        indexes = cls._find_all(idents, ident)
+        return indexes[0] if indexes else None
+
+    def get_airport(self, ident: str) -> Optional[Dict]:
+        """Airport by ICAO, IATA or FAA/local identifier"""
+        index = self._find(self._airport_idents, ident)
+        return self._airport(index) if index is not None else None
+
+    def get_navaid(self, ident: str, countries: Sequence[str] = (),
+                   near: Optional[Tuple[float, float]] = None) -> Optional[Dict]:
+        """
+        Navaid by identifier
+
+        Identifiers are only unique within a country, so when several navaids
+        share one, those in `countries` are preferred, then the one nearest
+        to `near`, then the first in the table.
+
+        Args:
+            ident: Navaid identifier
+            countries: ISO country codes to prefer, e.g. ('US',)
+            near: (lat, lon) reference point for choosing among the rest
+        """
+        candidates = [self._navaid(index) for index in self._find_all(self._navaid_idents, ident)]
+        preferred = [navaid for navaid in candidates if navaid['country'] in countries]
+        candidates = preferred or candidates
+        if not candidates:
+            return None
+        if near is not None:
+            return min(candidates, key=lambda navaid: haversine_nm(*near, navaid['lat'], navaid['lon']))
+        return candidates[0]
+
+    @staticmethod
+    def _cells_in_bbox(lat0: float, lon0: float, lat1: float, lon1: float) -> Iterable[int]:
+        for lat_index in range(int(math.floor(lat0)) + 90, int(math.floor(lat1)) + 91):
+            for lon_index in range(int(math.floor(lon0)) + 180, int(math.floor(lon1)) + 181):
+                yield _cell(lat_index, lon_index)
+
+    def navaids_in_bbox(self, bbox: str) -> List[Dict]:
+        """Navaids inside a 'lat0,lon0,lat1,lon1' bounding box"""
+        lat0, lon0, lat1, lon1 = (float(part) for part in bbox.split(','))
+        navaids = []
+        for key in self._cells_in_bbox(lat0, lon0, lat1, lon1):
+            start, count = self._navaid_cells.get(key, (0, 0))
+            for index in range(start, start + count):
+                navaid = self._navaid(index)
+                if lat0 <= navaid['lat'] <= lat1 and lon0 <= navaid['lon'] <= lon1:
+                    navaids.append(navaid)
+        return navaids
+
+    def nearest_airports(self, lat: float, lon: float, count: int = 3, min_runway_ft: int = 0,
+                         max_distance_nm: float = 200, hard_surface: bool = False,
+                         exclude: Iterable[str] = ()) -> List[Dict]:
+        """
+        Closest suitable airports to a point
+
+        Searches grid rings outward from the point's cell and stops once the
+        nearest possible point of the next ring is farther than the current
+        count-th candidate (or the distance limit).
+
+        Args:
+            lat, lon: Search origin
+            count: Airports to return
+            min_runway_ft: Minimum length of the longest open runway
+            max_distance_nm: Search radius
+            hard_surface: Require a paved runway
+            exclude: Identifiers to skip (e.g. the plan's own airports)
+
+        Returns:
+            Airport records nearest first, each with 'distanceNm'
+        """
+        excluded = {_encode(code, 8) for code in exclude if code.strip()}
+        center_lat, center_lon = int(math.floor(lat)) + 90, int(math.floor(lon)) + 180
+        # Degrees of longitude shrink toward the poles; bound ring distance conservatively
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + 1, 89))), 0.05)
+        candidates: List[Tuple[float, int]] = []
+        ring = 0
+        while True:
+            ring_bound = max(ring - 1, 0) * 60 * cos_lat
+            if ring_bound > max_distance_nm or ring > 180:
+                break
+            if len(candidates) >= count and ring_bound > candidates[count - 1][0]:
+                break
+            for lat_index in range(center_lat - ring, center_lat + ring + 1):
+                step = 1 if abs(lat_index - center_lat) == ring else 2 * ring or 1
+                for lon_index in range(center_lon - ring, center_lon + ring + 1, step):
+                    if not 0 <= lat_index <= 180:
+                        continue
+                    start, length = self._airport_cells.get(_cell(lat_index, lon_index), (0, 0))
+                    for index in range(start, start + length):
+                        codes, airport_lat, airport_lon, longest, kind, flags = self._airport_summary(index)
+                        if longest < min_runway_ft or kind >= AIRPORT_TYPES.index('heliport'):
+                            continue
+                        if any(code.rstrip(b'\0') in excluded for code in codes):
+                            continue
+                        if hard_surface and not flags & FLAG_HARD_SURFACE:
+                            continue
+                        distance = haversine_nm(lat, lon, airport_lat, airport_lon)
+                        if distance <= max_distance_nm:
+                            bisect.insort(candidates, (distance, index))
+            del candidates[count:]
+            ring += 1
+
+        airports = []
+        for distance, index in candidates:
+            airport = self._airport(index)
+            airport['distanceNm'] = round(distance, 1)
+            airports.append(airport)
+        return airports
+
+    def close(self):
+        self._buffer.close()
+        self._file.close()
+
+
+def _read_csv(path: str) -> List[Dict[str, str]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def build_database(airports_csv: str, runways_csv: str, navaids_csv: str, output: str):
+    """
+    Build the binary database from OurAirports CSV exports
+
+    (https://ourairports.com/data/: airports.csv, runways.csv, navaids.csv)
+    """
+    strings = bytearray()
+
+    def add_string(value: str) -> Tuple[int, int]:
+        encoded = value.encode('utf-8')
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    runways_by_airport: Dict[str, List[Dict]] = {}
+    for runway in _read_csv(runways_csv):
+        if runway.get('closed') == '1':
+            continue
+        runways_by_airport.setdefault(runway['airport_ident'], []).append(runway)
+
+    airports = []
+    for row in _read_csv(airports_csv):
+        if row.get('type') not in AIRPORT_TYPES:
+            continue
+        runways = runways_by_airport.get(row['ident'], [])
+        longest = int(max((_number(runway.get('length_ft')) for runway in runways), default=0))
+        flags = 0
+        if any(runway.get('lighted') == '1' for runway in runways):
+            flags |= FLAG_LIGHTED
+        if any(str(runway.get('surface') or '').upper().startswith(HARD_SURFACES) for runway in runways):
+            flags |= FLAG_HARD_SURFACE
+        # Same shape as the aviationweather.gov airport API so consumers need no special casing
+        runway_records = [{
+            'id': '/'.join(filter(None, (runway.get('le_ident'), runway.get('he_ident')))),
+            'dimension': f"{runway.get('length_ft') or '?'}x{runway.get('width_ft') or '?'}",
+            'surface': runway.get('surface') or None,
+            'alignment': _number(runway.get('le_heading_degT'), None),
+        } for runway in runways]
+        airports.append((row, longest, flags, json.dumps(runway_records, separators=(',', ':'))))
+    airports.sort(key=lambda item: cell_key(_number(item[0]['latitude_deg']), _number(item[0]['longitude_deg'])))
+
+    airport_records = bytearray()
+    for row, longest, flags, runways_json in airports:
+        name = add_string(row.get('name') or '')
+        runways = add_string(runways_json)
+        airport_records += AIRPORT.pack(
+            _encode(row.get('gps_code') or row['ident'], 8), _encode(row.get('iata_code'), 4),
+            _encode(row.get('local_code'), 8), _number(row['latitude_deg']), _number(row['longitude_deg']),
+            int(_number(row.get('elevation_ft'))), min(longest, 65535), AIRPORT_TYPES.index(row['type']),
+            flags, *name, *runways)
+
+    # When identifiers collide, an airport's own ident/ICAO code beats another's IATA/local
+    # code, and larger airports beat smaller ones
+    airport_idents: Dict[bytes, int] = {}
+    by_size = sorted(range(len(airports)), key=lambda index: AIRPORT_TYPES.index(airports[index][0]['type']))
+    for fields in (('ident', 'gps_code'), ('iata_code', 'local_code')):
+        for index in by_size:
+            row = airports[index][0]
+            for field in fields:
+                if row.get(field):
+                    airport_idents.setdefault(_encode(row[field], 8).ljust(8, b'\0'), index)
+
+    navaids = [row for row in _read_csv(navaids_csv) if row.get('type') in NAVAID_TYPES]
+    navaids.sort(key=lambda row: cell_key(_number(row['latitude_deg']), _number(row['longitude_deg'])))
+    navaid_records = bytearray()
+    navaid_idents: List[Tuple[bytes, int]] = []
+    for index, row in enumerate(navaids):
+        name = add_string(row.get('name') or '')
+        navaid_records += NAVAID.pack(
+            _encode(row['ident'], 8), NAVAID_TYPES.index(row['type']), int(_number(row.get('frequency_khz'))),
+            _number(row['latitude_deg']), _number(row['longitude_deg']), _encode(row.get('iso_country'), 2),
+            *name)
+        navaid_idents.append((_encode(row['ident'], 8).ljust(8, b'\0'), index))
+
+    def cells(positions: List[Tuple[float, float]]) -> bytes:
+        table: Dict[int, List[int]] = {}
+        for index, (lat, lon) in enumerate(positions):
+            entry = table.setdefault(cell_key(lat, lon), [index, 0])
+            entry[1] += 1
+        return b''.join(CELL.pack(key, start, count) for key, (start, count) in sorted(table.items()))
+
+    def idents(entries: Iterable[Tuple[bytes, int]]) -> bytes:
+        return b''.join(IDENT.pack(key, index) for key, index in sorted(entries))
+
+    sections = [
+        (bytes(airport_records), len(airports)),
+        (bytes(navaid_records), len(navaids)),
+        (cells([(_number(row['latitude_deg']), _number(row['longitude_deg'])) for row, *_ in airports]), None),
+        (cells([(_number(row['latitude_deg']), _number(row['longitude_deg'])) for row in navaids]), None),
+        (idents(airport_idents.items()), len(airport_idents)),
+        (idents(navaid_idents), len(navaid_idents)),
+        (bytes(strings), len(strings)),
+    ]
+    offset = HEADER.size
+    table = []
+    for data, count in sections:
+        table.extend((offset, count if count is not None else len(data) // CELL.size))
+        offset += len(data)
+
+    tmp_path = output + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, *table))
+        for data, _ in sections:
+            f.write(data)
+    os.replace(tmp_path, output)
+    print(f"Wrote {len(airports)} airports and {len(navaids)} navaids to {output}")
+
+
+# Shared by the aggregator; None means reference data comes from the network
+reference_db = ReferenceDatabase.from_environment()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the local airport/navaid reference database")
+    parser.add_argument('--airports', required=True, help="OurAirports airports.csv")
+    parser.add_argument('--runways', required=True, help="OurAirports runways.csv")
+    parser.add_argument('--navaids', required=True, help="OurAirports navaids.csv")
+    parser.add_argument('--output', default=os.environ.get("REFERENCE_DB") or 'reference.db')
+    args = parser.parse_args()
+    build_database(args.airports, args.runways, args.navaids, args.output)
@@ -0,0 +1,290 @@
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_NM = 3440.065
+
+LatLon = Tuple[float, float]
+
+
+def haversine_nm(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in nautical miles"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def initial_course(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Initial true course (degrees) of the great circle from the first point to the second"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlmb = math.radians(lon2 - lon1)
+    y = math.sin(dlmb) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlmb)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    """Position as an Earth-centred unit vector"""
+    phi, lmb = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lmb), math.cos(phi) * math.sin(lmb), math.sin(phi)
+
+
+def _cross(a: Sequence[float], b: Sequence[float]) -> Tuple[float, float, float]:
+    return a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]
+
+
+def _angle(a: Sequence[float], b: Sequence[float]) -> float:
+    """Angle between two unit vectors (chord form, accurate for small angles)"""
+    chord = math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+    return 2 * math.asin(min(1.0, chord / 2))
+
+
+def _arc(a: Sequence[float], b: Sequence[float]) -> Tuple:
+    """
+    Great-circle arc between two unit vectors, prepared for distance tests
+
+    Returns (a, b, normal, from_a, from_b): the unit normal of the arc's great
+    circle (None for a zero-length arc) and the tangents at each end pointing
+    into the arc.
+    """
+    normal = _cross(a, b)
+    length = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2)
+    if length < 1e-12:
+        return a, b, None, None, None
+    normal = (normal[0] / length, normal[1] / length, normal[2] / length)
+    return a, b, normal, _cross(normal, a), _cross(b, normal)
+
+
+def _abeam(p: Sequence[float], arc: Tuple) -> bool:
+    """Whether a point's projection onto the arc's great circle falls between its ends"""
+    _, _, normal, from_a, from_b = arc
+    return normal is not None and \
+        p[0] * from_a[0] + p[1] * from_a[1] + p[2] * from_a[2] >= 0 and \
+        p[0] * from_b[0] + p[1] * from_b[1] + p[2] * from_b[2] >= 0
+
+
+def _arc_angle(p: Sequence[float], arc: Tuple) -> float:
+    """Angular distance from a point to an arc: cross-track when abeam, else to the nearer end"""
+    a, b, normal, _, _ = arc
+    if _abeam(p, arc):
+        offset = p[0] * normal[0] + p[1] * normal[1] + p[2] * normal[2]
+        return abs(math.asin(max(-1.0, min(1.0, offset))))
+    return min(_angle(p, a), _angle(p, b))
+
+
+def _arcs_cross(first: Tuple, second: Tuple) -> bool:
+    """Whether two arcs intersect (arcs on the same great circle count as not crossing)"""
+    if first[2] is None or second[2] is None:
+        return False
+    line = _cross(first[2], second[2])
+    length = math.sqrt(line[0] ** 2 + line[1] ** 2 + line[2] ** 2)
+    if length < 1e-12:
+        return False
+    for sign in (1, -1):
+        point = (sign * line[0] / length, sign * line[1] / length, sign * line[2] / length)
+        if _abeam(point, first) and _abeam(point, second):
+            return True
+    return False
+
+
+def great_circle_points(start: LatLon, end: LatLon, segments: int) -> List[LatLon]:
+    """segments + 1 points evenly spaced along the great circle from start to end, endpoints included"""
+    phi1, lmb1 = math.radians(start[0]), math.radians(start[1])
+    phi2, lmb2 = math.radians(end[0]), math.radians(end[1])
+    angle = haversine_nm(*start, *end) / EARTH_RADIUS_NM
+    if angle == 0 or segments < 1:
+        return [start] * (max(segments, 0) + 1)
+    points = []
+    for index in range(segments + 1):
+        fraction = index / segments
+        a = math.sin((1 - fraction) * angle) / math.sin(angle)
+        b = math.sin(fraction * angle) / math.sin(angle)
+        x = a * math.cos(phi1) * math.cos(lmb1) + b * math.cos(phi2) * math.cos(lmb2)
+        y = a * math.cos(phi1) * math.sin(lmb1) + b * math.cos(phi2) * math.sin(lmb2)
+        z = a * math.sin(phi1) + b * math.sin(phi2)
+        points.append((math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))))
+    return points
+
+
+def record_position(record: Dict) -> Optional[LatLon]:
+    """Extract (lat, lon) from an API record, or None if it has no usable position"""
+    try:
+        return float(record['lat']), float(record['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def airport_positions(airports: Optional[List[Dict]]) -> Dict[str, LatLon]:
+    """Map every identifier of each airport record (ICAO/FAA/IATA) to its (lat, lon)"""
+    positions = {}
+    for airport in airports or []:
+        position = record_position(airport)
+        if position is None:
+            continue
+        for field in ('icaoId', 'faaId', 'iataId'):
+            if airport.get(field):
+                positions[str(airport[field]).upper()] = position
+    return positions
+
+
+def polygon_coords(record: Dict) -> List[LatLon]:
+    """Extract polygon vertices from an AIRMET/SIGMET record's 'coords' field"""
+    vertices = []
+    for point in record.get('coords') or []:
+        try:
+            if isinstance(point, dict):
+                vertices.append((float(point['lat']), float(point['lon'])))
+            else:
+                vertices.append((float(point[0]), float(point[1])))
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+    return vertices
+
+
+def point_in_polygon(lat: float, lon: float, polygon: Sequence[LatLon]) -> bool:
+    """Ray-casting point-in-polygon test in lat/lon space"""
+    inside = False
+    n = len(polygon)
+    for i in range(n):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[i - 1]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < crossing:
+                inside = not inside
+    return inside
+
+
+class RouteCorridor:
+    """
+    Buffer of fixed half-width around the route legs (departure -> destination -> each alternate)
+
+    Legs follow great circles. Distances are exact cross-track (or endpoint)
+    distances computed with unit vectors prepared once per leg, so a whole
+    batch of points can still be filtered with cheap arithmetic.
+    """
+
+    # Spacing (nm) of the great-circle points that bound the corridor's bbox
+    BBOX_SPACING_NM = 100
+
+    def __init__(self, legs: List[Tuple[LatLon, LatLon]], half_width_nm: float = 50):
+        self.legs = legs
+        self.half_width_nm = half_width_nm
+        self._legs = [_arc(unit_vector(*start), unit_vector(*end)) for start, end in legs]
+        self._points = []
+        for start, end in legs:
+            count = max(1, math.ceil(haversine_nm(*start, *end) / self.BBOX_SPACING_NM))
+            self._points.extend(great_circle_points(start, end, count))
+
+    @classmethod
+    def from_airports(cls, departure: LatLon, destination: LatLon,
+                      alternates: Iterable[LatLon] = (), half_width_nm: float = 50) -> "RouteCorridor":
+        """Build the corridor for a departure/destination pair plus diversion legs to alternates"""
+        legs = [(departure, destination)]
+        legs.extend((destination, alternate) for alternate in alternates)
+        return cls(legs, half_width_nm)
+
+    def distance_nm(self, lat: float, lon: float) -> float:
+        """Shortest great-circle distance from a point to any route leg"""
+        p = unit_vector(lat, lon)
+        return min(_arc_angle(p, leg) for leg in self._legs) * EARTH_RADIUS_NM
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return self.distance_nm(lat, lon) <= self.half_width_nm
+
+    def bboxes(self) -> List[str]:
+        """
+        Bounding boxes enclosing the corridor, as 'lat0,lon0,lat1,lon1'
+
+        Longitudes are taken relative to the first leg's start, so a route
+        across the antimeridian gets two boxes, one either side of it,
+        rather than one spanning the globe. Rounded outward to whole degrees
+        so nearby routes produce identical queries and share cache entries;
+        results are clipped locally anyway.
+        """
+        origin = self._points[0][1]
+        lats = [lat for lat, _ in self._points]
+        lons = [origin + (lon - origin + 180) % 360 - 180 for _, lon in self._points]
+        lat_margin = self.half_width_nm / 60
+        lon_margin = lat_margin / max(math.cos(math.radians(min(max(map(abs, lats)) + lat_margin, 90))), 0.1)
+        south, north = math.floor(min(lats) - lat_margin), math.ceil(max(lats) + lat_margin)
+        west, east = math.floor(min(lons) - lon_margin), math.ceil(max(lons) + lon_margin)
+        if east - west >= 360:
+            spans = [(-180, 180)]
+        elif west < -180:
+            spans = [(west + 360, 180), (-180, east)]
+        elif east > 180:
+            spans = [(west, 180), (-180, east - 360)]
+        else:
+            spans = [(west, east)]
+        return [f"{south},{lon0},{north},{lon1}" for lon0, lon1 in spans]
+
+    def sample_points(self, spacing_nm: float = 20) -> List[LatLon]:
+        """Points along every leg's great circle at roughly the given spacing, endpoints included"""
+        points = []
+        for start, end in self.legs:
+            steps = max(1, int(haversine_nm(*start, *end) // spacing_nm))
+            points.extend(great_circle_points(start, end, steps))
+        return points
+
+    def clip_points(self, records: Optional[List[Dict]]) -> List[Dict]:
+        """
+        Keep point records (PIREPs, navaids) that fall inside the corridor
+
+        Each kept record is annotated with 'routeDistanceNm' for later ranking.
+        """
+        clipped = []
+        for record in records or []:
+            position = record_position(record)
+            if position is None:
+                continue
+            distance = self.distance_nm(*position)
+            if distance <= self.half_width_nm:
+                clipped.append({**record, 'routeDistanceNm': round(distance, 1)})
+        return clipped
+
+    def _edges_touch(self, vertices: List[Tuple[float, float, float]]) -> bool:
+        """Whether any polygon edge crosses a leg or passes within the half-width of a leg's end"""
+        edges = [_arc(vertices[index - 1], vertex) for index, vertex in enumerate(vertices)]
+        half_width = self.half_width_nm / EARTH_RADIUS_NM
+        for leg in self._legs:
+            for edge in edges:
+                # The closest approach of two arcs that don't cross is at an end of one of them;
+                # the polygon's own vertices were already checked against the legs
+                if _arcs_cross(leg, edge) or _arc_angle(leg[0], edge) <= half_width or \
+                        _arc_angle(leg[1], edge) <= half_width:
+                    return True
+        return False
+
+    def clip_areas(self, records: Optional[List[Dict]]) -> List[Dict]:
+        """
+        Keep area records (SIGMETs, G-AIRMETs) whose polygon touches the corridor
+
+        A polygon touches it when a vertex lies within the corridor, an edge
+        crosses or comes within the half-width of a leg, or the route runs
+        inside the polygon.
+        """
+        if not records:
+            return []
+        samples = self.sample_points()
+        half_width = self.half_width_nm / EARTH_RADIUS_NM
+        clipped = []
+        for record in records:
+            polygon = polygon_coords(record)
+            if not polygon:
+                continue
+            vertices = [unit_vector(lat, lon) for lat, lon in polygon]
+            # Cheap reject: the polygon lies within a cap around its vertex mean
+            center = tuple(sum(vertex[axis] for vertex in vertices) for axis in range(3))
+            norm = math.sqrt(center[0] ** 2 + center[1] ** 2 + center[2] ** 2)
+            if norm > 1e-9:
+                center = (center[0] / norm, center[1] / norm, center[2] / norm)
+                radius = max(_angle(center, vertex) for vertex in vertices)
+                if radius < math.pi / 2 and \
+                        min(_arc_angle(center, leg) for leg in self._legs) > radius + half_width:
+                    continue
+            if any(self.contains(lat, lon) for lat, lon in polygon) or self._edges_touch(vertices) or \
+                    any(point_in_polygon(lat, lon, polygon) for lat, lon in samples):
+                clipped.append(record)
+        return clipped
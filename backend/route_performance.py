@@ -0,0 +1,404 @@
+import heapq
+import math
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from conditions import parse_takeoff_time
+from route import (EARTH_RADIUS_NM, LatLon, airport_positions, great_circle_points, haversine_nm,
+                   initial_course, unit_vector)
+
+# Highest cruise altitude (ft MSL) searched for the best altitude unless the plan
+# asks for higher; defaults to the usual limit without oxygen or pressurization
+CRUISE_CEILING_FT = int(os.environ.get("CRUISE_CEILING_FT", 12000))
+LOWEST_CRUISE_FT = 3000
+CRUISE_ALTITUDE_STEP_FT = 1000
+
+# Legs are integrated over great-circle segments of at most this length
+# (FD sites are 100-200nm apart, so shorter segments add cost but no detail)
+SEGMENT_NM = 50
+
+# Winds at a point are inverse-distance weighted from the nearest FD stations
+INTERPOLATION_STATIONS = 4
+MAX_STATION_DISTANCE_NM = 400
+# Station weights remembered per route point for the life of a forecast
+MAX_REMEMBERED_POINTS = 20000
+
+# (east, north) components of the air movement in knots, temperature in Celsius
+Wind = Tuple[float, float, Optional[float]]
+
+_GROUP = re.compile(r'(\d{2})(\d{2})([+-]\d{2}|\d{2})?')
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def decode_fd_group(group: str) -> Optional[Tuple[Optional[int], int, Optional[int]]]:
+    """
+    Decode one FD winds aloft group into (direction, speed kt, temperature C)
+
+    'DDff' or 'DDff+TT': direction in tens of degrees true and speed in knots.
+    Direction codes 51-86 mean 100kt or more (subtract 50 from the direction,
+    add 100 to the speed); '9900' is light and variable (direction None).
+    Temperatures without a sign are above 24000ft, where they are negative.
+    """
+    match = _GROUP.fullmatch(group.strip())
+    if not match:
+        return None
+    direction, speed, temperature = int(match.group(1)), int(match.group(2)), match.group(3)
+    if direction == 99:
+        direction, speed = None, 0
+    else:
+        if direction >= 51:
+            direction, speed = direction - 50, speed + 100
+        direction *= 10
+    if temperature is not None:
+        temperature = int(temperature) if temperature[0] in '+-' else -int(temperature)
+    return direction, speed, temperature
+
+
+def wind_vector(direction: Optional[float], speed: float) -> Tuple[float, float]:
+    """(east, north) components of a wind blowing from the given true direction"""
+    if direction is None:
+        return 0.0, 0.0
+    angle = math.radians(direction)
+    return -speed * math.sin(angle), -speed * math.cos(angle)
+
+
+def fd_forecast(when: datetime, now: Optional[datetime] = None) -> str:
+    """
+    FD forecast ('06', '12' or '24') whose period of use covers a time
+
+    Forecasts are based on 00/06/12/18Z data and issued about two hours
+    later; the 6-hour forecast is used until 9 hours after the data time,
+    the 12-hour forecast until 18 hours and the 24-hour forecast after that.
+    """
+    now = now or datetime.now(timezone.utc)
+    issued = now - timedelta(hours=2)
+    data_time = issued.replace(hour=issued.hour // 6 * 6, minute=0, second=0, microsecond=0)
+    lead = (when - data_time).total_seconds() / 3600
+    return '06' if lead < 9 else '12' if lead < 18 else '24'
+
+
+def _vertical(profile: Sequence[Tuple[int, float]], altitude: float) -> Optional[float]:
+    """Linear interpolation in a (level, value) profile sorted by level, clamped at both ends"""
+    if not profile:
+        return None
+    if altitude <= profile[0][0]:
+        return profile[0][1]
+    for (low, low_value), (high, high_value) in zip(profile, profile[1:]):
+        if altitude <= high:
+            return low_value + (high_value - low_value) * (altitude - low) / (high - low)
+    return profile[-1][1]
+
+
+class WindsAloft:
+    """
+    Decoded FD winds and temperatures aloft forecast
+
+    Winds are held as east/north components so they can be interpolated
+    linearly between levels and between stations. Stations need positions
+    (locate()) before winds can be interpolated along a route.
+    """
+
+    def __init__(self, levels: Sequence[int], stations: Dict[str, Dict[int, Wind]],
+                 based_on: Optional[str] = None, valid: Optional[str] = None, for_use: Optional[str] = None):
+        self.levels = tuple(levels)
+        self.stations = stations
+        self.based_on = based_on
+        self.valid = valid
+        self.for_use = for_use
+        self.positions: Dict[str, LatLon] = {}
+        self._vectors: List[Tuple[float, float, float, str]] = []
+        # Routes recur (reloads, batches, prefetch), and so do their segment points
+        self._point_weights: Dict[LatLon, List[Tuple[str, float]]] = {}
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["WindsAloft"]:
+        """
+        Parse the FD text bulletin served by /api/data/windtemp
+
+        Groups are matched to levels from the right: levels within 1500ft of
+        a station's elevation (and all temperatures at 3000ft) are left blank,
+        so missing groups are always the lowest ones.
+
+        Returns:
+            The decoded forecast, or None if the text has no level header
+        """
+        levels: List[int] = []
+        stations: Dict[str, Dict[int, Wind]] = {}
+        header = {}
+        for line in (text or '').splitlines():
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'FT':
+                levels = [int(word) for word in words[1:] if word.isdigit()]
+                continue
+            for field, pattern in (('based_on', r'DATA BASED ON (\d{6}Z)'), ('valid', r'VALID (\d{6}Z)'),
+                                   ('for_use', r'FOR USE (\d{4}-\d{4}Z)')):
+                match = re.search(pattern, line)
+                if match:
+                    header[field] = match.group(1)
+            if not levels or not re.fullmatch(r'[A-Z0-9]{3,4}', words[0]) or len(words) > len(levels) + 1:
+                continue
+            winds: Dict[int, Wind] = {}
+            for level, group in zip(levels[len(levels) - len(words) + 1:], words[1:]):
+                decoded = decode_fd_group(group)
+                if decoded is not None:
+                    direction, speed, temperature = decoded
+                    winds[level] = (*wind_vector(direction, speed), temperature)
+            if winds:
+                stations[words[0]] = winds
+        if not levels:
+            return None
+        return cls(levels, stations, **header)
+
+    def locate(self, positions: Dict[str, LatLon]) -> "WindsAloft":
+        """Attach station positions; stations without one are left out of interpolation"""
+        self.positions = {station: position for station, position in positions.items() if station in self.stations}
+        self._vectors = [(*unit_vector(*position), station) for station, position in self.positions.items()]
+        self._point_weights = {}
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "based_on": self.based_on,
+            "valid": self.valid,
+            "for_use": self.for_use,
+            "levels": list(self.levels),
+            "stations": len(self.positions),
+        }
+
+    def _weights(self, points: Sequence[LatLon]) -> List[List[Tuple[str, float]]]:
+        """
+        Normalized inverse-distance weights of the nearest stations, per point
+
+        Stations are ranked by the dot product of unit vectors (larger is
+        closer), so only the chosen few need an actual distance.
+        """
+        weights = []
+        if len(self._point_weights) > MAX_REMEMBERED_POINTS:
+            self._point_weights = {}
+        for lat, lon in points:
+            remembered = self._point_weights.get((lat, lon))
+            if remembered is not None:
+                weights.append(remembered)
+                continue
+            x, y, z = unit_vector(lat, lon)
+            nearest = heapq.nlargest(INTERPOLATION_STATIONS, ((x * sx + y * sy + z * sz, station)
+                                                              for sx, sy, sz, station in self._vectors))
+            nearest = [(EARTH_RADIUS_NM * math.acos(min(1.0, dot)), station) for dot, station in nearest]
+            nearest = [(1 / max(distance, 1.0) ** 2, station) for distance, station in nearest
+                       if distance <= MAX_STATION_DISTANCE_NM]
+            total = sum(weight for weight, _ in nearest)
+            weights.append([(station, weight / total) for weight, station in nearest])
+            self._point_weights[(lat, lon)] = weights[-1]
+        return weights
+
+    def _profiles(self, station: str, altitudes: Sequence[float]) -> List[Wind]:
+        """The station's wind and temperature interpolated to each altitude"""
+        levels = sorted(self.stations[station].items())
+        east = [(level, wind[0]) for level, wind in levels]
+        north = [(level, wind[1]) for level, wind in levels]
+        temperature = [(level, wind[2]) for level, wind in levels if wind[2] is not None]
+        return [(_vertical(east, altitude), _vertical(north, altitude), _vertical(temperature, altitude))
+                for altitude in altitudes]
+
+    def winds_at(self, points: Sequence[LatLon], altitudes: Sequence[float]) -> List[List[Optional[Wind]]]:
+        """
+        Forecast wind at every point for every altitude
+
+        Station weights are computed once per point and vertical profiles
+        once per station, so adding altitudes only costs the weighted sums.
+
+        Returns:
+            Rows per altitude, one entry per point; None where no station is in range
+        """
+        weights = self._weights(points)
+        profiles = {station: self._profiles(station, altitudes)
+                    for station in {station for point in weights for station, _ in point}}
+        rows = []
+        for index in range(len(altitudes)):
+            row: List[Optional[Wind]] = []
+            for point in weights:
+                if not point:
+                    row.append(None)
+                    continue
+                east = north = temperature = known = 0.0
+                for station, weight in point:
+                    station_east, station_north, station_temperature = profiles[station][index]
+                    east += weight * station_east
+                    north += weight * station_north
+                    if station_temperature is not None:
+                        temperature += weight * station_temperature
+                        known += weight
+                row.append((east, north, temperature / known if known else None))
+            rows.append(row)
+        return rows
+
+
+def groundspeed(true_airspeed: float, course: float, east: float, north: float) -> float:
+    """Groundspeed (kt) holding a true course through the wind; 0 if the crosswind exceeds the airspeed"""
+    angle = math.radians(course)
+    along = east * math.sin(angle) + north * math.cos(angle)
+    cross = east * math.cos(angle) - north * math.sin(angle)
+    if abs(cross) >= true_airspeed:
+        return 0.0
+    return max(0.0, math.sqrt(true_airspeed ** 2 - cross ** 2) + along)
+
+
+def parse_altitude(value) -> Optional[int]:
+    """Altitude in feet from '9500', '9,500 ft', 'FL180' or '180' style flight levels"""
+    text = str(value or '').strip().upper().replace(',', '')
+    match = _NUMBER.search(text)
+    if not match:
+        return None
+    altitude = float(match.group())
+    if text.startswith('FL') or altitude < 1000:
+        altitude *= 100
+    return int(altitude)
+
+
+def _number(value) -> Optional[float]:
+    match = _NUMBER.search(str(value or '').replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def _format_time(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%MZ')
+
+
+def _segments(start: LatLon, end: LatLon) -> Tuple[List[LatLon], List[float], float]:
+    """Midpoints and true courses of equal great-circle segments of a leg, and the segment length"""
+    distance = haversine_nm(*start, *end)
+    count = max(1, math.ceil(distance / SEGMENT_NM))
+    points = great_circle_points(start, end, 2 * count)
+    boundaries, midpoints = points[::2], points[1::2]
+    courses = [initial_course(*boundaries[index], *boundaries[index + 1]) for index in range(count)]
+    return midpoints, courses, distance / count
+
+
+def compute_route_performance(pilot_data, airports: Optional[List[Dict]], winds: Optional[WindsAloft],
+                              now: Optional[datetime] = None) -> Dict:
+    """
+    Groundspeed, time and fuel per leg from the FD winds aloft forecast
+
+    The departure -> destination leg and the diversion legs from the
+    destination to each alternate are split into great-circle segments;
+    forecast winds are interpolated at each segment for every candidate
+    cruise altitude at once (LOWEST_CRUISE_FT to CRUISE_CEILING_FT, plus the
+    planned altitude), and the altitude with the shortest time enroute is
+    reported as the best. Legs are detailed at the planned altitude, or at
+    the best one when none was given. Climb, descent, terrain and airspace
+    are not considered.
+
+    Args:
+        pilot_data: PilotProvidedData of the plan
+        airports: Airport records (for positions)
+        winds: Located winds aloft forecast; without one, winds are taken as calm
+        now: Current time, defaults to the wall clock
+
+    Returns:
+        {'altitude_ft', 'planned_altitude_ft', 'best_altitude_ft', 'true_airspeed_kt',
+         'wind_coverage', 'legs': [...], 'altitudes': [...]}, or {} without an
+        airspeed or airport positions
+    """
+    true_airspeed = _number(pilot_data.true_airspeed)
+    positions = airport_positions(airports)
+    departure = str(pilot_data.departure_airport or '').strip().upper()
+    destination = str(pilot_data.destination_airport or '').strip().upper()
+    if not true_airspeed or departure not in positions or destination not in positions:
+        return {}
+    takeoff = parse_takeoff_time(pilot_data.takeoff_time) or now or datetime.now(timezone.utc)
+    fuel_burn = _number(pilot_data.fuel_burn)
+
+    legs = [(departure, destination, 'route')]
+    alternates = [code.strip().upper() for code in str(pilot_data.alternate_airports or '').split(',')]
+    legs.extend((destination, code, 'alternate') for code in dict.fromkeys(alternates)
+                if code in positions and code not in (departure, destination))
+
+    planned = parse_altitude(pilot_data.cruise_altitude)
+    altitudes = list(range(LOWEST_CRUISE_FT, max(CRUISE_CEILING_FT, planned or 0) + 1, CRUISE_ALTITUDE_STEP_FT))
+    if planned is not None and planned not in altitudes:
+        altitudes = sorted(altitudes + [planned])
+
+    # Every segment of every leg is evaluated for all altitudes in one pass
+    segments = [_segments(positions[start], positions[end]) for start, end, _ in legs]
+    points = [point for midpoints, _, _ in segments for point in midpoints]
+    rows = winds.winds_at(points, altitudes) if winds is not None and winds.positions \
+        else [[None] * len(points) for _ in altitudes]
+    covered = sum(wind is not None for wind in rows[0]) / len(points) if points else 0.0
+
+    # Per altitude and leg: (hours, mean temperature)
+    results: List[List[Tuple[float, Optional[float]]]] = []
+    for row in rows:
+        offset = 0
+        per_leg = []
+        for midpoints, courses, length in segments:
+            hours = 0.0
+            temperatures = []
+            for course, wind in zip(courses, row[offset:offset + len(midpoints)]):
+                east, north, temperature = wind or (0.0, 0.0, None)
+                speed = groundspeed(true_airspeed, course, east, north)
+                hours += length / speed if speed > 0 else math.inf
+                if temperature is not None:
+                    temperatures.append(temperature)
+            offset += len(midpoints)
+            per_leg.append((hours, sum(temperatures) / len(temperatures) if temperatures else None))
+        results.append(per_leg)
+
+    route_hours = [per_leg[0][0] for per_leg in results]
+    feasible = [index for index, hours in enumerate(route_hours) if hours < math.inf]
+    best = min(feasible, key=lambda index: route_hours[index]) if feasible and covered else None
+    chosen = altitudes.index(planned) if planned is not None else best if best is not None else 0
+
+    arrival = takeoff
+    detailed = []
+    for (start, end, role), (_, courses, _), (hours, temperature) in zip(legs, segments, results[chosen]):
+        distance = haversine_nm(*positions[start], *positions[end])
+        leg = {
+            "from": start,
+            "to": end,
+            "role": role,
+            "distance_nm": round(distance),
+            "course_deg": round(courses[0]) % 360 or 360,
+            "altitude_ft": altitudes[chosen],
+            "groundspeed_kt": None,
+            "wind_component_kt": None,
+            "temperature_c": round(temperature) if temperature is not None else None,
+            "ete_min": None,
+            "eta": None,
+            "fuel_gal": None,
+        }
+        if hours < math.inf:
+            speed = distance / hours if hours else true_airspeed
+            leg_start = takeoff if role == 'route' else arrival
+            leg.update(groundspeed_kt=round(speed), wind_component_kt=round(speed - true_airspeed),
+                       ete_min=round(hours * 60), eta=_format_time(leg_start + timedelta(hours=hours)),
+                       fuel_gal=round(hours * fuel_burn, 1) if fuel_burn else None)
+            if role == 'route':
+                arrival = leg_start + timedelta(hours=hours)
+        detailed.append(leg)
+
+    route_distance = haversine_nm(*positions[departure], *positions[destination])
+    return {
+        "altitude_ft": altitudes[chosen],
+        "planned_altitude_ft": planned,
+        "best_altitude_ft": altitudes[best] if best is not None else None,
+        "true_airspeed_kt": round(true_airspeed),
+        "wind_coverage": round(covered, 2),
+        "legs": detailed,
+        "altitudes": [{
+            "altitude_ft": altitude,
+            "groundspeed_kt": round(route_distance / hours) if 0 < hours < math.inf else None,
+            "ete_min": round(hours * 60) if hours < math.inf else None,
+        } for altitude, hours in zip(altitudes, route_hours)],
+    }
+
+
+def route_enroute(performance: Dict) -> Optional[timedelta]:
+    """Computed time enroute of the departure -> destination leg, if available"""
+    for leg in performance.get('legs') or []:
+        if leg['role'] == 'route' and leg['ete_min'] is not None:
+            return timedelta(minutes=leg['ete_min'])
+    return None
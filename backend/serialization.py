@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+from quart import Response, request
+
+try:
+    import orjson
+except ImportError:  # optional: ~5-10x faster encoding when installed
+    orjson = None
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Bodies smaller than this are sent uncompressed (gzip overhead outweighs the saving)
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 5))
+
+
+def _default(value: Any):
+    """Fallback for objects the encoder does not know (decoded records, datetimes)"""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def parse_fields(value: Optional[str]) -> Optional[Dict]:
+    """
+    Parse a field projection such as 'pilot_data,ai_analysis.briefing,online_resources.weather.metar'
+
+    Returns:
+        Nested dict of requested paths (an empty dict marks a whole subtree),
+        or None when no projection was requested
+    """
+    paths = [path.strip() for path in (value or '').split(',') if path.strip()]
+    if not paths:
+        return None
+    tree: Dict = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split('.')
+        for part in parents:
+            if part in node and not node[part]:
+                break  # the parent is already requested whole
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = {}
+    return tree
+
+
+def project(data: Any, fields: Optional[Dict]) -> Any:
+    """Keep only the requested paths of a nested dict; lists are projected element-wise"""
+    if not fields:
+        return data
+    if isinstance(data, list):
+        return [project(item, fields) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: project(data[key], subfields) for key, subfields in fields.items() if key in data}
+
+
+def requested_fields() -> Optional[Dict]:
+    """Projection from the current request's ?fields= parameter"""
+    return parse_fields(request.args.get('fields'))
+
+
+def _accepts_gzip() -> bool:
+    encodings: Iterable[str] = (part.split(';')[0].strip().lower()
+                                for part in request.headers.get('Accept-Encoding', '').split(','))
+    return 'gzip' in encodings
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """
+    Serialize a payload for the current request
+
+    Adds a strong ETag and gzip-compresses larger bodies for clients that
+    accept it. The gzip representation gets its own tag with a '-gzip'
+    suffix; either tag of the same payload validates a cached copy. A
+    matching If-None-Match on GET/HEAD is answered with 304 and no body;
+    other methods may not return 304, so they get the full response.
+    """
+    body = dumps(payload)
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    compress = len(body) >= GZIP_MIN_BYTES and _accepts_gzip()
+    headers = {'ETag': f'"{etag}-gzip"' if compress else f'"{etag}"', 'Vary': 'Accept-Encoding'}
+
+    if status == 200 and request.method in ('GET', 'HEAD') and (etag in request.if_none_match or f"{etag}-gzip" in request.if_none_match):
+        return Response(b'', status=304, headers=headers)
+
+    if compress:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, status=status, content_type='application/json', headers=headers)
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+async def _queue(controller, priority, order):
+    """Wait for a slot, record the grant order and hand the slot straight back"""
+    granted_at = await controller.acquire(priority)
+    order.append(priority)
+    controller.release(granted_at)
+
+
+def test_queued_callers_are_served_best_priority_first():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=4)
+        granted_at = await controller.acquire()
+        order = []
+        tasks = [asyncio.create_task(_queue(controller, priority, order)) for priority in (30, 10, 20)]
+        await asyncio.sleep(0)
+        assert controller.stats()['queued'] == 3
+        controller.release(granted_at)
+        await asyncio.gather(*tasks)
+        return order, controller.stats()
+    order, stats = asyncio.run(run())
+    assert order == [10, 20, 30]
+    assert stats['active'] == 0 and stats['queued'] == 0
+
+
+def test_full_queue_sheds_equal_or_worse_priority():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire(10))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(10)
+        waiter.cancel()
+        return rejected.value.reason
+    assert asyncio.run(run()) == "queue_full"
+
+
+def test_caller_still_queued_at_its_timeout_is_shed():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(timeout=0.01)
+        return rejected.value.reason, controller.stats()
+    reason, stats = asyncio.run(run())
+    assert reason == "deadline"
+    assert stats['active'] == 1 and stats['queued'] == 0
+
+
+def test_run_budget_sheds_once_spent():
+    async def run():
+        controller = AdmissionController(max_concurrent=4, runs_per_minute=2)
+        await controller.acquire()
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        return rejected.value.reason
+    assert asyncio.run(run()) == "budget"
+
+
+def test_preempted_caller_gets_its_budget_back():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, runs_per_minute=3)
+        granted_at = await controller.acquire()
+        worse = asyncio.create_task(controller.acquire(20))
+        await asyncio.sleep(0)
+        better = asyncio.create_task(controller.acquire(10))
+        with pytest.raises(AdmissionRejected) as rejected:
+            await worse
+        tokens = controller._tokens
+        controller.release(granted_at)
+        await better
+        return rejected.value.reason, tokens
+    reason, tokens = asyncio.run(run())
+    assert reason == "preempted"
+    # Three runs were asked for, one was pre-empted before it ran
+    assert tokens == pytest.approx(1, abs=0.01)
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+from cache import SingleFlight, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    entries = TTLCache()
+    entries.set(('metar', 'KSEA'), 'obs', ttl=60)
+    assert entries.get(('metar', 'KSEA')) == 'obs'
+    assert ('metar', 'KSEA') in entries
+    clock.now += 61
+    assert entries.get(('metar', 'KSEA'), 'gone') == 'gone'
+    assert len(entries) == 0
+    assert entries.stats()['hits'] == {'metar': 1}
+    assert entries.stats()['misses'] == {'metar': 1}
+
+
+def test_min_ttl_treats_nearly_expired_entries_as_misses_but_keeps_them(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    entries = TTLCache()
+    entries.set('key', 'value', ttl=60)
+    clock.now += 50
+    assert entries.get('key', min_ttl=30) is None
+    assert entries.get('key') == 'value'
+
+
+def test_least_recently_used_entry_is_evicted():
+    entries = TTLCache(max_entries=2)
+    entries.set('a', 1, ttl=60)
+    entries.set('b', 2, ttl=60)
+    entries.get('a')
+    entries.set('c', 3, ttl=60)
+    assert 'b' not in entries
+    assert entries.get('a') == 1 and entries.get('c') == 3
+    assert entries.stats()['evictions'] == 1
+
+
+def test_clear_drops_entries_and_counters():
+    entries = TTLCache()
+    entries.set('a', 1, ttl=60)
+    entries.get('a')
+    entries.clear()
+    assert len(entries) == 0
+    assert entries.stats()['hits'] == {}
+
+
+def test_single_flight_leader_result_is_shared_with_followers():
+    flights = SingleFlight()
+    led, followed = flights.claim(['KSEA', 'KPDX'])
+    assert sorted(led) == ['KPDX', 'KSEA'] and not followed
+    led_again, followed_again = flights.claim(['KSEA', 'KBFI'])
+    assert list(led_again) == ['KBFI'] and list(followed_again) == ['KSEA']
+    flights.resolve('KSEA', 'sea')
+    assert followed_again['KSEA'].result(timeout=1) == 'sea'
+    flights.resolve('KPDX', None)
+    flights.resolve('KBFI', None)
+    assert len(flights) == 0
+    # A finished flight is not reused: the next caller leads again
+    assert list(flights.claim(['KSEA'])[0]) == ['KSEA']
+
+
+def test_concurrent_callers_elect_one_leader():
+    flights = SingleFlight()
+    claimed = threading.Barrier(8)
+
+    def call(_):
+        led, followed = flights.claim(['KSEA'])
+        # Nobody resolves until everyone has claimed
+        claimed.wait()
+        if led:
+            flights.resolve('KSEA', 'sea')
+            return 'leader', 'sea'
+        return 'follower', followed['KSEA'].result(timeout=1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outcomes = list(executor.map(call, range(8)))
+    assert sorted(role for role, _ in outcomes) == ['follower'] * 7 + ['leader']
+    assert all(result == 'sea' for _, result in outcomes)
+    assert len(flights) == 0
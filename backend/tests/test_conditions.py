@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+import pytest
+
+from conditions import go_no_go, parse_enroute
+from models import PilotProvidedData
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2h 30m', timedelta(hours=2, minutes=30)),
+    ('1h30m', timedelta(hours=1, minutes=30)),
+    ('1hr30min', timedelta(hours=1, minutes=30)),
+    ('1h30', timedelta(hours=1, minutes=30)),
+    ('1 h 30', timedelta(hours=1, minutes=30)),
+    ('2 hours 15 minutes', timedelta(hours=2, minutes=15)),
+    ('3 hrs', timedelta(hours=3)),
+    ('1.5h', timedelta(hours=1, minutes=30)),
+    ('45 min', timedelta(minutes=45)),
+    ('1:15', timedelta(hours=1, minutes=15)),
+    ('90', timedelta(minutes=90)),
+    ('1.5', timedelta(hours=1, minutes=30)),
+])
+def test_parse_enroute(value, expected):
+    assert parse_enroute(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', None, 'abc', 'h', '1h30x', 'about 2 hours', '1:5'])
+def test_parse_enroute_rejects_unreadable_text(value):
+    assert parse_enroute(value) is None
+
+
+def test_unreadable_enroute_is_reported():
+    pilot_data = PilotProvidedData({'departureAirport': 'KSEA', 'destinationAirport': 'KPDX',
+                                    'estimatedEnroute': 'soon'})
+    verdict = go_no_go(pilot_data, [])
+    assert verdict['decision'] == 'CAUTION'
+    assert any("'soon' not understood" in reason for reason in verdict['reasons'])
@@ -0,0 +1,32 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import http_client
+from http_client import Cassette, make_response
+
+URL = 'https://aviationweather.gov/api/data/metar'
+RECORDS = [{'icaoId': 'KSEA', 'rawOb': 'KSEA 1'}, {'icaoId': 'KPDX', 'rawOb': 'KPDX 1'},
+           {'icaoId': 'KSEA', 'rawOb': 'KSEA 2'}]
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    def get(url, params=None, timeout=None):
+        return make_response(url, 200, json.dumps(RECORDS).encode('utf-8'))
+    monkeypatch.setattr(http_client, 'get_session', lambda: SimpleNamespace(get=get))
+    Cassette(str(tmp_path), mode='record')(URL, {'ids': 'KSEA,KPDX', 'format': 'json'}, 10)
+    return Cassette(str(tmp_path))
+
+
+def test_replay_is_independent_of_station_grouping(recorded):
+    assert [r['rawOb'] for r in recorded(URL, {'ids': 'KPDX', 'format': 'json'}, 10).json()] == ['KPDX 1']
+    replayed = recorded(URL, {'format': 'json', 'ids': 'KPDX,KSEA'}, 10).json()
+    assert [r['rawOb'] for r in replayed] == ['KPDX 1', 'KSEA 1', 'KSEA 2']
+
+
+def test_unrecorded_station_fails_like_the_network(recorded):
+    with pytest.raises(requests.ConnectionError):
+        recorded(URL, {'ids': 'KSEA,KBFI', 'format': 'json'}, 10)
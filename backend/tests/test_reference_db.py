@@ -0,0 +1,93 @@
+import csv
+
+import pytest
+
+from reference_db import ReferenceDatabase, build_database
+
+AIRPORTS = [
+    {'ident': 'KSEA', 'type': 'large_airport', 'name': 'Seattle Tacoma Intl', 'latitude_deg': '47.449',
+     'longitude_deg': '-122.309', 'elevation_ft': '433', 'gps_code': 'KSEA', 'iata_code': 'SEA', 'local_code': 'SEA'},
+    {'ident': 'KBFI', 'type': 'medium_airport', 'name': 'Boeing Field', 'latitude_deg': '47.530',
+     'longitude_deg': '-122.302', 'elevation_ft': '21', 'gps_code': 'KBFI', 'iata_code': 'BFI', 'local_code': 'BFI'},
+    {'ident': 'KPAE', 'type': 'medium_airport', 'name': 'Paine Field', 'latitude_deg': '47.906',
+     'longitude_deg': '-122.282', 'elevation_ft': '606', 'gps_code': 'KPAE', 'iata_code': 'PAE', 'local_code': 'PAE'},
+    {'ident': 'W16', 'type': 'small_airport', 'name': 'First Air Field', 'latitude_deg': '47.868',
+     'longitude_deg': '-121.996', 'elevation_ft': '50', 'gps_code': '', 'iata_code': '', 'local_code': 'W16'},
+]
+RUNWAYS = [
+    {'airport_ident': 'KSEA', 'length_ft': '11901', 'width_ft': '150', 'surface': 'CON', 'lighted': '1',
+     'closed': '0', 'le_ident': '16L', 'he_ident': '34R', 'le_heading_degT': '180'},
+    {'airport_ident': 'KBFI', 'length_ft': '10007', 'width_ft': '200', 'surface': 'ASP', 'lighted': '1',
+     'closed': '0', 'le_ident': '14R', 'he_ident': '32L', 'le_heading_degT': '150'},
+    {'airport_ident': 'KPAE', 'length_ft': '9010', 'width_ft': '150', 'surface': 'ASP', 'lighted': '1',
+     'closed': '0', 'le_ident': '16R', 'he_ident': '34L', 'le_heading_degT': '160'},
+    {'airport_ident': 'W16', 'length_ft': '2100', 'width_ft': '60', 'surface': 'TURF', 'lighted': '0',
+     'closed': '0', 'le_ident': '07', 'he_ident': '25', 'le_heading_degT': '70'},
+]
+# 'ABC' is used in the US and, further south, in Argentina
+NAVAIDS = [
+    {'ident': 'SEA', 'type': 'VORTAC', 'name': 'Seattle', 'frequency_khz': '116800', 'latitude_deg': '47.435',
+     'longitude_deg': '-122.309', 'iso_country': 'US'},
+    {'ident': 'ABC', 'type': 'VOR-DME', 'name': 'Alpha US', 'frequency_khz': '113400', 'latitude_deg': '40.0',
+     'longitude_deg': '-100.0', 'iso_country': 'US'},
+    {'ident': 'ABC', 'type': 'NDB', 'name': 'Alpha AR', 'frequency_khz': '350', 'latitude_deg': '-34.6',
+     'longitude_deg': '-58.4', 'iso_country': 'AR'},
+]
+
+
+def _write(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def database(tmp_path):
+    output = str(tmp_path / 'reference.db')
+    build_database(_write(tmp_path / 'airports.csv', AIRPORTS), _write(tmp_path / 'runways.csv', RUNWAYS),
+                   _write(tmp_path / 'navaids.csv', NAVAIDS), output)
+    db = ReferenceDatabase(output)
+    yield db
+    db.close()
+
+
+def test_airport_round_trip(database):
+    airport = database.get_airport('SEA')
+    assert airport['icaoId'] == 'KSEA'
+    assert airport['name'] == 'Seattle Tacoma Intl'
+    assert airport['lat'] == pytest.approx(47.449)
+    assert airport['longestRunwayFt'] == 11901
+    assert airport['hardSurface'] and airport['lighted']
+    assert airport['runways'][0]['id'] == '16L/34R'
+    assert database.get_airport('ksea')['icaoId'] == 'KSEA'
+    assert database.get_airport('W16')['faaId'] == 'W16'
+    assert database.get_airport('XXXX') is None
+
+
+def test_navaid_round_trip(database):
+    navaid = database.get_navaid('SEA')
+    assert navaid['type'] == 'VORTAC'
+    assert navaid['freq'] == pytest.approx(116.8)
+    assert navaid['country'] == 'US'
+    assert [n['id'] for n in database.navaids_in_bbox('47,-123,48,-122')] == ['SEA']
+
+
+def test_colliding_navaid_identifier_prefers_country(database):
+    assert database.get_navaid('ABC', countries=('US',))['name'] == 'Alpha US'
+    assert database.get_navaid('ABC', countries=('AR',))['name'] == 'Alpha AR'
+
+
+def test_colliding_navaid_identifier_prefers_nearest(database):
+    assert database.get_navaid('ABC', near=(-30.0, -60.0))['name'] == 'Alpha AR'
+    assert database.get_navaid('ABC', near=(45.0, -95.0))['name'] == 'Alpha US'
+    # A preferred country outranks distance
+    assert database.get_navaid('ABC', countries=('US',), near=(-30.0, -60.0))['name'] == 'Alpha US'
+
+
+def test_nearest_airports_filters_and_orders(database):
+    airports = database.nearest_airports(47.45, -122.31, count=3, min_runway_ft=3000, exclude=['KSEA'])
+    assert [airport['icaoId'] for airport in airports] == ['KBFI', 'KPAE']
+    assert airports[0]['distanceNm'] < airports[1]['distanceNm']
+    assert database.nearest_airports(47.45, -122.31, count=5, hard_surface=True, max_distance_nm=10)[0]['icaoId'] == 'KSEA'
@@ -0,0 +1,83 @@
+import pytest
+
+from route import RouteCorridor, great_circle_points, haversine_nm
+
+SEA = (47.45, -122.31)
+JFK = (40.64, -73.78)
+BOS = (42.36, -71.01)
+
+
+@pytest.fixture
+def corridor():
+    return RouteCorridor.from_airports(SEA, JFK, [BOS], half_width_nm=50)
+
+
+def _area(*vertices):
+    return {'coords': [{'lat': lat, 'lon': lon} for lat, lon in vertices]}
+
+
+def test_distance_follows_the_great_circle(corridor):
+    # The great-circle midpoint lies well north of the straight lat/lon line
+    midpoint = great_circle_points(SEA, JFK, 2)[1]
+    assert corridor.distance_nm(*midpoint) == pytest.approx(0, abs=0.01)
+    for point in great_circle_points(SEA, JFK, 25):
+        assert corridor.distance_nm(*point) < 0.01
+
+
+def test_distance_matches_dense_sampling(corridor):
+    dense = [point for start, end in corridor.legs for point in great_circle_points(start, end, 2000)]
+    for lat, lon in [(45.0, -100.0), (39.0, -90.0), (50.0, -80.0), (44.0, -70.0), (47.0, -130.0)]:
+        expected = min(haversine_nm(lat, lon, *point) for point in dense)
+        assert corridor.distance_nm(lat, lon) == pytest.approx(expected, abs=0.2)
+
+
+def test_distance_beyond_a_leg_end_is_to_the_endpoint(corridor):
+    assert corridor.distance_nm(47.45, -125.31) == pytest.approx(haversine_nm(47.45, -125.31, *SEA), abs=0.01)
+
+
+def test_thin_strip_crossing_between_samples_is_kept(corridor):
+    # A 2 nm wide north-south strip whose vertices are all far outside the corridor
+    midpoint = great_circle_points(SEA, JFK, 2)[1]
+    lon = midpoint[1] + 0.1
+    strip = _area((midpoint[0] - 5, lon), (midpoint[0] + 5, lon), (midpoint[0] + 5, lon + 0.04),
+                  (midpoint[0] - 5, lon + 0.04))
+    assert corridor.clip_areas([strip]) == [strip]
+
+
+def test_edge_passing_near_a_leg_end_is_kept(corridor):
+    # Vertices far from the route, but one edge passes 30 nm west of Seattle
+    lon = SEA[1] - 30 / 60 / 0.676
+    near = _area((SEA[0] - 5, lon), (SEA[0] + 5, lon), (SEA[0] + 5, lon - 3), (SEA[0] - 5, lon - 3))
+    assert corridor.clip_areas([near]) == [near]
+
+
+def test_near_miss_polygon_is_dropped(corridor):
+    lon = SEA[1] - 70 / 60 / 0.676
+    miss = _area((SEA[0] - 5, lon), (SEA[0] + 5, lon), (SEA[0] + 5, lon - 3), (SEA[0] - 5, lon - 3))
+    assert corridor.clip_areas([miss]) == []
+
+
+def test_polygon_containing_the_route_is_kept(corridor):
+    around = _area((30, -130), (55, -130), (55, -60), (30, -60))
+    assert corridor.clip_areas([around]) == [around]
+
+
+def test_clip_points_annotates_distance(corridor):
+    records = [{'lat': SEA[0], 'lon': SEA[1]}, {'lat': 30.0, 'lon': -100.0}, {'lat': None}]
+    clipped = corridor.clip_points(records)
+    assert len(clipped) == 1 and clipped[0]['routeDistanceNm'] == 0
+
+
+def test_bbox_encloses_the_corridor(corridor):
+    (bbox,) = corridor.bboxes()
+    south, west, north, east = (float(part) for part in bbox.split(','))
+    assert south <= 40.64 - 50 / 60 and north >= 47.45 + 50 / 60
+    assert west < -122.31 and east > -71.01
+
+
+@pytest.mark.parametrize('departure, destination', [((21.32, -157.92), (13.48, 144.80)),
+                                                    ((13.48, 144.80), (21.32, -157.92))])
+def test_bbox_splits_at_the_antimeridian(departure, destination):
+    bboxes = RouteCorridor.from_airports(departure, destination).bboxes()
+    spans = [tuple(float(part) for part in bbox.split(','))[1::2] for bbox in bboxes]
+    assert sorted(spans) == [(-180, -157), (143, 180)]
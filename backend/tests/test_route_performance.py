@@ -0,0 +1,77 @@
+import pytest
+
+from route_performance import WindsAloft, decode_fd_group, groundspeed, parse_altitude, wind_vector
+
+BULLETIN = """
+DATA BASED ON 141200Z
+VALID 141800Z   FOR USE 1400-2100Z. TEMPS NEG ABV 24000
+
+FT  3000    6000    9000   12000   18000   24000  30000
+SEA 2315    2520+05 2625+01 2730-04 2845-16 7305-28 750545
+PDX      2418+07 2522+02 2628-03 2742-15 2955-27 306044
+"""
+
+
+@pytest.mark.parametrize('group, expected', [
+    ('2315', (230, 15, None)),
+    ('2520+05', (250, 20, 5)),
+    ('2730-04', (270, 30, -4)),
+    ('750545', (250, 105, -45)),
+    ('9900', (None, 0, None)),
+    ('9900+10', (None, 0, 10)),
+    ('', None),
+    ('25X0', None),
+])
+def test_decode_fd_group(group, expected):
+    assert decode_fd_group(group) == expected
+
+
+def test_parse_bulletin_matches_groups_to_levels_from_the_right():
+    winds = WindsAloft.parse(BULLETIN)
+    assert winds.levels == (3000, 6000, 9000, 12000, 18000, 24000, 30000)
+    assert (winds.based_on, winds.valid, winds.for_use) == ('141200Z', '141800Z', '1400-2100Z')
+    # PDX leaves out the 3000ft group: its first group is the 6000ft wind
+    assert sorted(winds.stations['PDX']) == [6000, 9000, 12000, 18000, 24000, 30000]
+    east, north, temperature = winds.stations['PDX'][6000]
+    assert (east, north) == pytest.approx(wind_vector(240, 18))
+    assert temperature == 7
+    assert winds.stations['SEA'][24000][2] == -28
+
+
+def test_parse_without_level_header():
+    assert WindsAloft.parse('no winds here') is None
+    assert WindsAloft.parse('') is None
+
+
+def test_winds_are_interpolated_between_levels():
+    winds = WindsAloft.parse(BULLETIN).locate({'SEA': (47.45, -122.31)})
+    (low,), (middle,), (high,) = winds.winds_at([(47.45, -122.31)], [6000, 7500, 9000])
+    assert middle[0] == pytest.approx((low[0] + high[0]) / 2)
+    assert middle[1] == pytest.approx((low[1] + high[1]) / 2)
+    assert middle[2] == pytest.approx(3)
+
+
+def test_points_out_of_station_range_have_no_wind():
+    winds = WindsAloft.parse(BULLETIN).locate({'SEA': (47.45, -122.31)})
+    assert winds.winds_at([(25.0, -80.0)], [9000]) == [[None]]
+
+
+def test_groundspeed_with_head_and_crosswind():
+    assert groundspeed(120, 360, *wind_vector(360, 20)) == pytest.approx(100)
+    assert groundspeed(120, 90, *wind_vector(360, 20)) == pytest.approx((120 ** 2 - 20 ** 2) ** 0.5)
+    assert groundspeed(30, 90, *wind_vector(360, 40)) == 0.0
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('9500', 9500),
+    ('9,500 ft', 9500),
+    ('FL180', 18000),
+    ('FL 085', 8500),
+    ('180', 18000),
+    (5500, 5500),
+    ('', None),
+    (None, None),
+    ('VFR on top', None),
+])
+def test_parse_altitude(value, expected):
+    assert parse_altitude(value) == expected
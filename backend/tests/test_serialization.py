@@ -0,0 +1,35 @@
+import asyncio
+
+from quart import Quart
+
+from serialization import json_response
+
+app = Quart(__name__)
+PAYLOAD = {'briefing': 'x' * 4096}
+
+
+def _respond(method, headers=None):
+    async def run():
+        async with app.test_request_context('/', method=method, headers=headers or {}):
+            return json_response(PAYLOAD)
+    return asyncio.run(run())
+
+
+def test_gzip_and_identity_bodies_have_distinct_etags():
+    identity = _respond('GET')
+    compressed = _respond('GET', {'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] == identity.headers['ETag'][:-1] + '-gzip"'
+
+
+def test_get_with_matching_etag_is_not_modified():
+    etag = _respond('GET').headers['ETag']
+    assert _respond('GET', {'If-None-Match': etag}).status_code == 304
+    gzip_etag = _respond('GET', {'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert _respond('GET', {'If-None-Match': gzip_etag}).status_code == 304
+
+
+def test_post_never_answers_304():
+    etag = _respond('GET').headers['ETag']
+    response = _respond('POST', {'If-None-Match': etag})
+    assert response.status_code == 200
@@ -0,0 +1,106 @@
+import pytest
+
+from weather_models import Metar, Taf, flight_category, parse_ceiling, parse_visibility, worse_category
+
+HOUR = 3600
+START = 1_700_000_000
+
+
+@pytest.mark.parametrize('value, expected', [
+    (10, 10.0),
+    ('10+', 10.0),
+    ('P6SM', 6.0),
+    ('1 1/2', 1.5),
+    ('3/4SM', 0.75),
+    ('', None),
+    ('M1/4', None),
+])
+def test_parse_visibility(value, expected):
+    assert parse_visibility(value) == expected
+
+
+def test_ceiling_is_lowest_broken_or_overcast_layer_or_vertical_visibility():
+    clouds = [{'cover': 'FEW', 'base': 800}, {'cover': 'BKN', 'base': 2500}, {'cover': 'OVC', 'base': 4000}]
+    assert parse_ceiling(clouds) == 2500
+    assert parse_ceiling(clouds, vert_vis=300) == 300
+    assert parse_ceiling([{'cover': 'SCT', 'base': 1200}]) is None
+
+
+@pytest.mark.parametrize('ceiling, visibility, expected', [
+    (None, None, None),
+    (None, 10, 'VFR'),
+    (3000, 10, 'MVFR'),
+    (1500, 2.5, 'IFR'),
+    (400, 10, 'LIFR'),
+])
+def test_flight_category(ceiling, visibility, expected):
+    assert flight_category(ceiling, visibility) == expected
+
+
+def test_worse_category():
+    assert worse_category('VFR', 'IFR') == 'IFR'
+    assert worse_category(None, 'MVFR') == 'MVFR'
+
+
+def test_metar_from_record():
+    metar = Metar.from_record({
+        'icaoId': 'kpdx', 'obsTime': START, 'rawOb': 'KPDX 141753Z  VRB03KT 2SM BR OVC008',
+        'visib': '2', 'clouds': [{'cover': 'OVC', 'base': 800}], 'wdir': 'VRB', 'wspd': 3,
+        'temp': '8', 'dewp': 7, 'altim': 1016.2, 'wxString': 'BR', 'lat': 45.6, 'lon': -122.6,
+    })
+    assert metar.station == 'KPDX'
+    assert metar.raw == 'KPDX 141753Z VRB03KT 2SM BR OVC008'
+    assert (metar.ceiling_ft, metar.visibility_sm, metar.flight_category) == (800, 2.0, 'IFR')
+    assert (metar.wind_dir, metar.wind_speed_kt, metar.temp_c) == ('VRB', 3, 8.0)
+    assert metar.clouds == 'OVC008'
+    assert metar.to_dict()['obs_time'] == '2023-11-14T22:13:20Z'
+
+
+def test_metar_keeps_reported_flight_category():
+    metar = Metar.from_record({'icaoId': 'KSEA', 'fltCat': 'MVFR', 'visib': '10+'})
+    assert metar.flight_category == 'MVFR'
+
+
+def _taf(*fcsts):
+    return Taf.from_record({'icaoId': 'KSEA', 'validTimeFrom': START, 'validTimeTo': START + 24 * HOUR,
+                            'fcsts': list(fcsts)})
+
+
+def test_taf_change_groups_inherit_missing_elements_from_base():
+    taf = _taf(
+        {'timeFrom': START, 'timeTo': START + 12 * HOUR, 'visib': '6+', 'wdir': 180, 'wspd': 10,
+         'clouds': [{'cover': 'BKN', 'base': 5000}]},
+        {'fcstChange': 'TEMPO', 'timeFrom': START + 2 * HOUR, 'timeTo': START + 4 * HOUR, 'visib': '2',
+         'wxString': '-RA'},
+    )
+    base, tempo = taf.periods
+    assert base.flight_category == 'VFR'
+    assert (tempo.ceiling_ft, tempo.visibility_sm, tempo.wind_speed_kt) == (5000, 2.0, 10)
+    assert tempo.clouds == 'BKN050'
+    assert tempo.flight_category == 'IFR'
+    assert tempo.is_temporary
+
+
+def test_becmg_persists_until_next_base_period_and_fm_starts_afresh():
+    taf = _taf(
+        {'timeFrom': START, 'timeTo': START + 6 * HOUR, 'visib': '6+', 'wspd': 8,
+         'clouds': [{'cover': 'SCT', 'base': 4000}]},
+        {'fcstChange': 'BECMG', 'timeFrom': START + HOUR, 'timeTo': START + 2 * HOUR,
+         'clouds': [{'cover': 'OVC', 'base': 2000}]},
+        {'fcstChange': 'FM', 'timeFrom': START + 6 * HOUR, 'visib': '6+'},
+    )
+    _, becmg, fm = taf.periods
+    assert becmg.time_to == START + 6 * HOUR
+    assert (becmg.ceiling_ft, becmg.visibility_sm, becmg.flight_category) == (2000, 6.0, 'MVFR')
+    assert fm.time_to == START + 24 * HOUR
+    assert fm.ceiling_ft is None and fm.wind_speed_kt is None and fm.clouds is None
+
+
+def test_taf_worst_category_can_skip_temporary_groups():
+    taf = _taf(
+        {'timeFrom': START, 'timeTo': START + 12 * HOUR, 'visib': '6+'},
+        {'fcstChange': 'TEMPO', 'timeFrom': START + 2 * HOUR, 'timeTo': START + 4 * HOUR, 'visib': '1/2'},
+    )
+    assert taf.worst_category(START, START + 3 * HOUR) == 'LIFR'
+    assert taf.worst_category(START, START + 3 * HOUR, include_temporary=False) == 'VFR'
+    assert taf.worst_category(START + 5 * HOUR, START + 6 * HOUR) == 'VFR'
@@ -0,0 +1,382 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+# Flight categories from best to worst
+FLIGHT_CATEGORIES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+CATEGORY_RANK = {category: rank for rank, category in enumerate(FLIGHT_CATEGORIES)}
+
+CEILING_COVERS = ('BKN', 'OVC', 'OVX')
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> Optional[int]:
+    number = _float(value)
+    return int(number) if number is not None else None
+
+
+def parse_visibility(value) -> Optional[float]:
+    """Visibility in statute miles from the API's number or text form ('10+', '1 1/2', 'P6SM')"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().upper().replace('SM', '').lstrip('P').rstrip('+')
+    total = 0.0
+    try:
+        for part in text.split():
+            if '/' in part:
+                numerator, denominator = part.split('/', 1)
+                total += float(numerator) / float(denominator)
+            else:
+                total += float(part)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return total
+
+
+def parse_ceiling(clouds: Optional[List[Dict]], vert_vis=None) -> Optional[int]:
+    """Lowest broken/overcast layer or vertical visibility, in feet; None when unlimited"""
+    bases = [_int(layer.get('base')) for layer in clouds or []
+             if layer.get('cover') in CEILING_COVERS and layer.get('base') is not None]
+    if vert_vis is not None:
+        bases.append(_int(vert_vis))
+    bases = [base for base in bases if base is not None]
+    return min(bases) if bases else None
+
+
+def flight_category(ceiling_ft: Optional[int], visibility_sm: Optional[float]) -> Optional[str]:
+    """FAA flight category from ceiling and visibility; None if both are unknown"""
+    if ceiling_ft is None and visibility_sm is None:
+        return None
+    ceiling = ceiling_ft if ceiling_ft is not None else float('inf')
+    visibility = visibility_sm if visibility_sm is not None else float('inf')
+    if ceiling < 500 or visibility < 1:
+        return 'LIFR'
+    if ceiling < 1000 or visibility < 3:
+        return 'IFR'
+    if ceiling <= 3000 or visibility <= 5:
+        return 'MVFR'
+    return 'VFR'
+
+
+def worse_category(first: Optional[str], second: Optional[str]) -> Optional[str]:
+    """The more restrictive of two flight categories"""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return first if CATEGORY_RANK.get(first, 0) >= CATEGORY_RANK.get(second, 0) else second
+
+
+def _epoch(value) -> Optional[int]:
+    """Epoch seconds from the API's epoch number or ISO-8601 timestamp"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return _int(value)
+
+
+def _iso(timestamp: Optional[int]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _cloud_layers(clouds: Optional[List[Dict]]) -> Optional[str]:
+    """Compact cloud summary such as 'FEW025 BKN040', or None if none were reported"""
+    layers = []
+    for layer in clouds or []:
+        cover = layer.get('cover')
+        if not cover:
+            continue
+        base = _int(layer.get('base'))
+        layers.append(f"{cover}{base // 100:03d}" if base is not None else cover)
+    return ' '.join(layers) or None
+
+
+class Metar:
+    """One decoded surface observation"""
+
+    __slots__ = ('station', 'obs_time', 'raw', 'flight_category', 'ceiling_ft', 'visibility_sm',
+                 'wind_dir', 'wind_speed_kt', 'wind_gust_kt', 'temp_c', 'dewpoint_c', 'altimeter_hpa',
+                 'weather', 'clouds', 'lat', 'lon')
+
+    def __init__(self, station: str, obs_time: Optional[int] = None, raw: str = '',
+                 flight_category: Optional[str] = None, ceiling_ft: Optional[int] = None,
+                 visibility_sm: Optional[float] = None, wind_dir=None, wind_speed_kt: Optional[int] = None,
+                 wind_gust_kt: Optional[int] = None, temp_c: Optional[float] = None,
+                 dewpoint_c: Optional[float] = None, altimeter_hpa: Optional[float] = None,
+                 weather: Optional[str] = None, clouds: Optional[str] = None,
+                 lat: Optional[float] = None, lon: Optional[float] = None):
+        self.station = station
+        self.obs_time = obs_time
+        self.raw = raw
+        self.flight_category = flight_category
+        self.ceiling_ft = ceiling_ft
+        self.visibility_sm = visibility_sm
+        self.wind_dir = wind_dir
+        self.wind_speed_kt = wind_speed_kt
+        self.wind_gust_kt = wind_gust_kt
+        self.temp_c = temp_c
+        self.dewpoint_c = dewpoint_c
+        self.altimeter_hpa = altimeter_hpa
+        self.weather = weather
+        self.clouds = clouds
+        self.lat = lat
+        self.lon = lon
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "Metar":
+        """Decode an aviationweather.gov METAR JSON record"""
+        ceiling = parse_ceiling(record.get('clouds'), record.get('vertVis'))
+        visibility = parse_visibility(record.get('visib'))
+        wind_dir = record.get('wdir')
+        return cls(
+            station=str(record.get('icaoId') or '').upper(),
+            obs_time=_epoch(record.get('obsTime') or record.get('reportTime')),
+            raw=' '.join(str(record.get('rawOb') or '').split()),
+            flight_category=record.get('fltCat') or flight_category(ceiling, visibility),
+            ceiling_ft=ceiling,
+            visibility_sm=visibility,
+            wind_dir=wind_dir if wind_dir == 'VRB' else _int(wind_dir),
+            wind_speed_kt=_int(record.get('wspd')),
+            wind_gust_kt=_int(record.get('wgst')),
+            temp_c=_float(record.get('temp')),
+            dewpoint_c=_float(record.get('dewp')),
+            altimeter_hpa=_float(record.get('altim')),
+            weather=record.get('wxString') or None,
+            clouds=_cloud_layers(record.get('clouds')),
+            lat=_float(record.get('lat')),
+            lon=_float(record.get('lon')),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "station": self.station,
+            "obs_time": _iso(self.obs_time),
+            "raw": self.raw,
+            "flight_category": self.flight_category,
+            "ceiling_ft": self.ceiling_ft,
+            "visibility_sm": self.visibility_sm,
+            "wind_dir": self.wind_dir,
+            "wind_speed_kt": self.wind_speed_kt,
+            "wind_gust_kt": self.wind_gust_kt,
+            "temp_c": self.temp_c,
+            "dewpoint_c": self.dewpoint_c,
+            "altimeter_hpa": self.altimeter_hpa,
+            "weather": self.weather,
+            "clouds": self.clouds,
+            "lat": self.lat,
+            "lon": self.lon,
+        }
+
+
+class TafPeriod:
+    """One TAF change group (base/FM, BECMG, TEMPO or PROB) with its decoded conditions"""
+
+    __slots__ = ('change', 'probability', 'time_from', 'time_to', 'flight_category', 'ceiling_ft',
+                 'visibility_sm', 'wind_dir', 'wind_speed_kt', 'wind_gust_kt', 'weather', 'clouds')
+
+    def __init__(self, change: Optional[str], time_from: int, time_to: int, probability: Optional[int] = None,
+                 ceiling_ft: Optional[int] = None, visibility_sm: Optional[float] = None, wind_dir=None,
+                 wind_speed_kt: Optional[int] = None, wind_gust_kt: Optional[int] = None,
+                 weather: Optional[str] = None, clouds: Optional[str] = None):
+        self.change = change
+        self.probability = probability
+        self.time_from = time_from
+        self.time_to = time_to
+        self.ceiling_ft = ceiling_ft
+        self.visibility_sm = visibility_sm
+        self.wind_dir = wind_dir
+        self.wind_speed_kt = wind_speed_kt
+        self.wind_gust_kt = wind_gust_kt
+        self.weather = weather
+        self.clouds = clouds
+        self.flight_category = flight_category(ceiling_ft, visibility_sm)
+
+    @property
+    def is_temporary(self) -> bool:
+        """TEMPO/PROB groups describe possible rather than prevailing conditions"""
+        return self.change in ('TEMPO', 'PROB')
+
+    def overlaps(self, start: int, end: int) -> bool:
+        return self.time_from < end and self.time_to > start
+
+    def to_dict(self) -> Dict:
+        return {
+            "change": self.change,
+            "probability": self.probability,
+            "time_from": _iso(self.time_from),
+            "time_to": _iso(self.time_to),
+            "flight_category": self.flight_category,
+            "ceiling_ft": self.ceiling_ft,
+            "visibility_sm": self.visibility_sm,
+            "wind_dir": self.wind_dir,
+            "wind_speed_kt": self.wind_speed_kt,
+            "wind_gust_kt": self.wind_gust_kt,
+            "weather": self.weather,
+            "clouds": self.clouds,
+        }
+
+
+class Taf:
+    """One decoded terminal forecast with its change groups"""
+
+    __slots__ = ('station', 'issue_time', 'valid_from', 'valid_to', 'raw', 'periods', 'lat', 'lon')
+
+    def __init__(self, station: str, issue_time: Optional[int], valid_from: Optional[int],
+                 valid_to: Optional[int], raw: str = '', periods: Optional[List[TafPeriod]] = None,
+                 lat: Optional[float] = None, lon: Optional[float] = None):
+        self.station = station
+        self.issue_time = issue_time
+        self.valid_from = valid_from
+        self.valid_to = valid_to
+        self.raw = raw
+        self.periods = periods or []
+        self.lat = lat
+        self.lon = lon
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "Taf":
+        """
+        Decode an aviationweather.gov TAF JSON record
+
+        Change groups only list the elements that change, so missing wind,
+        visibility or cloud elements are inherited from the prevailing base
+        period. BECMG conditions persist until the next base period.
+        """
+        valid_to = _epoch(record.get('validTimeTo'))
+        periods: List[TafPeriod] = []
+        base: Optional[TafPeriod] = None
+        for forecast in record.get('fcsts') or []:
+            change = forecast.get('fcstChange') or None
+            time_from = _epoch(forecast.get('timeFrom'))
+            time_to = _epoch(forecast.get('timeTo')) or valid_to
+            if time_from is None or time_to is None:
+                continue
+            clouds = forecast.get('clouds') or []
+            ceiling = parse_ceiling(clouds, forecast.get('vertVis'))
+            visibility = parse_visibility(forecast.get('visib'))
+            wind_dir = forecast.get('wdir')
+            wind_dir = wind_dir if wind_dir == 'VRB' else _int(wind_dir)
+            wind_speed = _int(forecast.get('wspd'))
+            wind_gust = _int(forecast.get('wgst'))
+            inherit = base is not None and change not in (None, 'FM')
+            if inherit:
+                if not clouds and forecast.get('vertVis') is None:
+                    ceiling = base.ceiling_ft
+                if visibility is None:
+                    visibility = base.visibility_sm
+                if wind_speed is None:
+                    wind_dir, wind_speed, wind_gust = base.wind_dir, base.wind_speed_kt, base.wind_gust_kt
+                if change == 'BECMG':
+                    time_to = max(time_to, base.time_to)
+            period = TafPeriod(
+                change=change,
+                time_from=time_from,
+                time_to=time_to,
+                probability=_int(forecast.get('probability')),
+                ceiling_ft=ceiling,
+                visibility_sm=visibility,
+                wind_dir=wind_dir,
+                wind_speed_kt=wind_speed,
+                wind_gust_kt=wind_gust,
+                weather=forecast.get('wxString') or None,
+                clouds=_cloud_layers(clouds) or (base.clouds if inherit else None),
+            )
+            periods.append(period)
+            if not inherit:
+                base = period
+        return cls(
+            station=str(record.get('icaoId') or '').upper(),
+            issue_time=_epoch(record.get('issueTime') or record.get('bulletinTime')),
+            valid_from=_epoch(record.get('validTimeFrom')),
+            valid_to=valid_to,
+            raw=' '.join(str(record.get('rawTAF') or '').split()),
+            periods=periods,
+            lat=_float(record.get('lat')),
+            lon=_float(record.get('lon')),
+        )
+
+    def periods_between(self, start: int, end: int, include_temporary: bool = True) -> List[TafPeriod]:
+        """Change groups in effect at any time within [start, end)"""
+        return [period for period in self.periods
+                if period.overlaps(start, end) and (include_temporary or not period.is_temporary)]
+
+    def worst_category(self, start: int, end: int, include_temporary: bool = True) -> Optional[str]:
+        """Most restrictive forecast flight category within [start, end)"""
+        worst = None
+        for period in self.periods_between(start, end, include_temporary):
+            worst = worse_category(worst, period.flight_category)
+        return worst
+
+    def to_dict(self) -> Dict:
+        return {
+            "station": self.station,
+            "issue_time": _iso(self.issue_time),
+            "valid_from": _iso(self.valid_from),
+            "valid_to": _iso(self.valid_to),
+            "raw": self.raw,
+            "periods": [period.to_dict() for period in self.periods],
+            "lat": self.lat,
+            "lon": self.lon,
+        }
+
+
+def latest_metars(metars: Iterable[Metar]) -> Dict[str, Metar]:
+    """Most recent observation per station"""
+    latest: Dict[str, Metar] = {}
+    for metar in metars:
+        current = latest.get(metar.station)
+        if current is None or (metar.obs_time or 0) > (current.obs_time or 0):
+            latest[metar.station] = metar
+    return latest
+
+
+def worst_category(metars: Iterable[Metar], tafs: Iterable[Taf], start: int, end: int,
+                   stations: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Most restrictive flight category over a set of stations in a time window
+
+    Uses the TAF where one covers the window and falls back to the latest
+    METAR for stations without a forecast (or when the window has started).
+
+    Args:
+        metars: Decoded observations
+        tafs: Decoded forecasts
+        start: Window start, epoch seconds
+        end: Window end, epoch seconds
+        stations: Restrict to these identifiers; all stations when None
+    """
+    wanted = {station.upper() for station in stations} if stations is not None else None
+    worst = None
+    forecast_stations = set()
+    for taf in tafs:
+        if wanted is not None and taf.station not in wanted:
+            continue
+        category = taf.worst_category(start, end)
+        if category is not None:
+            forecast_stations.add(taf.station)
+            worst = worse_category(worst, category)
+    now = datetime.now(timezone.utc).timestamp()
+    for station, metar in latest_metars(metars).items():
+        if wanted is not None and station not in wanted:
+            continue
+        if station not in forecast_stations or start <= now:
+            worst = worse_category(worst, metar.flight_category)
+    return worst
+
+
+def records_to_dicts(records: Optional[Iterable]) -> List:
+    """Serialize decoded records (or pass through plain dicts such as PIREPs)"""
+    return [record.to_dict() if hasattr(record, 'to_dict') else record for record in records or []]
@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import requests
+from dotenv import load_dotenv
+from http_client import http_get
+from weather_models import Metar, Taf
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Contiguous US (lat0, lon0, lat1, lon1)
+CONUS_BBOX = "24,-125,50,-66"
+
+
+class StationIndexedStore:
+    """In-memory snapshot of bulk weather products, indexed by station identifier"""
+
+    def __init__(self, max_age: float = 900):
+        """
+        Args:
+            max_age: Seconds after which a snapshot is considered stale and ignored
+        """
+        self.max_age = max_age
+        # (product, *params) -> (loaded_at, {station: [records]})
+        self._snapshots: Dict[Tuple, Tuple[float, Dict[str, List]]] = {}
+
+    def replace(self, product: str, records: Sequence, params: Tuple = ()):
+        """
+        Index a full product download and swap it in as the current snapshot
+
+        Args:
+            product: Product name (e.g. 'metar', 'taf')
+            records: Decoded records (Metar/Taf), keyed by their station
+            params: Query parameters the snapshot was taken with (e.g. METAR hours)
+        """
+        index: Dict[str, List] = {}
+        for record in records:
+            station = record.station
+            if station:
+                index.setdefault(station, []).append(record)
+        # Single reference assignment, so readers never observe a half-built index
+        self._snapshots[(product,) + params] = (time.monotonic(), index)
+
+    def get(self, product: str, station: str, params: Tuple = ()) -> Optional[List]:
+        """
+        Look up one station in the current snapshot
+
+        Args:
+            product: Product name
+            station: Normalized (upper-case) station identifier
+            params: Query parameters the caller would have used upstream
+
+        Returns:
+            Records for the station, or None if there is no fresh snapshot
+            or the station is not part of it
+        """
+        snapshot = self._snapshots.get((product,) + params)
+        if snapshot is None:
+            return None
+        loaded_at, index = snapshot
+        if time.monotonic() - loaded_at > self.max_age:
+            return None
+        return index.get(station)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Station count and age in seconds of each loaded snapshot"""
+        now = time.monotonic()
+        return {
+            ':'.join(str(part) for part in key): {"stations": len(index), "age": round(now - loaded_at, 1)}
+            for key, (loaded_at, index) in list(self._snapshots.items())
+        }
+
+
+# Shared store consulted by WeatherService before any per-station query
+weather_store = StationIndexedStore(max_age=float(os.environ.get("WEATHER_SNAPSHOT_MAX_AGE", 900)))
+
+
+class WeatherSnapshotIngester:
+    """Background job that periodically downloads METAR/TAF for a whole region"""
+
+    def __init__(self, store: StationIndexedStore = weather_store, source: Optional[str] = None,
+                 interval: Optional[float] = None, bboxes: Optional[List[str]] = None, metar_hours: int = 2):
+        """
+        Args:
+            store: Store to publish snapshots into
+            source: Base URL of the data API, or a local directory / file:// URL
+                holding metar.json and taf.json (used as a stand-in for tests)
+            interval: Seconds between refreshes
+            bboxes: Bounding boxes to download; several smaller boxes keep
+                individual responses under upstream size limits
+            metar_hours: Hours of METAR history kept per station
+        """
+        self.store = store
+        self.source = source or os.environ.get("WEATHER_SNAPSHOT_SOURCE", "https://aviationweather.gov/api/data")
+        self.interval = interval or float(os.environ.get("WEATHER_SNAPSHOT_INTERVAL", 300))
+        self.bboxes = bboxes or os.environ.get("WEATHER_SNAPSHOT_BBOXES", CONUS_BBOX).split(';')
+        self.metar_hours = metar_hours
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_local(self, product: str) -> Optional[List[Dict]]:
+        """Read a product dump from a local directory"""
+        parsed = urlparse(self.source)
+        directory = parsed.path if parsed.scheme == 'file' else self.source
+        try:
+            with open(os.path.join(directory, f"{product}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading {product} snapshot from {directory}: {e}")
+            return None
+
+    def _download(self, product: str, params: Dict) -> Optional[List[Dict]]:
+        """Download a product for every configured bounding box"""
+        records: List[Dict] = []
+        for bbox in self.bboxes:
+            try:
+                response = http_get(f"{self.source}/{product}",
+                                    params={**params, 'bbox': bbox, 'format': 'json'}, timeout=60)
+                response.raise_for_status()
+                records.extend(response.json() or [])
+            except requests.RequestException as e:
+                print(f"Error downloading {product} snapshot for bbox {bbox}: {e}")
+                return None
+        return records
+
+    def _fetch(self, product: str, params: Dict) -> Optional[List[Dict]]:
+        if urlparse(self.source).scheme in ('http', 'https'):
+            return self._download(product, params)
+        return self._load_local(product)
+
+    def refresh(self):
+        """Download and publish fresh METAR and TAF snapshots; keep the old ones on failure"""
+        metars = self._fetch('metar', {'hours': self.metar_hours})
+        if metars is not None:
+            self.store.replace('metar', [Metar.from_record(record) for record in metars],
+                               params=(self.metar_hours,))
+        tafs = self._fetch('taf', {})
+        if tafs is not None:
+            self.store.replace('taf', [Taf.from_record(record) for record in tafs])
+        print(f"Weather snapshot refreshed: {self.store.stats()}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Weather snapshot refresh failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start refreshing in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="weather-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10):
+        """Stop the background refresh loop and wait up to `timeout` seconds for a refresh in progress"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
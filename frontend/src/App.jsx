@@ -13,6 +13,8 @@ function App() {
     aircraftType: '',
     aircraftEquipment: '',
     trueAirspeed: '',
+    cruiseAltitude: '',
+    fuelBurn: '',
     departureAirport: '',
     destinationAirport: '',
     takeoffTime: '',
@@ -22,33 +24,94 @@ function App() {
   
   const [flightData, setFlightData] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
 
   const handleChange = (e) => {
     const { name, value } = e.target;
     setForm((prev) => ({ ...prev, [name]: value }));
   };
 
+  // Parse one Server-Sent Events message ("event: ...\ndata: ...") into { event, data }
+  const parseSseMessage = (message) => {
+    let event = 'message';
+    const dataLines = [];
+    for (const line of message.split('\n')) {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trimStart());
+      }
+    }
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+  };
+
+  const handleStreamEvent = ({ event, data }) => {
+    switch (event) {
+      case 'flight_info':
+        setFlightData(data);
+        break;
+      case 'delta':
+        setFlightData((prev) => prev && {
+          ...prev,
+          ai_analysis: {
+            ...prev.ai_analysis,
+            briefing: (prev.ai_analysis?.briefing || '') + data.text,
+          },
+        });
+        break;
+      case 'error':
+        setFlightData((prev) => prev && {
+          ...prev,
+          ai_analysis: { ...prev.ai_analysis, briefing: data.message },
+        });
+        break;
+      default:
+        break;
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setIsLoading(true);
+    setIsStreaming(true);
+    setFlightData(null);
     try {
-      const response = await fetch('http://localhost:5000/api/flight', {
+      const response = await fetch('http://localhost:5000/api/flight/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          Accept: 'text/event-stream',
         },
         body: JSON.stringify(form),
       });
-      const result = await response.json();
-      if (result.status === 'success') {
-        setFlightData(result.flight_info);
-      } else {
+      if (!response.ok || !response.body) {
         alert('Submission failed.');
+        return;
+      }
+
+      // Render the weather payload first, then append briefing text as it arrives
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const message = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          if (message.trim()) {
+            handleStreamEvent(parseSseMessage(message));
+          }
+        }
+        setIsLoading(false);
       }
     } catch (error) {
       alert('Error submitting flight information.');
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
     }
   };
 
@@ -88,6 +151,14 @@ function App() {
             True Airspeed:
             <input type="number" name="trueAirspeed" value={form.trueAirspeed} onChange={handleChange} required />
           </label>
+          <label>
+            Cruise Altitude:
+            <input type="text" name="cruiseAltitude" value={form.cruiseAltitude} onChange={handleChange} placeholder="e.g. 6500 or FL110 (best if empty)" />
+          </label>
+          <label>
+            Fuel Burn (gal/hr):
+            <input type="number" name="fuelBurn" value={form.fuelBurn} onChange={handleChange} step="0.1" />
+          </label>
         </fieldset>
         <fieldset>
           <legend>Route & Timing</legend>
@@ -100,20 +171,20 @@ function App() {
             <input type="text" name="destinationAirport" value={form.destinationAirport} onChange={handleChange} required />
           </label>
           <label>
-            Planned Takeoff Time:
+            Planned Takeoff Time (UTC):
             <input type="datetime-local" name="takeoffTime" value={form.takeoffTime} onChange={handleChange} required />
           </label>
           <label>
             Estimated Time En Route:
-            <input type="text" name="estimatedEnroute" value={form.estimatedEnroute} onChange={handleChange} required placeholder="e.g. 2h 30m" />
+            <input type="text" name="estimatedEnroute" value={form.estimatedEnroute} onChange={handleChange} placeholder="e.g. 2h 30m (computed from winds if empty)" />
           </label>
           <label>
             Alternate Airports:
             <input type="text" name="alternateAirports" value={form.alternateAirports} onChange={handleChange} />
           </label>
         </fieldset>
-        <button type="submit" disabled={isLoading}>
-          {isLoading ? 'Processing...' : 'Submit Flight Info'}
+        <button type="submit" disabled={isStreaming}>
+          {isLoading ? 'Processing...' : isStreaming ? 'Receiving briefing...' : 'Submit Flight Info'}
         </button>
       </form>
       
@@ -135,7 +206,7 @@ function App() {
                 )
               }}
             >
-              {flightData.ai_analysis?.briefing || 'No briefing available.'}
+              {flightData.ai_analysis?.briefing || (isStreaming ? 'Generating briefing...' : 'No briefing available.')}
             </ReactMarkdown>
           </div>
         </div>
@@ -69,6 +69,53 @@ CORS_ORIGINS=http://localhost:5173
 
 # API Configuration
 API_TIMEOUT=30
+API_RESPONSE_TIMEOUT=300
+FETCH_DEADLINE=12
+FETCH_WORKERS=32
+CACHE_MAX_ENTRIES=5000
+HTTP_POOL_SIZE=32
+HTTP_RETRIES=3
+ROUTE_CORRIDOR_NM=50
+PROMPT_TOKEN_BUDGET=3000
+ETA_WINDOW_MINUTES=60
+CROSSWIND_LIMIT_KT=15
+CRUISE_CEILING_FT=12000
+WINDS_ALOFT_REGION=us
+SERVER_TIMING_HEADER=false
+BATCH_MAX_FLIGHTS=50
+BATCH_AGENT_CONCURRENCY=4
+GZIP_MIN_BYTES=1024
+GZIP_LEVEL=5
+AGENT_MAX_CONCURRENT=8
+AGENT_QUEUE_SIZE=32
+AGENT_QUEUE_TIMEOUT=20
+AGENT_RUNS_PER_MINUTE=0
+
+# Weather Snapshot Configuration
+WEATHER_SNAPSHOT=false
+WEATHER_SNAPSHOT_SOURCE=https://aviationweather.gov/api/data
+WEATHER_SNAPSHOT_INTERVAL=300
+
+# Prefetch Configuration (keep data for flights filed ahead of takeoff warm)
+PREFETCH=false
+PREFETCH_INTERVAL=120
+PREFETCH_HORIZON_HOURS=6
+PREFETCH_MAX_FLIGHTS=1000
+PREFETCH_BRIEFINGS=false
+
+# Reference Data Configuration (optional local airport/navaid database)
+REFERENCE_DB=
+ALTERNATE_SUGGESTIONS=3
+ALTERNATE_MIN_RUNWAY_FT=3000
+ALTERNATE_MAX_DISTANCE_NM=100
+
+# Briefing Cache Configuration
+BRIEFING_CACHE_TTL=3600
+BRIEFING_CACHE_MAX_ENTRIES=500
+# Reloads with materially changed weather get an amendment, at most this many times
+BRIEFING_MAX_AMENDMENTS=3
+# Optional disk tier (leave empty for memory only)
+BRIEFING_CACHE_DIR=
 EOF
 
 echo "Example environment file created at backend/.env.example"
@@ -90,7 +137,7 @@ fi
 
 echo ""
 echo "Setup completed successfully!"
-echo "You can now run the backend with: cd backend && python backend.py"
+echo "You can now run the backend with: cd backend && python fs_server.py"
 echo ""
 echo "Note: Make sure to install required Python packages:"
-echo "pip install python-dotenv azure-ai-agents"
\ No newline at end of file
+echo "pip install python-dotenv requests quart quart-cors hypercorn azure-ai-projects azure-ai-agents azure-identity aiohttp"
\ No newline at end of file